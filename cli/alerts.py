@@ -0,0 +1,228 @@
+"""
+Alerts module for low-stock warnings.
+
+An AlertEngine watches the units of the categories that have a threshold,
+either per warehouse or over all warehouses, and emits an Alert when a
+count drops below its threshold ("low") or gets back to it
+("restocked"). The counters are kept from the stock events: an order or
+a removal touches at most two counters, so a check costs O(1) per
+change instead of a recount of the stock. A received batch touches
+two counters per item.
+
+Thresholds are given as JSON, e.g. in the file named by WAREHOUSE_ALERTS:
+
+    {
+        "categories": {"Router": 20},
+        "warehouses": {"2": {"Router": 5, "Mouse": 3}}
+    }
+
+"categories" thresholds apply to the units of all warehouses together.
+Alerts are passed to sinks; AlertLog appends them to a file, by default
+the one named by WAREHOUSE_ALERT_LOG.
+"""
+import json
+import os
+import threading
+from collections import namedtuple
+from datetime import datetime
+
+import events
+import metrics
+from loader import BASE_DIR
+
+LOW = "low"
+RESTOCKED = "restocked"
+ALERT_LOG_PATH = os.environ.get(
+    "WAREHOUSE_ALERT_LOG", os.path.join(BASE_DIR, "log", "alerts.txt")
+)
+
+# `warehouse` is None for a threshold over all warehouses
+Alert = namedtuple(
+    "Alert", ["kind", "warehouse", "category", "units", "threshold"]
+)
+
+
+def describe_alert(alert):
+    """
+    Return the text of an alert.
+
+    Args:
+        alert (Alert): The alert to describe.
+
+    Returns:
+        str: e.g. "Low stock of Router in Warehouse 2: 4 units (threshold 5)".
+    """
+    where = ("all warehouses" if alert.warehouse is None
+             else f"Warehouse {alert.warehouse}")
+    what = "Low stock" if alert.kind == LOW else "Restocked"
+    return (f"{what} of {alert.category} in {where}: {alert.units} units "
+            f"(threshold {alert.threshold})")
+
+
+class AlertLog:
+    """Sink appending every alert to a text file, one line each."""
+
+    def __init__(self, path=ALERT_LOG_PATH):
+        """
+        Initialize an AlertLog instance.
+
+        Args:
+            path (str): The file to append to; its directory is created.
+        """
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, alert):
+        """Append one alert with its timestamp."""
+        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+        line = f"{timestamp}. {describe_alert(alert)}.\n"
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, "a") as file:
+                file.write(line)
+
+
+class AlertEngine:
+    """Incremental low-stock checks of a stock, driven by its events."""
+
+    def __init__(self, stock, thresholds, sinks=(), bus=None):
+        """
+        Initialize an AlertEngine instance and subscribe it to the bus.
+
+        The stock is counted once from the per-warehouse aggregates; the
+        thresholds already crossed are reported right away.
+
+        Args:
+            stock: Iterable of Warehouse objects, e.g. a Loader.
+            thresholds (dict): The "categories" and "warehouses"
+                thresholds, as described in the module.
+            sinks (iterable): Callables receiving every Alert.
+            bus (EventBus): The bus to follow. Defaults to events.bus.
+        """
+        self.sinks = list(sinks)
+        self.bus = bus or events.bus
+        self._lock = threading.Lock()
+        self._warehouses = {id(warehouse): str(warehouse.warehouse_id)
+                            for warehouse in stock}
+        # Watched (warehouse id or None, category) -> [units, threshold]
+        self._counters = {}
+        for category, threshold in thresholds.get("categories", {}).items():
+            self._counters[(None, category)] = [0, threshold]
+        for warehouse_id, categories in thresholds.get("warehouses", {}).items():
+            for category, threshold in categories.items():
+                self._counters[(str(warehouse_id), category)] = [0, threshold]
+
+        for warehouse in stock:
+            warehouse_id = str(warehouse.warehouse_id)
+            for category, units in warehouse.category_counts().items():
+                for key in ((warehouse_id, category), (None, category)):
+                    counter = self._counters.get(key)
+                    if counter is not None:
+                        counter[0] += units
+        for (warehouse_id, category), (units, threshold) in self._counters.items():
+            if units < threshold:
+                self._emit(Alert(LOW, warehouse_id, category, units, threshold))
+        self.bus.subscribe(self.apply)
+
+    def close(self):
+        """Stop following the stock."""
+        self.bus.unsubscribe(self.apply)
+
+    def low(self):
+        """
+        Return the counters currently below their threshold.
+
+        Returns:
+            List[Alert]: One "low" alert per counter below its threshold.
+        """
+        with self._lock:
+            return [
+                Alert(LOW, warehouse_id, category, units, threshold)
+                for (warehouse_id, category), (units, threshold)
+                in self._counters.items()
+                if units < threshold
+            ]
+
+    def apply(self, event):
+        """
+        Update the counters touched by a change and check their thresholds.
+
+        Args:
+            event (StockEvent): The change, ignored for other stocks.
+        """
+        warehouse_id = self._warehouses.get(id(event.warehouse))
+        if warehouse_id is None:
+            return
+        if event.kind == events.ITEMS_RECEIVED:
+            changes = [(getattr(item, "category", None),
+                        getattr(item, "quantity", 1)) for item in event.item]
+        elif event.kind == events.ITEM_ADDED:
+            changes = [(getattr(event.item, "category", None), event.quantity)]
+        else:
+            changes = [(getattr(event.item, "category", None), -event.quantity)]
+
+        alerts = []
+        with self._lock:
+            for category, amount in changes:
+                for key in ((warehouse_id, category), (None, category)):
+                    counter = self._counters.get(key)
+                    if counter is None:
+                        continue
+                    before = counter[0]
+                    counter[0] = units = before + amount
+                    threshold = counter[1]
+                    if before >= threshold > units:
+                        alerts.append(Alert(LOW, *key, units, threshold))
+                    elif before < threshold <= units:
+                        alerts.append(Alert(RESTOCKED, *key, units, threshold))
+        for alert in alerts:
+            self._emit(alert)
+
+    def _emit(self, alert):
+        """Count an alert and pass it to every sink."""
+        metrics.LOW_STOCK_ALERTS.inc(kind=alert.kind)
+        for sink in self.sinks:
+            sink(alert)
+
+
+def load_thresholds(path):
+    """
+    Read thresholds from a JSON file.
+
+    Args:
+        path (str): The file, in the format described in the module.
+
+    Returns:
+        dict: The thresholds.
+
+    Raises:
+        ValueError: If a threshold is not a non-negative integer.
+    """
+    with open(path) as file:
+        thresholds = json.load(file)
+    values = list(thresholds.get("categories", {}).values())
+    for categories in thresholds.get("warehouses", {}).values():
+        values.extend(categories.values())
+    for value in values:
+        if isinstance(value, bool) or not isinstance(value, int) or value < 0:
+            raise ValueError(f"Invalid threshold {value!r} in {path}")
+    return thresholds
+
+
+def from_environment(stock):
+    """
+    Create the AlertEngine configured by the environment, if any.
+
+    Args:
+        stock: Iterable of Warehouse objects, e.g. a Loader.
+
+    Returns:
+        AlertEngine: Watching the thresholds of WAREHOUSE_ALERTS and
+            writing to WAREHOUSE_ALERT_LOG, or None when unset.
+    """
+    path = os.environ.get("WAREHOUSE_ALERTS")
+    if not path:
+        return None
+    return AlertEngine(stock, load_thresholds(path), [AlertLog()])
@@ -0,0 +1,243 @@
+"""
+Allocation module for splitting an order across warehouses.
+
+An allocation plan says how many units of an order each warehouse
+provides. Plans are built from the per-warehouse availability kept by
+the Warehouse class, so planning costs O(W log W) for W warehouses
+(times log of the occupancy for balance) instead of a scan of the items,
+under one of these policies:
+
+    fewest   Use as few warehouses as possible, largest availability first.
+    fifo     Ship the oldest stock first, by date_of_stock, across all
+             warehouses.
+    balance  Take from the fullest warehouses, evening out occupancy.
+
+fifo merges the per-date units of the warehouses, so it costs
+O(D log D) for the D distinct dates of the matching names.
+"""
+import heapq
+import os
+
+from classes import Item
+
+POLICIES = ("fewest", "fifo", "balance")
+
+OPTIONS = {
+    "policy": os.environ.get("WAREHOUSE_ALLOCATION", "fewest"),
+}
+
+
+def _reserved_by_warehouse(reserved):
+    """Sum units reserved per (warehouse id, name) by warehouse id."""
+    totals = {}
+    for (warehouse_id, _), units in (reserved or {}).items():
+        totals[warehouse_id] = totals.get(warehouse_id, 0) + units
+    return totals
+
+
+def _availability(stock, search_item, reserved=None):
+    """Return (warehouse, units, oldest date) for every warehouse with units."""
+    reserved_units = _reserved_by_warehouse(reserved)
+    candidates = []
+    for warehouse in stock:
+        units, oldest = warehouse.availability(search_item)
+        units -= reserved_units.get(warehouse.warehouse_id, 0)
+        if units > 0:
+            candidates.append((warehouse, units, oldest))
+    return candidates
+
+
+def _greedy(candidates, quantity):
+    """Take as much as possible from each candidate in turn."""
+    plan = []
+    remaining = quantity
+    for warehouse, units, _ in candidates:
+        if remaining <= 0:
+            break
+        amount = min(units, remaining)
+        plan.append((warehouse, amount))
+        remaining -= amount
+    return plan
+
+
+def _date_order(date_of_stock):
+    """Sort key of a date of stock; units without a date go last."""
+    return (date_of_stock is None, date_of_stock or "")
+
+
+def _fifo(stock, search_item, quantity, reserved=None):
+    """
+    Take the oldest units first, whichever warehouse holds them.
+
+    Held units are left out from the newest end of every name, since
+    execute_allocation takes the oldest free units first.
+    """
+    reserved = reserved or {}
+    warehouses = list(stock)
+    streams = []
+    for number, warehouse in enumerate(warehouses):
+        stream = []
+        for name, dated in warehouse.dated_units(search_item).items():
+            held = reserved.get((warehouse.warehouse_id, name), 0)
+            while held > 0 and dated:
+                date_of_stock, units = dated.pop()
+                if units > held:
+                    dated.append((date_of_stock, units - held))
+                held -= units
+            stream.extend((_date_order(date_of_stock), number, units)
+                          for date_of_stock, units in dated)
+        stream.sort()
+        streams.append(stream)
+
+    amounts = {}  # Warehouse number -> units, in order of first use
+    remaining = quantity
+    for _, number, units in heapq.merge(*streams):
+        if remaining <= 0:
+            break
+        amount = min(units, remaining)
+        amounts[number] = amounts.get(number, 0) + amount
+        remaining -= amount
+    return [(warehouses[number], amount) for number, amount in amounts.items()]
+
+
+def _balance(candidates, quantity):
+    """
+    Take units so that the warehouses end up as evenly filled as possible.
+
+    This lowers every warehouse towards a common occupancy level: the
+    lowest level the availability can reach is found by a binary search,
+    and the units left over go to the fullest warehouses first.
+    """
+    occupancies = [warehouse.occupancy() for warehouse, _, _ in candidates]
+
+    def amounts(level):
+        return [
+            min(units, max(0, occupancy - level))
+            for (_, units, _), occupancy in zip(candidates, occupancies)
+        ]
+
+    # The highest level at which the warehouses still provide the quantity
+    low, high = 0, max(occupancies)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if sum(amounts(middle)) >= quantity:
+            low = middle
+        else:
+            high = middle - 1
+
+    # One level higher falls short; top up the fullest warehouses
+    taken = amounts(low + 1)
+    remaining = quantity - sum(taken)
+    limits = amounts(low)
+    order = sorted(range(len(candidates)), key=lambda number: -occupancies[number])
+    for number in order:
+        if remaining <= 0:
+            break
+        if limits[number] > taken[number]:
+            taken[number] += 1
+            remaining -= 1
+
+    return [
+        (candidates[number][0], taken[number])
+        for number in order
+        if taken[number] > 0
+    ]
+
+
+def plan_allocation(stock, search_item, quantity, policy=None, reserved=None):
+    """
+    Split an order across the warehouses.
+
+    Args:
+        stock: Iterable of Warehouse objects.
+        search_item (str): The normalized text of the items ordered.
+        quantity (int): The number of units wanted.
+        policy (str): One of POLICIES. Defaults to OPTIONS["policy"].
+        reserved (dict): Units per (warehouse id, name) that must not be
+            taken, e.g. held by other sessions.
+
+    Returns:
+        List[Tuple[Warehouse, int]]: The warehouses to take from and the
+            units each provides. The units add up to less than `quantity`
+            when the stock falls short.
+
+    Raises:
+        ValueError: If the policy is unknown.
+    """
+    policy = policy or OPTIONS["policy"]
+    if policy not in POLICIES:
+        raise ValueError(f"Unknown allocation policy: {policy}")
+    candidates = _availability(stock, search_item, reserved)
+    if quantity <= 0 or not candidates:
+        return []
+
+    if policy == "fewest":
+        candidates.sort(key=lambda candidate: -candidate[1])
+        return _greedy(candidates, quantity)
+    if policy == "fifo":
+        return _fifo((warehouse for warehouse, _, _ in candidates),
+                     search_item, quantity, reserved)
+    if sum(units for _, units, _ in candidates) <= quantity:
+        return [(warehouse, units) for warehouse, units, _ in candidates]
+    return _balance(candidates, quantity)
+
+
+def execute_allocation(plan, search_item, policy=None, reserved=None):
+    """
+    Take the units of a plan out of the warehouses.
+
+    Within a warehouse, the oldest items are taken first under the fifo
+    policy and the items are taken in stock order otherwise.
+
+    Args:
+        plan (List[Tuple[Warehouse, int]]): A plan from plan_allocation.
+        search_item (str): The normalized text of the items ordered.
+        policy (str): The policy the plan was made with.
+        reserved (dict): Units per (warehouse id, name) that must not be
+            taken, as given to plan_allocation.
+
+    Returns:
+        int: The number of units taken.
+    """
+    policy = policy or OPTIONS["policy"]
+    reserved = reserved or {}
+    taken = 0
+    for warehouse, units in plan:
+        items = [item for item in warehouse.find(search_item)
+                 if isinstance(item, Item)]
+        if policy == "fifo":
+            items.sort(key=lambda item: _date_order(item.date_of_stock))
+        # Units per name that may be taken, when some of them are reserved
+        free = {
+            name: count - reserved.get((warehouse.warehouse_id, name), 0)
+            for name, count in warehouse.units_by_name(search_item).items()
+        } if reserved else None
+        remaining = units
+        for item in items:
+            amount = remaining
+            if free is not None:
+                name = str(item).lower()
+                amount = min(amount, free[name])
+                if amount <= 0:
+                    continue
+            amount = warehouse.take(item, amount)
+            if free is not None:
+                free[name] -= amount
+            remaining -= amount
+            if remaining == 0:
+                break
+        taken += units - remaining
+    return taken
+
+
+def describe_plan(plan):
+    """
+    Return the lines describing a plan.
+
+    Args:
+        plan (List[Tuple[Warehouse, int]]): A plan from plan_allocation.
+
+    Returns:
+        List[str]: One line per warehouse.
+    """
+    return [f"{warehouse}: {units}" for warehouse, units in plan]
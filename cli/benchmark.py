@@ -0,0 +1,235 @@
+"""
+Benchmark suite for the warehouse operations.
+
+This module times loading (with and without the index sidecar),
+searching, browsing, listing and ordering on generated datasets of
+increasing size, writes the results as JSON and compares them with a
+stored baseline. The process exits with status 1
+when an operation is slower than the baseline by more than the threshold.
+
+Usage:
+    python benchmark.py --sizes 10000,100000 --out bench.json
+    python benchmark.py --sizes 1000000 --compression
+    python benchmark.py --baseline bench.json --threshold 0.25
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import time
+
+import generator
+import query
+import sidecar
+import storage
+from loader import Loader
+
+SEARCH_TERM = "second hand printer"
+BROWSE_CATEGORY = "Router"
+ORDER_QUANTITY = 50
+
+
+def _best_time(function, repeat):
+    """Return the fastest of `repeat` runs of a function, in seconds."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+@contextlib.contextmanager
+def use_stock(loader):
+    """Make the query module operate on another stock loader."""
+    original_loader, original_stock = query.stock_loader, query.stock
+    query.stock_loader, query.stock = loader, loader.objects
+    try:
+        yield
+    finally:
+        query.stock_loader, query.stock = original_loader, original_stock
+
+
+def benchmark_size(stock_path, repeat=3):
+    """
+    Time every operation on one dataset.
+
+    Args:
+        stock_path (str): The generated stock file.
+        repeat (int): The number of runs per operation; the best is kept.
+
+    Returns:
+        dict: The time of every operation, in seconds.
+    """
+    results = {}
+    results["load"] = _best_time(
+        lambda: Loader(model="stock", path=stock_path), repeat
+    )
+    if not os.path.exists(sidecar.sidecar_path(stock_path)):
+        sidecar.write_sidecar(stock_path)
+    results["load_indexed"] = _best_time(
+        lambda: Loader(model="stock", path=stock_path, index=True), repeat
+    )
+    loader = Loader(model="stock", path=stock_path)
+
+    def search():
+        query.search_cache.clear()
+        query.find_items(loader.objects, SEARCH_TERM)
+
+    def browse():
+        query.search_cache.clear()
+        query.category_counts()
+        query.browse_category(BROWSE_CATEGORY)
+
+    def listing():
+        with open(os.devnull, "w") as devnull:
+            with contextlib.redirect_stdout(devnull):
+                query.item_list_by_warehouse(summary_only=False)
+
+    with use_stock(loader):
+        results["search"] = _best_time(search, repeat)
+        results["browse"] = _best_time(browse, repeat)
+        results["listing"] = _best_time(listing, repeat)
+        # Ordering changes the stock, so it is timed last
+        results["order"] = _best_time(
+            lambda: query.take_items(SEARCH_TERM, ORDER_QUANTITY), repeat
+        )
+    return results
+
+
+def benchmark_compression(stock_path, repeat=3):
+    """
+    Time loading gzip and lzma copies of a dataset and measure disk usage.
+
+    Args:
+        stock_path (str): The generated (plain) stock file.
+        repeat (int): The number of runs per operation; the best is kept.
+
+    Returns:
+        Tuple[dict, dict]: The load time per format, in seconds, and the
+            file size per format, in bytes.
+    """
+    times = {}
+    disk_bytes = {"plain": os.path.getsize(stock_path)}
+    for name, extension in (("gzip", ".gz"), ("lzma", ".xz")):
+        compressed_path = stock_path + extension
+        if not os.path.exists(compressed_path):
+            storage.compress(stock_path, compressed_path)
+        disk_bytes[name] = os.path.getsize(compressed_path)
+        times[f"load_{name}"] = _best_time(
+            lambda: Loader(model="stock", path=compressed_path), repeat
+        )
+    return times, disk_bytes
+
+
+def run_benchmarks(sizes, data_dir, seed=0, repeat=3, compression=False):
+    """
+    Generate the datasets if needed and benchmark every size.
+
+    Args:
+        sizes (List[int]): The dataset sizes in items.
+        data_dir (str): The directory holding the generated datasets.
+        seed (int): The generator seed.
+        repeat (int): The number of runs per operation.
+        compression (bool): True also times loading compressed copies.
+
+    Returns:
+        dict: The results per size, keyed by the size as a string.
+    """
+    results = {}
+    for size in sizes:
+        out = os.path.join(data_dir, f"{size}-{seed}")
+        stock_path = os.path.join(out, "stock.json")
+        if not os.path.exists(stock_path):
+            generator.generate_dataset(size, out, seed)
+        results[str(size)] = benchmark_size(stock_path, repeat)
+        if compression:
+            times, disk_bytes = benchmark_compression(stock_path, repeat)
+            results[str(size)].update(times)
+            results[str(size)]["disk_bytes"] = disk_bytes
+            print(f"{size:>10} items on disk: " + ", ".join(
+                f"{name} {count / 1024:.0f} KiB"
+                for name, count in disk_bytes.items()
+            ))
+        print(f"{size:>10} items: " + ", ".join(
+            f"{name} {seconds * 1000:.1f} ms"
+            for name, seconds in results[str(size)].items()
+            if isinstance(seconds, float)
+        ))
+    return results
+
+
+def find_regressions(results, baseline, threshold):
+    """
+    Compare results with a baseline.
+
+    Args:
+        results (dict): The new results per size.
+        baseline (dict): The stored results per size.
+        threshold (float): The allowed slowdown, e.g. 0.2 for 20%.
+
+    Returns:
+        List[str]: A description of every regression found.
+    """
+    regressions = []
+    for size, operations in results.items():
+        for name, seconds in operations.items():
+            reference = baseline.get(size, {}).get(name)
+            if not isinstance(seconds, float):
+                # Not a timing, e.g. the disk usage
+                continue
+            if reference and seconds > reference * (1 + threshold):
+                regressions.append(
+                    f"{name} on {size} items: {seconds * 1000:.1f} ms "
+                    f"(baseline {reference * 1000:.1f} ms)"
+                )
+    return regressions
+
+
+def main(argv=None):
+    """Run the benchmarks from the command line."""
+    parser = argparse.ArgumentParser(description="Benchmark the warehouse operations")
+    parser.add_argument("--sizes", default="10000,100000",
+                        help="comma-separated dataset sizes (default: 10000,100000)")
+    parser.add_argument("--seed", type=int, default=0, help="generator seed")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="runs per operation, the best is kept (default: 3)")
+    parser.add_argument("--compression", action="store_true",
+                        help="also benchmark gzip and lzma stock files")
+    parser.add_argument("--data-dir", default=None,
+                        help="directory to keep generated datasets in")
+    parser.add_argument("--out", default=None, help="write the results to this JSON file")
+    parser.add_argument("--baseline", default=None,
+                        help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="allowed slowdown versus the baseline (default: 0.2)")
+    options = parser.parse_args(argv)
+
+    sizes = [int(size) for size in options.sizes.split(",")]
+    with contextlib.ExitStack() as stack:
+        data_dir = options.data_dir or stack.enter_context(tempfile.TemporaryDirectory())
+        results = run_benchmarks(sizes, data_dir, options.seed, options.repeat,
+                                 options.compression)
+
+    if options.out:
+        with open(options.out, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if options.baseline:
+        with open(options.baseline) as file:
+            baseline = json.load(file)
+        regressions = find_regressions(results, baseline, options.threshold)
+        if regressions:
+            print("Regressions found:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
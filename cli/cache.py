@@ -0,0 +1,126 @@
+"""
+Cache module for repeated search and browse results.
+
+This module defines the LRUCache class, a least-recently-used cache whose
+entries are tagged with the stock version they were computed from. An
+entry computed before the stock changed is treated as a miss, so results
+never outlive an order or a new item. Every method takes the cache's
+lock, so searches and the evictions of concurrent orders can share it.
+"""
+import threading
+from collections import OrderedDict
+
+
+def normalize_query(text):
+    """
+    Normalize a search text so equivalent queries share a cache entry.
+
+    Args:
+        text (str): The text typed by the user.
+
+    Returns:
+        str: The lower-cased text with collapsed whitespace.
+    """
+    return " ".join(text.lower().split())
+
+
+class LRUCache:
+    """Least-recently-used cache invalidated by a stock version."""
+
+    def __init__(self, maxsize=128):
+        """
+        Initialize an LRUCache instance.
+
+        Args:
+            maxsize (int): The maximum number of entries kept.
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version):
+        """
+        Look up a cached value.
+
+        Args:
+            key: The cache key.
+            version (int): The current stock version.
+
+        Returns:
+            Tuple: (True, value) on a hit, (False, None) on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                if entry is not None:
+                    # Computed from an older stock, drop it
+                    del self._entries[key]
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[1]
+
+    def put(self, key, version, value):
+        """
+        Store a value computed from the given stock version.
+
+        Args:
+            key: The cache key.
+            version (int): The stock version the value was computed from.
+            value: The value to cache.
+        """
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def evict(self, predicate):
+        """
+        Remove the entries whose key matches a condition.
+
+        Args:
+            predicate (callable): Called with every key, under the lock;
+                True removes it.
+
+        Returns:
+            int: The number of entries removed.
+        """
+        with self._lock:
+            keys = [key for key in self._entries if predicate(key)]
+            for key in keys:
+                del self._entries[key]
+            return len(keys)
+
+    def clear(self):
+        """Remove every entry, keeping the counters."""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Return the cache counters.
+
+        Returns:
+            dict: Hits, misses, evictions, current size and hit rate.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def __len__(self):
+        """Return the number of cached entries."""
+        with self._lock:
+            return len(self._entries)
@@ -6,10 +6,34 @@ which represent entities in a warehouse management system.
 The classes encapsulate functionality related to user authentication,
 item management, and warehouse operations.
 """
+import heapq
+from bisect import bisect_left, bisect_right
+
 import colors
+import events
+import shards
 from loader import Loader
 
 
+def count_by_category(stock):
+    """
+    Count the items of every category.
+
+    Args:
+        stock: Iterable of Warehouse objects.
+
+    Returns:
+        dict: The number of items per category, in order of appearance.
+    """
+    dict_item_category_count = {}
+    for warehouse in stock:
+        for category, count in warehouse.category_counts().items():
+            dict_item_category_count[category] = (
+                dict_item_category_count.get(category, 0) + count
+            )
+    return dict_item_category_count
+
+
 class MissingArgument(Exception):
     """Custom exception for missing arguments in the classes."""
     def __init__(self, argument, message):
@@ -132,12 +156,22 @@ class Employee(User):
 class Item:
     """Class representing an item in the warehouse."""
 
-    def __init__(self, state=None, category=None, date_of_stock=None, warehouse=None):
-        """Initialize an Item instance."""
+    # Set by the warehouse holding the item, increasing in stock order
+    item_id = None
+
+    def __init__(self, state=None, category=None, date_of_stock=None,
+                 warehouse=None, quantity=1):
+        """
+        Initialize an Item instance.
+
+        An item stands for `quantity` identical units stocked together;
+        unit records simply have a quantity of 1.
+        """
         self.state = state
         self.category = category
         self.date_of_stock = date_of_stock
         self.warehouse = warehouse
+        self.quantity = quantity
 
     def __str__(self):
         """
@@ -151,22 +185,341 @@ class Item:
         return ""
 
 
+def _quantity(item):
+    """Return the number of units an item stands for."""
+    return getattr(item, "quantity", 1)
+
+
+def date_key(item):
+    """Return the date of stock of an item, the sort key of date indexes."""
+    return item.date_of_stock or ""
+
+
+def _date_position(dates, items, item):
+    """Return the position of an item in a date index, by date then id."""
+    date_of_stock = date_key(item)
+    low = bisect_left(dates, date_of_stock)
+    high = bisect_right(dates, date_of_stock, low)
+    # Items of the same date are in id order
+    while low < high:
+        middle = (low + high) // 2
+        if items[middle].item_id < item.item_id:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def date_bounds(dates, since=None, until=None):
+    """
+    Return the slice of sorted dates within a range.
+
+    Args:
+        dates (list): The sorted dates of stock, "" for items without a
+            date; those are never in a range.
+        since (str): The first date included, None for no bound.
+        until (str): The last date included, None for no bound. Dates
+            that start with it, e.g. the times of a day, are included.
+
+    Returns:
+        Tuple[int, int]: The start and end positions of the range.
+    """
+    start = bisect_right(dates, "") if since is None else bisect_left(dates, since)
+    # "\uffff" sorts after any time appended to the date
+    end = len(dates) if until is None else bisect_right(dates, until + "\uffff")
+    return start, end
+
+
+class _Newest(str):
+    """Date ordered backwards, so a min-heap of them yields the newest."""
+
+    __slots__ = ()
+
+    def __lt__(self, other):
+        return str.__gt__(self, other)
+
+
+class _DateRange:
+    """Counts of stock dates with their oldest and newest value."""
+
+    def __init__(self):
+        """Initialize an empty _DateRange instance."""
+        self.counts = {}
+        self.total = 0  # Items counted, including those without a date
+        # Heaps of the distinct dates, for the oldest and the newest one.
+        # Dates no longer counted are dropped when they reach the top, so
+        # every change costs O(log dates) instead of a rescan
+        self._oldest = []
+        self._newest = []
+        # Set when the heaps must be rebuilt from the counts on next read,
+        # e.g. after restore
+        self._stale = False
+
+    def _push(self, date):
+        """Enter a newly counted date in the heaps."""
+        if self._stale:
+            return
+        if len(self._oldest) > 2 * len(self.counts) + 16:
+            # Mostly uncounted dates: rebuilt from the counts on next read
+            self._stale = True
+            return
+        heapq.heappush(self._oldest, date)
+        heapq.heappush(self._newest, _Newest(date))
+
+    def add(self, date, count=1):
+        """Count `count` items stocked on a date."""
+        self.total += count
+        if date is None:
+            return
+        counts = self.counts
+        if date in counts:
+            counts[date] += count
+        else:
+            counts[date] = count
+            self._push(date)
+
+    def add_items(self, items):
+        """Count the units of many Items, e.g. a delivery, in one pass."""
+        counts = self.counts
+        for item in items:
+            quantity = item.quantity
+            self.total += quantity
+            date = item.date_of_stock
+            if date is None:
+                continue
+            if date in counts:
+                counts[date] += quantity
+            else:
+                counts[date] = quantity
+                self._push(date)
+
+    def remove(self, date, count=1):
+        """Uncount `count` items stocked on a date."""
+        self.total -= count
+        if date is None or date not in self.counts:
+            return
+        self.counts[date] -= count
+        if self.counts[date] <= 0:
+            # Left in the heaps until it reaches their top
+            del self.counts[date]
+
+    @classmethod
+    def restore(cls, counts):
+        """
+        Create a _DateRange from saved counts per date.
+
+        Args:
+            counts (dict): The number of items per date; the None key
+                counts the items without a date.
+
+        Returns:
+            _DateRange: The range, computed on first read.
+        """
+        dates = cls()
+        dates.total = sum(counts.values())
+        counts.pop(None, None)
+        dates.counts = counts
+        dates._stale = True
+        return dates
+
+    def _top(self, newest):
+        """Return the oldest or newest counted date, dropping uncounted ones."""
+        counts = self.counts
+        if self._stale:
+            self._oldest = list(counts)
+            heapq.heapify(self._oldest)
+            self._newest = list(map(_Newest, counts))
+            heapq.heapify(self._newest)
+            self._stale = False
+        heap = self._newest if newest else self._oldest
+        while heap and heap[0] not in counts:
+            heapq.heappop(heap)
+        return str(heap[0]) if heap else None
+
+    def oldest(self):
+        """Return the oldest date, or None when empty."""
+        return self._top(newest=False)
+
+    def newest(self):
+        """Return the newest date, or None when empty."""
+        return self._top(newest=True)
+
+
 class Warehouse:
     """Class representing a warehouse in the system."""
 
+    # Incremented on every change to the stock of any warehouse
+    stock_version = 0
+
     def __init__(self, warehouse_id=None):
         """Initialize a Warehouse instance."""
         self.warehouse_id = warehouse_id
+        # Incremented on every change to the stock of this warehouse
+        self.version = 0
         self.stock = []
+        # Normalized "state category" name -> items, kept in sync by
+        # add_item and remove_item
+        self._index = {}
+        # Aggregates updated by add_item and remove_item
+        self._total = 0
+        self._categories = {}
+        self._states = {}
+        # Normalized name -> units and dates of the items under the name
+        self._names = {}
+        # Units per date of the whole warehouse, for the summary
+        self._dates = _DateRange()
+        # (dates, items) of the items sorted by date and id, built on
+        # first use and then kept in step with every change
+        self._by_date = None
+        self._next_id = 0
 
     def occupancy(self):
         """
         Return the total amount of items currently in the warehouse.
 
         Returns:
-            int: The total amount of items.
+            int: The total amount of items, counting every unit.
+        """
+        return self._total
+
+    def category_counts(self):
+        """
+        Return the number of items per category.
+
+        Returns:
+            dict: The count of items per category, in order of appearance.
+        """
+        return dict(self._categories)
+
+    def summary(self):
+        """
+        Return the aggregates of the warehouse stock.
+
+        The aggregates, including the date range, are maintained by
+        add_item and remove_item, so this costs O(1) plus the categories
+        and states copied, not a scan of the stock or of its names.
+
+        Returns:
+            dict: The warehouse id, the total amount of items, the counts
+                per category and per state, and the oldest and newest
+                date of stock.
+        """
+        return {
+            "warehouse_id": self.warehouse_id,
+            "total": self._total,
+            "categories": dict(self._categories),
+            "states": dict(self._states),
+            "oldest": self._dates.oldest(),
+            "newest": self._dates.newest(),
+        }
+
+    def _count(self, item, key, amount):
+        """Add `amount` (negative to remove) to the aggregates of an item."""
+        self._total += amount
+        dates = self._names.get(key)
+        if dates is None:
+            dates = self._names[key] = _DateRange()
+        if not isinstance(item, Item):
+            if amount > 0:
+                dates.add(None, amount)
+            else:
+                dates.remove(None, -amount)
+                if dates.total <= 0:
+                    del self._names[key]
+            return
+        categories, states = self._categories, self._states
+        categories[item.category] = categories.get(item.category, 0) + amount
+        states[item.state] = states.get(item.state, 0) + amount
+        if amount > 0:
+            dates.add(item.date_of_stock, amount)
+            self._dates.add(item.date_of_stock, amount)
+            return
+        if categories[item.category] <= 0:
+            del categories[item.category]
+        if states[item.state] <= 0:
+            del states[item.state]
+        dates.remove(item.date_of_stock, -amount)
+        self._dates.remove(item.date_of_stock, -amount)
+        if dates.total <= 0:
+            del self._names[key]
+
+    def _add(self, item):
+        """Add an item to the stock, the index and the aggregates."""
+        self.stock.append(item)
+        if isinstance(item, Item):
+            item.item_id = self._next_id
+        self._next_id += 1
+        key = str(item).lower()
+        self._index.setdefault(key, []).append(item)
+        self._count(item, key, _quantity(item))
+        if self._by_date is not None and isinstance(item, Item):
+            # The new id is the largest, so the item goes after its date
+            dates, items = self._by_date
+            position = bisect_right(dates, date_key(item))
+            dates.insert(position, date_key(item))
+            items.insert(position, item)
+
+    def _remove(self, item):
+        """Remove an item from the stock, the index and the aggregates."""
+        self.stock.remove(item)
+        key = str(item).lower()
+        items = self._index[key]
+        items.remove(item)
+        if not items:
+            del self._index[key]
+        self._count(item, key, -_quantity(item))
+        if self._by_date is not None and isinstance(item, Item):
+            dates, items = self._by_date
+            position = _date_position(dates, items, item)
+            del dates[position]
+            del items[position]
+
+    def _restore(self, items, keys, total, categories, states, date_counts):
+        """
+        Fill an empty warehouse from saved aggregates, e.g. a sidecar.
+
+        Args:
+            items (list): The items, in stock order.
+            keys (list): The normalized name of every item.
+            total (int): The total amount of units.
+            categories (dict): The units per category.
+            states (dict): The units per state.
+            date_counts (dict): Name -> units per date of stock.
         """
-        return len(self.stock)
+        index = {}
+        for item_id, (item, key) in enumerate(zip(items, keys)):
+            item.item_id = item_id
+            bucket = index.get(key)
+            if bucket is None:
+                index[key] = [item]
+            else:
+                bucket.append(item)
+        self.stock = items
+        self._index = index
+        self._total = total
+        self._categories = categories
+        self._states = states
+        warehouse_counts = {}
+        for counts in date_counts.values():
+            for date_of_stock, count in counts.items():
+                if date_of_stock is not None:
+                    warehouse_counts[date_of_stock] = (
+                        warehouse_counts.get(date_of_stock, 0) + count
+                    )
+        self._names = {
+            name: _DateRange.restore(counts)
+            for name, counts in date_counts.items()
+        }
+        self._dates = _DateRange.restore(warehouse_counts)
+        self._by_date = None
+        self._next_id = len(items)
+
+    def _changed(self, kind, item, quantity):
+        """Count a change of the stock and publish it on the event bus."""
+        self.version += 1
+        Warehouse.stock_version += 1
+        if events.bus.subscribers:
+            events.bus.publish(kind, self, item, quantity)
 
     def add_item(self, item):
         """
@@ -175,12 +528,109 @@ class Warehouse:
         Args:
             item: The item to be added.
         """
-        self.stock.append(item)
+        self._add(item)
+        self._changed(events.ITEM_ADDED, item, _quantity(item))
+
+    def add_items(self, items):
+        """
+        Add a batch of items, e.g. a delivery, to the warehouse stock.
+
+        The items are grouped by state and category, so the index and
+        the aggregates are updated once per group rather than per item,
+        and the whole batch is one change: one new version and a single
+        ITEMS_RECEIVED event.
+
+        Args:
+            items (iterable): The Item objects to add.
+
+        Returns:
+            int: The number of units added.
+        """
+        items = list(items)
+        if not items:
+            return 0
+        stock = self.stock  # Loads a lazy warehouse first
+        groups = {}
+        next_id = self._next_id
+        for item in items:
+            item.item_id = next_id
+            next_id += 1
+            group = groups.get((item.state, item.category))
+            if group is None:
+                groups[(item.state, item.category)] = [item]
+            else:
+                group.append(item)
+        stock.extend(items)
+        self._next_id = next_id
+        if self._by_date is not None:
+            # Sorting merges the sorted index with the sorted batch
+            _, by_date = self._by_date
+            by_date.extend(items)
+            by_date.sort(key=date_key)
+            self._by_date = (list(map(date_key, by_date)), by_date)
+
+        index, names = self._index, self._names
+        categories, states = self._categories, self._states
+        units = 0
+        for (state, category), group in groups.items():
+            key = str(group[0]).lower()
+            index.setdefault(key, []).extend(group)
+            dates = names.get(key)
+            if dates is None:
+                dates = names[key] = _DateRange()
+            total = dates.total
+            dates.add_items(group)
+            amount = dates.total - total
+            self._dates.add_items(group)
+            categories[category] = categories.get(category, 0) + amount
+            states[state] = states.get(state, 0) + amount
+            units += amount
+        self._total += units
+        self._changed(events.ITEMS_RECEIVED, items, units)
+        return units
+
+    def remove_item(self, item):
+        """
+        Remove an item from the warehouse stock.
+
+        Args:
+            item: The item to be removed.
+        """
+        self._remove(item)
+        self._changed(events.ITEM_REMOVED, item, _quantity(item))
+
+    def take(self, item, quantity):
+        """
+        Take units of an item out of the warehouse stock.
+
+        The item's quantity is decremented; the item is removed once
+        all of its units are taken.
+
+        Args:
+            item (Item): The item to take units of.
+            quantity (int): The number of units wanted.
+
+        Returns:
+            int: The number of units taken.
+        """
+        available = _quantity(item)
+        if quantity >= available:
+            self._remove(item)
+            self._changed(events.ITEM_TAKEN, item, available)
+            return available
+        item.quantity -= quantity
+        self._count(item, str(item).lower(), -quantity)
+        self._changed(events.ITEM_TAKEN, item, quantity)
+        return quantity
 
     def search(self, search_item):
         """
         Search for an item in the warehouse stock.
 
+        The lookup uses the name index, so it does not scan the stock.
+        Items must be added and removed through add_item and remove_item
+        for the index to stay in sync.
+
         Args:
             search_item (str): The item to search for.
 
@@ -189,17 +639,181 @@ class Warehouse:
         """
         search_item_list = []
 
-        for item in self.stock:
-            if str(item).lower() == search_item.lower():
-                # Check if item is an instance of the Item class
-                if isinstance(item, Item):
-                    search_item_list.append((item, item.date_of_stock))
-                else:
-                    # If item is string repr., create pseudo Item without date
-                    search_item_list.append((Item(), None))
+        for item in self._index.get(search_item.lower(), ()):
+            # Check if item is an instance of the Item class
+            if isinstance(item, Item):
+                search_item_list.append((item, item.date_of_stock))
+            else:
+                # If item is string repr., create pseudo Item without date
+                search_item_list.append((Item(), None))
 
         return search_item_list
 
+    def find(self, search_text):
+        """
+        Return the items whose name contains a text.
+
+        Only the distinct names of the index are compared, not every item.
+
+        Args:
+            search_text (str): The text to look for in "state category".
+
+        Returns:
+            list: The matching items, grouped by name.
+        """
+        search_text = search_text.lower()
+        return [
+            item
+            for name, items in self._index.items()
+            if search_text in name
+            for item in items
+        ]
+
+    def _matching_names(self, search_text):
+        """Return the (name, date range) pairs whose name contains a text."""
+        search_text = search_text.lower()
+        return [
+            (name, dates)
+            for name, dates in self._names.items()
+            if search_text in name
+        ]
+
+    def availability(self, search_text):
+        """
+        Return the units matching a text and the oldest of their dates.
+
+        Only the per-name aggregates are read, not the items.
+
+        Args:
+            search_text (str): The text to look for in "state category".
+
+        Returns:
+            Tuple[int, str]: The number of matching units and their oldest
+                date of stock, None when unknown.
+        """
+        units = 0
+        oldest = None
+        for _, dates in self._matching_names(search_text):
+            units += dates.total
+            date_of_stock = dates.oldest()
+            if date_of_stock is not None and (
+                oldest is None or date_of_stock < oldest
+            ):
+                oldest = date_of_stock
+        return units, oldest
+
+    def units_by_name(self, search_text):
+        """
+        Return the units of every name matching a text.
+
+        Args:
+            search_text (str): The text to look for in "state category".
+
+        Returns:
+            dict: The number of units per normalized name.
+        """
+        return {
+            name: dates.total
+            for name, dates in self._matching_names(search_text)
+        }
+
+    def dated_units(self, search_text):
+        """
+        Return the units of every name matching a text, per date of stock.
+
+        Only the per-name aggregates are read, not the items.
+
+        Args:
+            search_text (str): The text to look for in "state category".
+
+        Returns:
+            dict: Normalized name -> list of (date, units), oldest first;
+                the units without a date come last, under None.
+        """
+        units = {}
+        for name, dates in self._matching_names(search_text):
+            dated = sorted(dates.counts.items())
+            undated = dates.total - sum(count for _, count in dated)
+            if undated > 0:
+                dated.append((None, undated))
+            units[name] = dated
+        return units
+
+    def postings(self, category=None, state=None):
+        """
+        Return the index buckets of the items of a category and state.
+
+        Only the first item of every bucket is compared, since the items
+        under one name share their state and category.
+
+        Args:
+            category (str): The category, compared case-insensitively.
+                None matches every category.
+            state (str): The state, compared case-insensitively. None
+                matches every state.
+
+        Returns:
+            List[list]: The lists of items under every matching name.
+        """
+        category = category.lower() if category is not None else None
+        state = state.lower() if state is not None else None
+        buckets = []
+        for items in self._index.values():
+            first = items[0]
+            if not isinstance(first, Item):
+                continue
+            if category is not None and (first.category or "").lower() != category:
+                continue
+            if state is not None and (first.state or "").lower() != state:
+                continue
+            buckets.append(items)
+        return buckets
+
+    def date_index(self, build=True):
+        """
+        Return the items of the stock sorted by date of stock and id.
+
+        The index is built on first use, which sorts the stock, and then
+        kept up to date: adding or removing an item inserts or deletes it
+        at its bisected position, and a batch is merged in. Items without
+        a date come first, under the date "".
+
+        Args:
+            build (bool): False returns None instead of building an index
+                that is missing.
+
+        Returns:
+            Tuple[list, list]: The sorted dates and the items in the same
+                order, for bisecting. They are the live index; do not
+                modify them.
+        """
+        if self._by_date is None:
+            if not build:
+                return None
+            # The sort is stable and the stock is in id order
+            items = sorted(
+                (item for item in self.stock if isinstance(item, Item)),
+                key=date_key,
+            )
+            self._by_date = (list(map(date_key, items)), items)
+        return self._by_date
+
+    def stocked_between(self, since=None, until=None):
+        """
+        Return the items stocked in a range of dates, oldest first.
+
+        Args:
+            since (str): The first date included, None for no bound.
+            until (str): The last date included, None for no bound. A
+                date without a time includes the whole day.
+
+        Returns:
+            list: The matching items, found by bisecting the date index.
+        """
+        dates, items = self.date_index()
+        start, end = date_bounds(dates, since, until)
+        return items[start:end]
+
     def __str__(self):
         """
         Return a string representing the warehouse.
@@ -209,21 +823,20 @@ class Warehouse:
         """
         return f"Warehouse {self.warehouse_id}"
 
-    def browse_by_category(self):
+    def browse_by_category(self, dict_item_category_count=None):
         """
         Browse items in the warehouse by category.
 
+        Args:
+            dict_item_category_count (dict): Precomputed count of items per
+                category. When omitted, the counts are computed from a
+                freshly loaded stock.
+
         Returns:
             dict: A dictionary mapping category IDs to category names.
         """
-        list_item_category = []
-        stock = Loader(model="stock")
-        for warehouse in stock:
-            for item in warehouse.stock:
-                list_item_category.append(item.category)
-        dict_item_category_count = {
-            i: list_item_category.count(i) for i in list_item_category
-        }
+        if dict_item_category_count is None:
+            dict_item_category_count = count_by_category(Loader(model="stock"))
         dict_id_category = {}
         print()
         for id, (key, value) in enumerate(dict_item_category_count.items()):
@@ -234,3 +847,133 @@ class Warehouse:
             )
         print()
         return dict_id_category
+
+
+class LazyWarehouse(Warehouse):
+    """Warehouse whose stock is read from its shard file on first access."""
+
+    def __init__(self, warehouse_id, path, manifest_entry):
+        """
+        Initialize a LazyWarehouse instance.
+
+        Args:
+            warehouse_id (str): The warehouse id.
+            path (str): The shard file holding the warehouse stock.
+            manifest_entry (dict): The manifest entry of the warehouse,
+                with its item count and category counts.
+        """
+        self.path = path
+        self.manifest_entry = manifest_entry
+        self._stock = None
+        super().__init__(warehouse_id)
+
+    @property
+    def is_loaded(self):
+        """Return True once the stock has been read from disk."""
+        return self._stock is not None
+
+    @property
+    def stock(self):
+        """Return the stock, reading the shard file on first access."""
+        if self._stock is None:
+            self._load()
+        return self._stock
+
+    @stock.setter
+    def stock(self, value):
+        """Replace the stock; the initial empty list keeps it unloaded."""
+        if value or self._stock is not None:
+            self._stock = value
+
+    def _load(self):
+        """Read the items of the shard file."""
+        self._stock = []
+        for columns in shards.parse_shard(self.path).values():
+            value, states, categories, dates, quantities = columns
+            for state, category, date_of_stock, quantity in zip(
+                states, categories, dates, quantities
+            ):
+                # Reading the shard is not a change of the stock
+                self._add(Item(state, category, date_of_stock, value, quantity))
+
+    def occupancy(self):
+        """
+        Return the total amount of items currently in the warehouse.
+
+        Returns:
+            int: The total amount of items, from the manifest until loaded.
+        """
+        if not self.is_loaded:
+            return self.manifest_entry["count"]
+        return super().occupancy()
+
+    def category_counts(self):
+        """
+        Return the number of items per category.
+
+        Returns:
+            dict: The count of items per category, from the manifest
+                until loaded.
+        """
+        if not self.is_loaded:
+            return dict(self.manifest_entry["categories"])
+        return super().category_counts()
+
+    def search(self, search_item):
+        """
+        Search for an item in the warehouse stock.
+
+        The manifest has no name index, so this loads the shard.
+        """
+        if not self.is_loaded:
+            self._load()
+        return super().search(search_item)
+
+    def find(self, search_text):
+        """
+        Return the items whose name contains a text.
+
+        The manifest has no name index, so this loads the shard.
+        """
+        if not self.is_loaded:
+            self._load()
+        return super().find(search_text)
+
+    def _matching_names(self, search_text):
+        """
+        Return the (name, date range) pairs whose name contains a text.
+
+        The manifest has no per-name counts, so this loads the shard.
+        """
+        if not self.is_loaded:
+            self._load()
+        return super()._matching_names(search_text)
+
+    def postings(self, category=None, state=None):
+        """
+        Return the index buckets of the items of a category and state.
+
+        The manifest has no per-name counts, so this loads the shard.
+        """
+        if not self.is_loaded:
+            self._load()
+        return super().postings(category, state)
+
+    def summary(self):
+        """
+        Return the aggregates of the warehouse stock.
+
+        Returns:
+            dict: The same aggregates as Warehouse.summary, from the
+                manifest until loaded.
+        """
+        if not self.is_loaded:
+            return {
+                "warehouse_id": self.warehouse_id,
+                "total": self.manifest_entry["count"],
+                "categories": dict(self.manifest_entry["categories"]),
+                "states": dict(self.manifest_entry["states"]),
+                "oldest": self.manifest_entry.get("oldest"),
+                "newest": self.manifest_entry.get("newest"),
+            }
+        return super().summary()
@@ -7,3 +7,9 @@ ANSI_BLUE = "\u001B[34m"
 ANSI_PURPLE = "\u001B[35m"
 ANSI_CYAN = "\u001B[36m"
 ANSI_WHITE = "\u001B[37m"
+
+
+def disable():
+    """Replace every ANSI color code with an empty string."""
+    for name in [name for name in globals() if name.startswith("ANSI_")]:
+        globals()[name] = ""
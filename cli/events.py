@@ -0,0 +1,198 @@
+"""
+Events module for stock change notifications.
+
+Every change to the stock of a warehouse (an item added, an item removed,
+units taken by an order, or a delivery of many items received at once) is
+published on the module-level `bus` as a StockEvent. Derived structures
+such as search indexes, caches and counters subscribe to the bus and
+update themselves incrementally instead of being rebuilt from the whole
+stock.
+
+External consumers can tail the events through an EventTail ring buffer,
+or read them from the JSON lines file named by WAREHOUSE_EVENT_LOG.
+
+Reading a lazily loaded shard is not a change and publishes nothing.
+"""
+import atexit
+import json
+import os
+import threading
+from collections import deque, namedtuple
+
+ITEM_ADDED = "added"
+ITEM_REMOVED = "removed"
+ITEM_TAKEN = "taken"
+ITEMS_RECEIVED = "received"
+
+# `quantity` is the number of units added, removed or taken; `sequence`
+# numbers the events of the bus from 1. For ITEMS_RECEIVED, `item` is the
+# list of items received and `quantity` their total units.
+StockEvent = namedtuple(
+    "StockEvent", ["sequence", "kind", "warehouse", "item", "quantity"]
+)
+
+
+class EventBus:
+    """Synchronous publisher of StockEvents to subscribed callbacks."""
+
+    def __init__(self):
+        """Initialize an EventBus instance without subscribers."""
+        self.subscribers = []
+        self.sequence = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        """
+        Call a function with every event published from now on.
+
+        Args:
+            callback (callable): Called with the StockEvent.
+
+        Returns:
+            callable: The callback, so this can be used as a decorator.
+        """
+        with self._lock:
+            self.subscribers = self.subscribers + [callback]
+        return callback
+
+    def unsubscribe(self, callback):
+        """Stop calling a subscribed function."""
+        with self._lock:
+            self.subscribers = [
+                subscriber for subscriber in self.subscribers
+                if subscriber != callback
+            ]
+
+    def publish(self, kind, warehouse, item, quantity):
+        """
+        Send an event to every subscriber.
+
+        Callers check `subscribers` first, so no event is built while
+        nobody listens.
+
+        Args:
+            kind (str): ITEM_ADDED, ITEM_REMOVED, ITEM_TAKEN or
+                ITEMS_RECEIVED.
+            warehouse (Warehouse): The warehouse that changed.
+            item: The item added, removed or taken from.
+            quantity (int): The number of units concerned.
+
+        Returns:
+            StockEvent: The published event.
+        """
+        with self._lock:
+            self.sequence += 1
+            event = StockEvent(self.sequence, kind, warehouse, item, quantity)
+            subscribers = self.subscribers
+        for subscriber in subscribers:
+            subscriber(event)
+        return event
+
+
+def event_record(event):
+    """
+    Return the JSON-serializable form of an event.
+
+    Args:
+        event (StockEvent): The event to convert.
+
+    Returns:
+        dict: The sequence, kind, warehouse id, item fields and quantity.
+            A received batch has the number of items instead of the item
+            fields.
+    """
+    item = event.item
+    if event.kind == ITEMS_RECEIVED:
+        return {
+            "sequence": event.sequence,
+            "kind": event.kind,
+            "warehouse": event.warehouse.warehouse_id,
+            "items": len(item),
+            "quantity": event.quantity,
+        }
+    return {
+        "sequence": event.sequence,
+        "kind": event.kind,
+        "warehouse": event.warehouse.warehouse_id,
+        "state": getattr(item, "state", None),
+        "category": getattr(item, "category", None),
+        "date_of_stock": getattr(item, "date_of_stock", None),
+        "quantity": event.quantity,
+    }
+
+
+class EventTail:
+    """Ring buffer of the latest events, read by sequence number."""
+
+    def __init__(self, bus, maxlen=10_000):
+        """
+        Initialize an EventTail instance subscribed to a bus.
+
+        Args:
+            bus (EventBus): The bus to record.
+            maxlen (int): The number of events kept.
+        """
+        self.bus = bus
+        self._events = deque(maxlen=maxlen)
+        bus.subscribe(self._events.append)
+
+    def read(self, since=0):
+        """
+        Return the recorded events published after a sequence number.
+
+        Args:
+            since (int): The last sequence number already seen.
+
+        Returns:
+            List[StockEvent]: The newer events, oldest first. Events that
+                dropped out of the buffer are missing; the gap shows in
+                their sequence numbers.
+        """
+        return [event for event in list(self._events)
+                if event.sequence > since]
+
+    def close(self):
+        """Stop recording."""
+        self.bus.unsubscribe(self._events.append)
+
+
+class JsonLinesSink:
+    """Subscriber appending every event to a file as a JSON line."""
+
+    def __init__(self, bus, path):
+        """
+        Initialize a JsonLinesSink instance subscribed to a bus.
+
+        Args:
+            bus (EventBus): The bus to record.
+            path (str): The file to append to.
+        """
+        self.bus = bus
+        self._file = open(path, "a", buffering=1)
+        self._lock = threading.Lock()
+        bus.subscribe(self.write)
+
+    def write(self, event):
+        """Append one event to the file."""
+        line = json.dumps(event_record(event)) + "\n"
+        with self._lock:
+            self._file.write(line)
+
+    def close(self):
+        """Stop recording and close the file."""
+        self.bus.unsubscribe(self.write)
+        with self._lock:
+            self._file.close()
+
+
+bus = EventBus()
+
+
+def _configure_from_environment():
+    """Record the events in WAREHOUSE_EVENT_LOG when it is set."""
+    path = os.environ.get("WAREHOUSE_EVENT_LOG")
+    if path:
+        atexit.register(JsonLinesSink(bus, path).close)
+
+
+_configure_from_environment()
@@ -0,0 +1,269 @@
+"""
+Exporters module for streaming CSV and NDJSON exports.
+
+This module writes the stock, the personnel and the action logs as CSV
+or newline-delimited JSON for downstream tools. Records are encoded into
+a buffer that is written out in chunks of storage.CHUNK_SIZE, so memory
+stays constant whatever the size of the export. A `.gz` file name
+compresses the output on the fly. Files are replaced atomically.
+
+The format follows the file name (`.csv`, `.ndjson` or `.jsonl`, with an
+optional `.gz`), unless given explicitly.
+
+Usage:
+    python exporters.py stock out/stock.csv.gz --category Router
+    python exporters.py personnel out/personnel.csv
+    python exporters.py logs out/actions.ndjson
+"""
+import argparse
+import csv
+import io
+import json
+import os
+
+import loader
+import storage
+from classes import Item
+from incremental_export import write_atomically
+from stock_query import query_stock
+
+FORMATS = ("csv", "ndjson")
+STOCK_FIELDS = ["warehouse", "state", "category", "date_of_stock", "quantity"]
+# Passwords are never exported
+PERSONNEL_FIELDS = ["user_name", "manager", "level"]
+LOG_FIELDS = ["log", "user_name", "kind", "action", "timestamp"]
+LOG_PATHS = {
+    "employee": os.path.join(loader.BASE_DIR, "log", "employee_log.txt"),
+    "user": os.path.join(loader.BASE_DIR, "log", "user_log.txt"),
+}
+
+
+def format_of(path):
+    """
+    Return the export format of a file name.
+
+    Args:
+        path (str): The file name, e.g. `stock.csv.gz`.
+
+    Returns:
+        str: "csv" or "ndjson".
+
+    Raises:
+        ValueError: If the extension is not known.
+    """
+    name = path[:-len(".gz")] if path.endswith(".gz") else path
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    raise ValueError(f"Cannot tell the export format of {path!r}")
+
+
+def stock_records(stock, search=None, category=None):
+    """
+    Yield the stock records of the items, optionally filtered.
+
+    Args:
+        stock: Iterable of Warehouse objects, e.g. a Loader.
+        search (str): Only export the items whose name contains this
+            text, as found by Warehouse.find.
+        category (str): Only export the items of this category.
+
+    Yields:
+        dict: One record per item, with the STOCK_FIELDS.
+    """
+    for warehouse in stock:
+        if search is not None:
+            items = warehouse.find(search)
+            if category is not None:
+                items = [item for item in items if isinstance(item, Item)
+                         and (item.category or "").lower() == category.lower()]
+        elif category is not None:
+            items = query_stock([warehouse], category=category)
+        else:
+            items = warehouse.stock
+        for item in items:
+            if not isinstance(item, Item):
+                continue
+            yield {
+                "warehouse": (item.warehouse if item.warehouse is not None
+                              else warehouse.warehouse_id),
+                "state": item.state,
+                "category": item.category,
+                "date_of_stock": item.date_of_stock,
+                "quantity": item.quantity,
+            }
+
+
+def personnel_records(personnel, manager=None, level=0):
+    """
+    Yield the personnel as a flat list, with the manager of everyone.
+
+    Args:
+        personnel (iterable): Employee records as in `personnel.json`,
+            with their `head_of` reports nested.
+        manager (str): The manager of these employees.
+        level (int): Their depth below the top of the hierarchy.
+
+    Yields:
+        dict: One record per employee, with the PERSONNEL_FIELDS.
+    """
+    for employee in personnel:
+        yield {
+            "user_name": employee["user_name"],
+            "manager": manager,
+            "level": level,
+        }
+        yield from personnel_records(employee.get("head_of") or (),
+                                     employee["user_name"], level + 1)
+
+
+def parse_log_line(line):
+    """
+    Split an action log line into its parts.
+
+    Lines read `<user>. <action>. <timestamp>.`, e.g.
+    `Jeremy. Searched for second hand printer. 2023-12-14 15:01:09.067.`
+
+    Args:
+        line (str): The log line, with or without its newline.
+
+    Returns:
+        dict: The user name, the action, its kind (first word) and the
+            timestamp, or None when the line is malformed.
+    """
+    line = line.rstrip("\n")
+    if not line.endswith("."):
+        return None
+    rest, _, timestamp = line[:-1].rpartition(". ")
+    user_name, _, action = rest.partition(". ")
+    if not user_name or not action or not timestamp:
+        return None
+    return {
+        "user_name": user_name,
+        "kind": action.split(" ", 1)[0],
+        "action": action,
+        "timestamp": timestamp,
+    }
+
+
+def log_records(log_paths=None):
+    """
+    Yield the parsed lines of the action logs, oldest first per log.
+
+    Rotated logs are read too; malformed lines are skipped.
+
+    Args:
+        log_paths (dict): Log name -> current log file. Defaults to the
+            employee and user logs.
+
+    Yields:
+        dict: One record per action, with the LOG_FIELDS.
+    """
+    for log, path in (log_paths or LOG_PATHS).items():
+        for line in storage.iter_log_lines(path):
+            record = parse_log_line(line)
+            if record is not None:
+                yield {"log": log, **record}
+
+
+def iter_chunks(records, fields, format):
+    """
+    Encode records as CSV or NDJSON, in chunks of about CHUNK_SIZE.
+
+    Args:
+        records (iterable): The records to encode.
+        fields (list): The CSV columns, in order.
+        format (str): "csv" or "ndjson".
+
+    Yields:
+        str: Consecutive pieces of the file.
+    """
+    if format not in FORMATS:
+        raise ValueError(f"Unknown format {format!r}, expected one of "
+                         f"{', '.join(FORMATS)}")
+    buffer = io.StringIO()
+    if format == "csv":
+        writer = csv.DictWriter(buffer, fields, extrasaction="ignore",
+                                lineterminator="\n")
+        writer.writeheader()
+        write = writer.writerow
+    else:
+        encoder = json.JSONEncoder()
+
+        def write(record):
+            buffer.write(encoder.encode(record))
+            buffer.write("\n")
+
+    for record in records:
+        write(record)
+        if buffer.tell() >= storage.CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export(path, records, fields, format=None):
+    """
+    Stream records to a CSV or NDJSON file.
+
+    Args:
+        path (str): The file to write; compressed when it ends in `.gz`.
+        records (iterable): The records to write.
+        fields (list): The CSV columns, in order.
+        format (str): "csv" or "ndjson". Defaults to the file extension.
+
+    Returns:
+        int: The number of records written.
+    """
+    format = format or format_of(path)
+    count = 0
+
+    def counted():
+        nonlocal count
+        for record in records:
+            count += 1
+            yield record
+
+    chunks, mode = storage.compress_chunks(
+        path, iter_chunks(counted(), fields, format)
+    )
+    write_atomically(path, chunks, mode=mode)
+    return count
+
+
+def main(argv=None):
+    """Export stock, personnel or logs from the command line."""
+    parser = argparse.ArgumentParser(description="Export data as CSV or NDJSON")
+    parser.add_argument("dataset", choices=("stock", "personnel", "logs"))
+    parser.add_argument("out", help="output file (.csv, .ndjson or .jsonl, "
+                                    "optionally .gz)")
+    parser.add_argument("--format", choices=FORMATS, default=None,
+                        help="output format (default: from the file name)")
+    parser.add_argument("--source", default=None,
+                        help="stock or personnel file to read (default: "
+                             "the data directory)")
+    parser.add_argument("--search", default=None,
+                        help="only export the stock items matching a name")
+    parser.add_argument("--category", default=None,
+                        help="only export the stock items of a category")
+    options = parser.parse_args(argv)
+
+    if options.dataset == "stock":
+        stock = loader.Loader(model="stock", path=options.source)
+        records = stock_records(stock, options.search, options.category)
+        fields = STOCK_FIELDS
+    elif options.dataset == "personnel":
+        source = (storage.iter_records(options.source)
+                  if options.source else loader.employees)
+        records, fields = personnel_records(source), PERSONNEL_FIELDS
+    else:
+        records, fields = log_records(), LOG_FIELDS
+    count = export(options.out, records, fields, options.format)
+    print(f"{count} records written to: {options.out}")
+
+
+if __name__ == "__main__":
+    main()
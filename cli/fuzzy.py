@@ -0,0 +1,138 @@
+"""
+Fuzzy search module for typo-tolerant item lookups.
+
+This module defines the TrigramIndex class, which indexes the distinct
+"state category" names of the stock (not every unit) by their character
+trigrams. Lookups count shared trigrams through the posting lists and
+return ranked candidates together with their availability per warehouse.
+"""
+from collections import Counter, defaultdict
+
+
+def trigrams(text):
+    """
+    Return the set of character trigrams of a text.
+
+    Args:
+        text (str): The text to split.
+
+    Returns:
+        set: The trigrams of the lower-cased, padded text.
+    """
+    padded = f"  {' '.join(text.lower().split())} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """Trigram index over the distinct item names of the stock."""
+
+    def __init__(self):
+        """Initialize an empty TrigramIndex instance."""
+        self.names = []
+        self.counts = []
+        self._name_ids = {}
+        self._trigram_counts = []
+        self._postings = defaultdict(set)
+
+    @classmethod
+    def from_stock(cls, stock):
+        """
+        Build an index from a list of warehouses.
+
+        Both the "state category" names and the bare categories are
+        indexed, so a misspelled category also finds all of its states.
+
+        Args:
+            stock: Iterable of Warehouse objects.
+
+        Returns:
+            TrigramIndex: The populated index.
+        """
+        index = cls()
+        for warehouse in stock:
+            for item in warehouse.stock:
+                if item.state is not None and item.category is not None:
+                    index.add(str(item), warehouse.warehouse_id, item.quantity)
+                    index.add(item.category, warehouse.warehouse_id,
+                              item.quantity)
+        return index
+
+    def add(self, name, warehouse_id, count=1):
+        """
+        Register units of an item name in a warehouse.
+
+        Args:
+            name (str): The "state category" name of the item.
+            warehouse_id: The warehouse holding the units.
+            count (int): The number of units added.
+        """
+        key = name.lower()
+        name_id = self._name_ids.get(key)
+        if name_id is None:
+            name_id = len(self.names)
+            self._name_ids[key] = name_id
+            self.names.append(key)
+            self.counts.append(Counter())
+            grams = trigrams(key)
+            self._trigram_counts.append(len(grams))
+            for gram in grams:
+                self._postings[gram].add(name_id)
+        self.counts[name_id][warehouse_id] += count
+
+    def remove(self, name, warehouse_id, count=1):
+        """
+        Unregister units of an item name from a warehouse.
+
+        Args:
+            name (str): The "state category" name of the item.
+            warehouse_id: The warehouse the units were taken from.
+            count (int): The number of units removed.
+        """
+        name_id = self._name_ids.get(name.lower())
+        if name_id is None:
+            return
+        counts = self.counts[name_id]
+        counts[warehouse_id] -= count
+        if counts[warehouse_id] <= 0:
+            del counts[warehouse_id]
+
+    def search(self, term, limit=5, min_score=0.4):
+        """
+        Return the names most similar to a search term.
+
+        The score is the share of the term's trigrams found in a name,
+        with the trigram overlap of both texts used to break ties.
+
+        Args:
+            term (str): The (possibly misspelled) search term.
+            limit (int): The maximum number of candidates.
+            min_score (float): The minimum score of a candidate.
+
+        Returns:
+            list: Tuples of (name, score, dict of count per warehouse),
+                best match first. Names without stock are left out.
+        """
+        grams = trigrams(term)
+        if not grams:
+            return []
+
+        shared = Counter()
+        for gram in grams:
+            for name_id in self._postings.get(gram, ()):
+                shared[name_id] += 1
+
+        ranked = []
+        for name_id, hits in shared.items():
+            if not self.counts[name_id]:
+                continue
+            score = hits / len(grams)
+            if score < min_score:
+                continue
+            overlap = hits / (len(grams) + self._trigram_counts[name_id] - hits)
+            ranked.append((score, overlap, name_id))
+
+        ranked.sort(key=lambda entry: (-entry[0], -entry[1], self.names[entry[2]]))
+        return [
+            (self.names[name_id], round(score, 3), dict(self.counts[name_id]))
+            for score, _, name_id in ranked[:limit]
+        ]
@@ -0,0 +1,186 @@
+"""
+Synthetic dataset generator.
+
+This module writes stock and personnel files in the same format as
+`data/stock.json` and `data/personnel.json`, at any size from a few
+thousand to millions of items. The output only depends on the seed, so
+benchmarks run on identical data every time.
+
+Usage:
+    python generator.py --items 100000 --seed 1 --out data/generated
+"""
+import argparse
+import json
+import os
+import random
+from datetime import datetime, timedelta
+
+STATES = [
+    "Funny", "White", "Almost new", "Red", "Second hand", "Original",
+    "High quality", "Elegant", "Brand new", "Blue", "Black", "Cheap",
+    "Wireless", "Exceptional",
+]
+CATEGORIES = [
+    "GPS", "Game console", "Router", "Remote control", "Camera",
+    "Smartwatch", "iOS charger", "Keyboard", "Headphones",
+    "Surveillance camera", "Tablet", "Scanner", "Beamer", "Laptop", "Mouse",
+    "Monitor", "Home-cinema", "Television", "Speakers", "HDMI cable",
+    "Printer", "Smart TV", "Smartphone", "USB hub", "Pen drive", "Microphone",
+]
+FIRST_DATE = datetime(2019, 8, 1)
+LAST_DATE = datetime(2023, 12, 31)
+BATCH_SIZE = 10_000
+
+
+def _weights(count, skew):
+    """Return Zipf-like weights, so a few values are more common."""
+    return [1 / (rank + 1) ** skew for rank in range(count)]
+
+
+def generate_stock(count, seed=0, warehouses=4, max_quantity=1):
+    """
+    Generate stock records.
+
+    Categories and states follow a mild Zipf distribution, warehouses
+    have uneven sizes and stocking dates become more frequent over time.
+
+    Args:
+        count (int): The number of items to generate.
+        seed (int): The random seed.
+        warehouses (int): The number of warehouses.
+        max_quantity (int): Above 1, every record is a delivery of 1 to
+            `max_quantity` units with a `quantity` field, and `count` is
+            the number of records.
+
+    Yields:
+        dict: A stock record with state, category, warehouse and date_of_stock.
+    """
+    rng = random.Random(seed)
+    category_weights = _weights(len(CATEGORIES), 0.3)
+    state_weights = _weights(len(STATES), 0.2)
+    warehouse_ids = list(range(1, warehouses + 1))
+    warehouse_weights = _weights(warehouses, 0.4)
+    span = (LAST_DATE - FIRST_DATE).total_seconds()
+
+    remaining = count
+    while remaining > 0:
+        size = min(BATCH_SIZE, remaining)
+        remaining -= size
+        categories = rng.choices(CATEGORIES, category_weights, k=size)
+        states = rng.choices(STATES, state_weights, k=size)
+        warehouse_column = rng.choices(warehouse_ids, warehouse_weights, k=size)
+        for category, state, warehouse in zip(categories, states,
+                                              warehouse_column):
+            # The square root skews the dates towards the recent end
+            offset = span * rng.random() ** 0.5
+            date = FIRST_DATE + timedelta(seconds=int(offset))
+            record = {
+                "state": state,
+                "category": category,
+                "warehouse": warehouse,
+                "date_of_stock": date.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+            if max_quantity > 1:
+                record["quantity"] = rng.randint(1, max_quantity)
+            yield record
+
+
+def generate_personnel(count, seed=0):
+    """
+    Generate a personnel list with nested `head_of` teams.
+
+    Args:
+        count (int): The number of employees to generate.
+        seed (int): The random seed.
+
+    Returns:
+        list: The top-level employees, each with an optional `head_of` list.
+    """
+    rng = random.Random(seed)
+    employees = [
+        {"user_name": f"Employee{number}", "password": f"pass{rng.randrange(10**6)}"}
+        for number in range(count)
+    ]
+    top_level = []
+    for employee in employees:
+        if top_level and rng.random() < 0.6:
+            manager = rng.choice(top_level)
+            manager.setdefault("head_of", []).append(employee)
+        else:
+            top_level.append(employee)
+    return top_level
+
+
+def write_json_array(records, path):
+    """
+    Write records as a JSON array without building the whole text in memory.
+
+    Args:
+        records (iterable): The records to write.
+        path (str): The output file.
+    """
+    with open(path, "w") as file:
+        file.write("[")
+        for number, record in enumerate(records):
+            if number:
+                file.write(", ")
+            file.write(json.dumps(record))
+        file.write("]")
+
+
+def generate_dataset(items, out, seed=0, warehouses=4, employees=None,
+                     max_quantity=1):
+    """
+    Write a stock.json and personnel.json pair to a directory.
+
+    Args:
+        items (int): The number of stock items.
+        out (str): The output directory.
+        seed (int): The random seed.
+        warehouses (int): The number of warehouses.
+        employees (int): The number of employees. Defaults to one per
+            thousand items, with a minimum of ten.
+        max_quantity (int): The largest quantity of an aggregated record;
+            1 writes unit records.
+
+    Returns:
+        Tuple[str, str]: The paths of the stock and personnel files.
+    """
+    os.makedirs(out, exist_ok=True)
+    if employees is None:
+        employees = max(10, items // 1000)
+    stock_path = os.path.join(out, "stock.json")
+    personnel_path = os.path.join(out, "personnel.json")
+    write_json_array(generate_stock(items, seed, warehouses, max_quantity),
+                     stock_path)
+    write_json_array(generate_personnel(employees, seed), personnel_path)
+    return stock_path, personnel_path
+
+
+def main(argv=None):
+    """Generate a dataset from the command line."""
+    parser = argparse.ArgumentParser(description="Generate a synthetic dataset")
+    parser.add_argument("--items", type=int, default=10_000,
+                        help="number of stock items (default: 10000)")
+    parser.add_argument("--warehouses", type=int, default=4,
+                        help="number of warehouses (default: 4)")
+    parser.add_argument("--employees", type=int, default=None,
+                        help="number of employees (default: items / 1000)")
+    parser.add_argument("--max-quantity", type=int, default=1,
+                        help="write aggregated records of 1 to MAX_QUANTITY "
+                             "units (default: 1, unit records)")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--out", default=os.path.join("data", "generated"),
+                        help="output directory")
+    options = parser.parse_args(argv)
+
+    stock_path, personnel_path = generate_dataset(
+        options.items, options.out, options.seed, options.warehouses,
+        options.employees, options.max_quantity,
+    )
+    print(f"Stock written to: {stock_path}")
+    print(f"Personnel written to: {personnel_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Holds module for time-limited reservations of stock.
+
+When an employee places an order, the units of its allocation plan are
+held for them while they confirm it, so another session cannot take
+them in the meantime. Only the planned units are held, so a broad search
+does not lock a whole category for other operators. Holds expire after
+a TTL; a background reaper releases them in deadline order from a timer
+heap, sleeping until the next deadline instead of scanning every hold.
+
+Holds are counted per (warehouse id, normalized item name) and leave the
+stock itself untouched; the availability shown and ordering code
+subtract the units other owners hold from what they may take.
+"""
+import heapq
+import itertools
+import os
+import threading
+import time
+
+import metrics
+
+HOLD_TTL = float(os.environ.get("WAREHOUSE_HOLD_TTL", 120))
+
+
+class Hold:
+    """Units of stock reserved for one owner until a deadline."""
+
+    def __init__(self, hold_id, owner, units, expires_at):
+        """
+        Initialize a Hold instance.
+
+        Args:
+            hold_id (int): The id of the hold.
+            owner: The session holding the units, e.g. the Employee.
+            units (dict): The units held per (warehouse id, name).
+            expires_at (float): The clock time the hold expires at.
+        """
+        self.hold_id = hold_id
+        self.owner = owner
+        self.units = units
+        self.expires_at = expires_at
+
+    @property
+    def total(self):
+        """Return the number of units held."""
+        return sum(self.units.values())
+
+
+class HoldManager:
+    """Registry of the active holds with their expiry timers."""
+
+    def __init__(self, ttl=HOLD_TTL, clock=time.monotonic):
+        """
+        Initialize a HoldManager instance.
+
+        Args:
+            ttl (float): The default lifetime of a hold, in seconds.
+            clock (callable): Returns the current time, in seconds.
+        """
+        self.ttl = ttl
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._holds = {}  # Hold id -> Hold
+        self._by_owner = {}  # Owner -> id of their active hold
+        self._held = {}  # (warehouse id, name) -> units held by all owners
+        self._timers = []  # Heap of (expires_at, hold id)
+        self._ids = itertools.count(1)
+        self._reaper = None
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+
+    def __len__(self):
+        """Return the number of active holds."""
+        return len(self._holds)
+
+    def _held_by_others(self, key, owner):
+        """Return the units of a (warehouse id, name) held by other owners."""
+        held = self._held.get(key, 0)
+        own = self._holds.get(self._by_owner.get(owner))
+        if own is not None:
+            held -= own.units.get(key, 0)
+        return held
+
+    def _release(self, hold):
+        """Forget a hold and give its units back. The lock must be held."""
+        del self._holds[hold.hold_id]
+        if self._by_owner.get(hold.owner) == hold.hold_id:
+            del self._by_owner[hold.owner]
+        for key, units in hold.units.items():
+            remaining = self._held[key] - units
+            if remaining > 0:
+                self._held[key] = remaining
+            else:
+                del self._held[key]
+
+    def place(self, owner, plan, search_item, ttl=None):
+        """
+        Hold the units of an allocation plan for an owner.
+
+        An owner has at most one hold; placing a new one releases the
+        previous one. Within a warehouse the units are held from the
+        names matching the search in index order, leaving out units
+        other owners hold.
+
+        Args:
+            owner: The session holding the units, e.g. the Employee.
+            plan (List[Tuple[Warehouse, int]]): The warehouses and units
+                to hold, e.g. from allocation.plan_allocation.
+            search_item (str): The normalized text that was searched.
+            ttl (float): The lifetime of the hold. Defaults to self.ttl.
+
+        Returns:
+            Hold: The new hold, of fewer units than planned when other
+                owners hold the rest.
+        """
+        with self._lock:
+            previous = self._holds.get(self._by_owner.get(owner))
+            if previous is not None:
+                self._release(previous)
+
+            units = {}
+            for warehouse, planned in plan:
+                names = warehouse.units_by_name(search_item)
+                for name, count in names.items():
+                    if planned <= 0:
+                        break
+                    key = (warehouse.warehouse_id, name)
+                    amount = min(planned, count - self._held.get(key, 0))
+                    if amount > 0:
+                        units[key] = amount
+                        self._held[key] = self._held.get(key, 0) + amount
+                        planned -= amount
+
+            expires_at = self.clock() + (self.ttl if ttl is None else ttl)
+            hold = Hold(next(self._ids), owner, units, expires_at)
+            self._holds[hold.hold_id] = hold
+            self._by_owner[owner] = hold.hold_id
+            earliest = not self._timers or expires_at < self._timers[0][0]
+            heapq.heappush(self._timers, (expires_at, hold.hold_id))
+
+        metrics.HOLDS.inc(result="placed")
+        if earliest:
+            # The reaper may be sleeping until a later deadline
+            self._wakeup.set()
+        return hold
+
+    def release(self, hold):
+        """
+        Release a hold before it expires.
+
+        Its timer stays in the heap and is skipped by the reaper.
+
+        Args:
+            hold (Hold): The hold to release. Released holds are ignored.
+        """
+        with self._lock:
+            if hold is not None and hold.hold_id in self._holds:
+                self._release(hold)
+                metrics.HOLDS.inc(result="released")
+
+    def available(self, stock, search_item, owner=None):
+        """
+        Return the units matching a search that an owner may take.
+
+        Args:
+            stock: Iterable of Warehouse objects.
+            search_item (str): The normalized text that was searched.
+            owner: The session asking; their own hold counts as free.
+
+        Returns:
+            dict: The free units per warehouse id, for warehouses with any.
+        """
+        counts = {}
+        with self._lock:
+            for warehouse in stock:
+                free = 0
+                for name, count in warehouse.units_by_name(search_item).items():
+                    held = self._held_by_others((warehouse.warehouse_id, name),
+                                                owner)
+                    free += max(0, count - held)
+                if free:
+                    counts[str(warehouse.warehouse_id)] = free
+        return counts
+
+    def reserved(self, search_item, owner=None):
+        """
+        Return the units other owners hold on names matching a search.
+
+        Args:
+            search_item (str): The normalized text that was searched.
+            owner: The session asking; their own hold is left out.
+
+        Returns:
+            dict: The held units per (warehouse id, name).
+        """
+        search_item = search_item.lower()
+        reserved = {}
+        with self._lock:
+            for key in self._held:
+                if search_item in key[1]:
+                    held = self._held_by_others(key, owner)
+                    if held > 0:
+                        reserved[key] = held
+        return reserved
+
+    def reap(self):
+        """
+        Release the holds whose deadline has passed.
+
+        Returns:
+            float: The seconds until the next deadline, None without holds.
+        """
+        expired = 0
+        with self._lock:
+            now = self.clock()
+            while self._timers and self._timers[0][0] <= now:
+                expires_at, hold_id = heapq.heappop(self._timers)
+                hold = self._holds.get(hold_id)
+                if hold is not None and hold.expires_at == expires_at:
+                    self._release(hold)
+                    expired += 1
+            timeout = self._timers[0][0] - now if self._timers else None
+        if expired:
+            metrics.HOLDS.inc(expired, result="expired")
+        return timeout
+
+    def start_reaper(self):
+        """Release expired holds from a daemon thread."""
+        if self._reaper is not None:
+            return
+
+        def loop():
+            while not self._stop.is_set():
+                timeout = self.reap()
+                self._wakeup.wait(timeout)
+                self._wakeup.clear()
+
+        self._stop.clear()
+        self._reaper = threading.Thread(target=loop, daemon=True,
+                                        name="hold-reaper")
+        self._reaper.start()
+
+    def stop_reaper(self):
+        """Stop the reaper thread."""
+        if self._reaper is not None:
+            self._stop.set()
+            self._wakeup.set()
+            self._reaper.join()
+            self._reaper = None
@@ -0,0 +1,169 @@
+"""
+Incremental export module for change-tracked stock exports.
+
+This module defines the IncrementalExporter class, which remembers the
+version of every warehouse it exported and, on the next export, only
+rewrites the shards of warehouses that changed since. Shards are written
+in the layout of the shards module (`stock_<warehouse>.json` plus
+`manifest.json`), streamed record by record and replaced atomically, so a
+reader never sees a half-written file.
+"""
+import json
+import os
+
+import shards
+
+_encoder = json.JSONEncoder()
+
+
+def item_record(item, warehouse):
+    """
+    Return the stock record of an item, without modifying the item.
+
+    Args:
+        item (Item): The item to convert.
+        warehouse (Warehouse): The warehouse holding the item.
+
+    Returns:
+        dict: The record, in the format of `data/stock.json`.
+    """
+    record = {
+        "state": item.state,
+        "category": item.category,
+        "warehouse": (item.warehouse if item.warehouse is not None
+                      else warehouse.warehouse_id),
+        "date_of_stock": item.date_of_stock,
+    }
+    if item.quantity != 1:
+        record["quantity"] = item.quantity
+    return record
+
+
+def write_atomically(path, chunks, mode="w"):
+    """
+    Write chunks to a temporary file and rename it over `path`.
+
+    Args:
+        path (str): The target file.
+        chunks (iterable): The text to write, in pieces.
+        mode (str): "w" for text chunks, "wb" for bytes.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    temporary_path = os.path.join(directory, f".{os.path.basename(path)}.tmp")
+    try:
+        with open(temporary_path, mode) as file:
+            for chunk in chunks:
+                file.write(chunk)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+
+def iter_json_array(records):
+    """
+    Encode records as a JSON array, one piece at a time.
+
+    Args:
+        records (iterable): The JSON-serializable records.
+
+    Yields:
+        str: Consecutive pieces of the JSON text.
+    """
+    yield "["
+    for number, record in enumerate(records):
+        if number:
+            yield ", "
+        yield from _encoder.iterencode(record)
+    yield "]"
+
+
+class IncrementalExporter:
+    """Exporter rewriting only the warehouses changed since the last export."""
+
+    def __init__(self, directory):
+        """
+        Initialize an IncrementalExporter instance.
+
+        Args:
+            directory (str): The shard directory to export to.
+        """
+        self.directory = directory
+        self._exported = {}  # Warehouse id -> exported version
+
+    def mark_clean(self, stock):
+        """
+        Treat the current state of the warehouses as already exported.
+
+        Args:
+            stock: Iterable of Warehouse objects.
+        """
+        for warehouse in stock:
+            self._exported[warehouse.warehouse_id] = warehouse.version
+
+    def dirty(self, stock):
+        """
+        Return the warehouses changed since their last export.
+
+        Args:
+            stock: Iterable of Warehouse objects.
+
+        Returns:
+            list: The changed Warehouse objects.
+        """
+        return [
+            warehouse for warehouse in stock
+            if self._exported.get(warehouse.warehouse_id) != warehouse.version
+        ]
+
+    def export(self, stock):
+        """
+        Write the shards of the changed warehouses and the manifest.
+
+        Args:
+            stock: Iterable of Warehouse objects.
+
+        Returns:
+            List[str]: The ids of the warehouses written.
+        """
+        stock = list(stock)
+        changed = self.dirty(stock)
+        if not changed:
+            return []
+        os.makedirs(self.directory, exist_ok=True)
+
+        for warehouse in changed:
+            version = warehouse.version
+            write_atomically(
+                shards.shard_path(self.directory, warehouse.warehouse_id),
+                iter_json_array(item_record(item, warehouse)
+                                for item in warehouse.stock),
+            )
+            self._exported[warehouse.warehouse_id] = version
+
+        self._write_manifest(stock)
+        return [warehouse.warehouse_id for warehouse in changed]
+
+    def _write_manifest(self, stock):
+        """Rewrite the manifest from the warehouse summaries."""
+        warehouses = {}
+        for warehouse in stock:
+            summary = warehouse.summary()
+            warehouses[warehouse.warehouse_id] = {
+                "file": os.path.basename(
+                    shards.shard_path(self.directory, warehouse.warehouse_id)
+                ),
+                "count": summary["total"],
+                "categories": summary["categories"],
+                "states": summary["states"],
+                "oldest": summary["oldest"],
+                "newest": summary["newest"],
+            }
+        manifest = {"version": shards.MANIFEST_VERSION, "warehouses": warehouses}
+        write_atomically(
+            os.path.join(self.directory, shards.MANIFEST_NAME),
+            _encoder.iterencode(manifest),
+        )
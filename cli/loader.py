@@ -3,6 +3,13 @@ import json
 import os
 import psycopg2
 
+import metrics
+import profiling
+import shards
+import sidecar
+import storage
+import validation
+
 BASE_DIR = os.path.dirname(os.path.realpath(__file__))
 EMPLOYEES_PATH = os.path.join(BASE_DIR, "data", "personnel.json")
 STOCK_PATH = os.path.join(BASE_DIR, "data", "stock.json")
@@ -84,14 +91,39 @@ class Loader:
             raise Exception("The loader requires a `model` "
                             "keyword argument to work.")
         self.model = kwargs["model"]
+        self.path = kwargs.get("path")
+        self.shards = kwargs.get("shards")
+        self.workers = kwargs.get("workers")
+        self.lazy = kwargs.get("lazy", False)
+        # Restore the stock from, or write, the index sidecar of `path`
+        self.index = kwargs.get(
+            "index", os.environ.get("WAREHOUSE_INDEX", "0") == "1"
+        )
+        self.index_thread = None  # Thread writing a stale sidecar
+        # validation.RecordErrors of the records skipped by the last parse
+        self.errors = []
         self.parse()
 
+    @profiling.profiled("load")
     def parse(self):
         """Instantiate objects from the data."""
-        if self.model == "personnel":
-            self.objects = self.__parse_personnel()
-        if self.model == "stock":
-            self.objects = self.__parse_stock()
+        metrics.RELOADS.inc(model=self.model)
+        with metrics.RELOAD_SECONDS.time(model=self.model):
+            if self.model == "personnel":
+                self.objects = self.__parse_personnel()
+            if self.model == "stock":
+                self.objects = self.__parse_stock()
+
+    def __records(self, default):
+        """
+        Return the records of the `path` file, or the default data.
+
+        The file may be gzip or lzma compressed; it is decompressed and
+        parsed as a stream.
+        """
+        if self.path is None:
+            return default
+        return storage.iter_records(self.path)
 
     def __load_class(self, name):
         """Return a class."""
@@ -104,19 +136,81 @@ class Loader:
         """Parse the personnel list."""
         Employee = self.__load_class("Employee")  # noqa: N806
 
-        return [Employee(**employee) for employee in employees]
+        report = validation.validate_personnel(self.__records(employees))
+        self.errors = report.errors
+        return [Employee(**employee) for employee in report.valid]
 
     def __parse_stock(self):
         """Parse the stock."""
+        if self.shards is not None:
+            return self.__parse_stock_shards()
         Item = self.__load_class("Item")  # noqa: N806
         Warehouse = self.__load_class("Warehouse")  # noqa: N806
+        digest = None
+        if self.path is not None and self.index:
+            digest = sidecar.file_digest(self.path)
+            restored = sidecar.load_sidecar(self.path, Warehouse, Item, digest)
+            if restored is not None:
+                self.errors = restored.errors
+                return restored.warehouses
+        report = validation.validate_stock(self.__records(items))
+        self.errors = report.errors
+        warehouses = {}
+        self.__fill(warehouses, report.valid)
+        if digest is not None:
+            # Missing or stale; the next load restores from it
+            self.index_thread = sidecar.rebuild_in_background(self.path, digest)
+        return list(warehouses.values())
+
+    def __parse_stock_shards(self):
+        """
+        Parse per-warehouse shard files in worker processes.
+
+        The rows are validated in the workers and the errors of every
+        shard are collected in `errors`. Lazily loaded shards skip their
+        invalid rows when they are read, without reporting them here.
+        """
+        if self.lazy:
+            manifest = shards.read_manifest(self.shards)
+            if manifest is not None:
+                LazyWarehouse = self.__load_class("LazyWarehouse")  # noqa: N806
+                return [
+                    LazyWarehouse(warehouse_id,
+                                  os.path.join(self.shards, entry["file"]), entry)
+                    for warehouse_id, entry in manifest.items()
+                ]
         warehouses = {}
-        for item in items:
-            warehouse_id = str(item["warehouse"])
+        errors = []
+        paths = shards.shard_paths(self.shards)
+        for report in shards.parse_shards(paths, self.workers):
+            errors.extend(report.errors)
+            self.__fill(warehouses, report.valid)
+        self.errors = errors
+        return list(warehouses.values())
+
+    def __fill(self, warehouses, columns):
+        """
+        Add the items of stock columns to their warehouses.
+
+        Args:
+            warehouses (dict): Warehouse id -> Warehouse, extended with
+                the warehouses seen for the first time.
+            columns (dict): Warehouse id -> (warehouse value, states,
+                categories, dates, quantities).
+        """
+        Item = self.__load_class("Item")  # noqa: N806
+        Warehouse = self.__load_class("Warehouse")  # noqa: N806
+        for warehouse_id, (value, states, categories, dates,
+                           quantities) in columns.items():
             if warehouse_id not in warehouses.keys():
                 warehouses[warehouse_id] = Warehouse(warehouse_id)
-            warehouses[warehouse_id].add_item(Item(**item))
-        return list(warehouses.values())
+            warehouse = warehouses[warehouse_id]
+            for state, category, date_of_stock, quantity in zip(
+                states, categories, dates, quantities
+            ):
+                warehouse.add_item(
+                    Item(state, category, date_of_stock, value, quantity)
+                )
 
     def __iter__(self, *args, **kwargs):
         """Iterate through the objects."""
@@ -129,11 +223,28 @@ class Loader:
             data = []
             for warehouse in self.objects:
                 for item in warehouse.stock:
-                    item_dict = vars(item)
-                    item_dict["warehouse"] = warehouse.id
+                    # Copy, so the item attributes are left untouched
+                    item_dict = dict(vars(item))
+                    # Ids are assigned by the warehouse, not stored
+                    item_dict.pop("item_id", None)
+                    if item_dict.get("warehouse") is None:
+                        item_dict["warehouse"] = warehouse.warehouse_id
                     data.append(item_dict)
         return data
 
+    def query(self, **filters):
+        """
+        Return the stock items matching compound filters.
+
+        Args:
+            **filters: The arguments of stock_query.query_stock, e.g.
+                category="Router", stocked_between=("2021-01-01", None).
+
+        Returns:
+            List[Item]: The matching items.
+        """
+        return _import("stock_query").query_stock(self.objects, **filters)
+
 # Add new functions to generate inserts:
     
     def generate_insert_statements(self):
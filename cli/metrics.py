@@ -0,0 +1,355 @@
+"""
+Metrics module for always-on operational metrics.
+
+This module defines a small registry of counters and fixed-bucket
+histograms. The warehouse operations record logins, searches, orders and
+loader reloads into the default registry, which can be written to disk
+as a Prometheus text file or as JSON (with p50/p99 estimates), either on
+demand or periodically from a background thread.
+
+Set WAREHOUSE_METRICS_FILE to a path ending in `.prom` or `.json` to
+dump the metrics every WAREHOUSE_METRICS_INTERVAL seconds (default: 60)
+and when the program exits.
+"""
+import atexit
+import bisect
+import json
+import os
+import threading
+import time
+
+# Latency buckets in seconds, from 100 microseconds to 10 seconds
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+# Size buckets, e.g. for units per order
+SIZE_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000, 10000)
+
+
+def _label_key(labels):
+    """Return a hashable, ordered key for a set of labels."""
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=None):
+    """Format a label key in the Prometheus text syntax."""
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    """Monotonically increasing count, optionally split by labels."""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation):
+        """
+        Initialize a Counter instance.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text of the metric.
+        """
+        self.name = name
+        self.documentation = documentation
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        """
+        Increase the counter.
+
+        Args:
+            amount (int): The amount to add.
+            **labels: The labels of the series to increase.
+        """
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        """Return the current value of a series."""
+        return self._values.get(_label_key(labels), 0)
+
+    def to_prometheus(self):
+        """Return the metric in the Prometheus text format."""
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.documentation}",
+                 f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{_format_labels(key)} {value}"
+                  for key, value in values]
+        return lines
+
+    def to_dict(self):
+        """Return the metric as a JSON-serializable dictionary."""
+        with self._lock:
+            return {_format_labels(key) or "total": value
+                    for key, value in sorted(self._values.items())}
+
+
+class _Timer:
+    """Context manager observing the elapsed time into a histogram."""
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+
+class Histogram:
+    """Distribution of observed values over fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, buckets=LATENCY_BUCKETS):
+        """
+        Initialize a Histogram instance.
+
+        Args:
+            name (str): The metric name.
+            documentation (str): The help text of the metric.
+            buckets (tuple): The sorted upper bounds of the buckets.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self._series = {}  # Label key -> [bucket counts, count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        """
+        Record a value.
+
+        Args:
+            value (float): The observed value.
+            **labels: The labels of the series.
+        """
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # One extra bucket for values above the largest bound
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+            series[0][index] += 1
+            series[1] += 1
+            series[2] += value
+
+    def time(self, **labels):
+        """Return a context manager observing its duration in seconds."""
+        return _Timer(self, labels)
+
+    def count(self, **labels):
+        """Return the number of observations of a series."""
+        series = self._series.get(_label_key(labels))
+        return series[1] if series else 0
+
+    def quantile(self, fraction, **labels):
+        """
+        Estimate a quantile by interpolating within its bucket.
+
+        Args:
+            fraction (float): The quantile, e.g. 0.99.
+            **labels: The labels of the series.
+
+        Returns:
+            float: The estimate, or None when nothing was observed.
+        """
+        series = self._series.get(_label_key(labels))
+        if not series or not series[1]:
+            return None
+        return self._quantile(series, fraction)
+
+    def _quantile(self, series, fraction):
+        """Estimate a quantile of one series."""
+        bucket_counts, count, _ = series
+        rank = fraction * count
+        seen = 0
+        for index, bucket_count in enumerate(bucket_counts):
+            if seen + bucket_count >= rank and bucket_count:
+                if index == len(self.buckets):
+                    return self.buckets[-1]
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index]
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+    def to_prometheus(self):
+        """Return the metric in the Prometheus text format."""
+        with self._lock:
+            series = sorted((key, [list(value[0]), value[1], value[2]])
+                            for key, value in self._series.items())
+        lines = [f"# HELP {self.name} {self.documentation}",
+                 f"# TYPE {self.name} histogram"]
+        for key, (bucket_counts, count, total) in series:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, bucket_counts):
+                cumulative += bucket_count
+                labels = _format_labels(key, ("le", bound))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(key, ("le", "+Inf"))
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(key)} {count}")
+        return lines
+
+    def to_dict(self):
+        """Return the metric as a JSON-serializable dictionary."""
+        with self._lock:
+            series = [(key, [list(value[0]), value[1], value[2]])
+                      for key, value in sorted(self._series.items())]
+        result = {}
+        for key, value in series:
+            _, count, total = value
+            result[_format_labels(key) or "total"] = {
+                "count": count,
+                "sum": total,
+                "p50": self._quantile(value, 0.5),
+                "p90": self._quantile(value, 0.9),
+                "p99": self._quantile(value, 0.99),
+            }
+        return result
+
+
+class Registry:
+    """Collection of named metrics."""
+
+    def __init__(self):
+        """Initialize an empty Registry instance."""
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self._dump_thread = None
+        self._stop = threading.Event()
+
+    def _get_or_create(self, cls, name, *args):
+        """Return the metric with this name, creating it if needed."""
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args)
+            elif not isinstance(metric, cls):
+                raise ValueError(f"Metric {name} is already a {metric.kind}.")
+            return metric
+
+    def counter(self, name, documentation=""):
+        """Return the counter with this name."""
+        return self._get_or_create(Counter, name, documentation)
+
+    def histogram(self, name, documentation="", buckets=LATENCY_BUCKETS):
+        """Return the histogram with this name."""
+        return self._get_or_create(Histogram, name, documentation, buckets)
+
+    def to_prometheus(self):
+        """Return every metric in the Prometheus text format."""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines += metric.to_prometheus()
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        """Return every metric as a JSON-serializable dictionary."""
+        return {name: metric.to_dict()
+                for name, metric in list(self._metrics.items())}
+
+    def dump(self, path):
+        """
+        Write the metrics to a file, replacing it atomically.
+
+        Args:
+            path (str): The target file. A `.json` extension selects JSON,
+                anything else the Prometheus text format.
+        """
+        if path.endswith(".json"):
+            content = json.dumps(self.to_dict(), indent=2)
+        else:
+            content = self.to_prometheus()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temporary_path = f"{path}.tmp"
+        with open(temporary_path, "w") as file:
+            file.write(content)
+        os.replace(temporary_path, path)
+
+    def start_periodic_dump(self, path, interval=60.0):
+        """
+        Dump the metrics every `interval` seconds from a daemon thread.
+
+        Args:
+            path (str): The target file.
+            interval (float): The number of seconds between dumps.
+        """
+        if self._dump_thread is not None:
+            return
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.dump(path)
+
+        self._stop.clear()
+        self._dump_thread = threading.Thread(target=loop, daemon=True,
+                                             name="metrics-dump")
+        self._dump_thread.start()
+
+    def stop_periodic_dump(self):
+        """Stop the periodic dump thread."""
+        if self._dump_thread is not None:
+            self._stop.set()
+            self._dump_thread.join()
+            self._dump_thread = None
+
+
+registry = Registry()
+
+LOGINS = registry.counter(
+    "warehouse_logins_total", "Employee logins by result.")
+LOGIN_SECONDS = registry.histogram(
+    "warehouse_login_seconds", "Time spent validating a login.")
+SEARCHES = registry.counter(
+    "warehouse_searches_total", "Item searches by result (hit or miss).")
+SEARCH_SECONDS = registry.histogram(
+    "warehouse_search_seconds", "Time spent searching the stock.")
+ORDERS = registry.counter(
+    "warehouse_orders_total", "Orders placed.")
+ORDER_UNITS = registry.counter(
+    "warehouse_order_units_total", "Units allocated to orders.")
+ORDER_SHORTFALL = registry.counter(
+    "warehouse_order_shortfall_units_total",
+    "Units requested beyond the available stock.")
+ORDER_SIZE = registry.histogram(
+    "warehouse_order_units", "Units allocated per order.", SIZE_BUCKETS)
+ORDER_SECONDS = registry.histogram(
+    "warehouse_order_seconds", "Time spent allocating an order.")
+HOLDS = registry.counter(
+    "warehouse_holds_total",
+    "Stock holds by outcome (placed, released or expired).")
+LOW_STOCK_ALERTS = registry.counter(
+    "warehouse_low_stock_alerts_total",
+    "Low-stock threshold crossings by kind (low or restocked).")
+RELOADS = registry.counter(
+    "warehouse_loader_reloads_total", "Data loads by model.")
+RELOAD_SECONDS = registry.histogram(
+    "warehouse_loader_parse_seconds", "Time spent parsing data by model.")
+
+
+def _configure_from_environment():
+    """Start the periodic dump from the WAREHOUSE_METRICS variables."""
+    path = os.environ.get("WAREHOUSE_METRICS_FILE")
+    if path:
+        interval = float(os.environ.get("WAREHOUSE_METRICS_INTERVAL", 60))
+        registry.start_periodic_dump(path, interval)
+        atexit.register(registry.dump, path)
+
+
+_configure_from_environment()
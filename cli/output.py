@@ -0,0 +1,170 @@
+"""
+Output module for buffered terminal rendering.
+
+This module provides the Renderer class, which collects lines in memory
+and writes them to the terminal (or a pager) in large chunks instead of
+calling print() once per line. It also holds the output options selected
+on the command line, such as summary-only listings and pagination.
+"""
+import subprocess
+import sys
+
+import colors
+
+CHUNK_SIZE = 64 * 1024
+
+OPTIONS = {
+    "summary": False,
+    "page_size": None,
+    "pager": None,
+}
+
+
+def configure(color=True, summary=False, page_size=None, pager=None):
+    """
+    Set the output options used by the listing functions.
+
+    Args:
+        color (bool): False disables all ANSI color codes.
+        summary (bool): True prints counts per warehouse only.
+        page_size (int): Number of lines shown before prompting to continue.
+        pager (str): Shell command to pipe long listings into (e.g. "less -R").
+    """
+    if not color:
+        colors.disable()
+    OPTIONS["summary"] = summary
+    OPTIONS["page_size"] = page_size
+    OPTIONS["pager"] = pager
+
+
+class Renderer:
+    """Buffered writer that flushes lines to a stream in large chunks."""
+
+    def __init__(self, stream=None, chunk_size=CHUNK_SIZE, page_size=None,
+                 pager=None, user_input=input):
+        """
+        Initialize a Renderer instance.
+
+        Args:
+            stream: File-like object to write to. Defaults to sys.stdout.
+            chunk_size (int): Number of characters buffered before a write.
+            page_size (int): Lines per page, or None to disable pagination.
+            pager (str): Shell command to pipe the output into.
+            user_input: Function used for the pagination prompt
+                (for testing purposes).
+        """
+        self.chunk_size = chunk_size
+        self.page_size = page_size
+        self.user_input = user_input
+        self.stopped = False
+        self._buffer = []
+        self._size = 0
+        self._lines_on_page = 0
+        self._process = None
+        self.stream = stream if stream is not None else sys.stdout
+
+        if pager:
+            try:
+                self._process = subprocess.Popen(
+                    pager, shell=True, stdin=subprocess.PIPE,
+                    universal_newlines=True
+                )
+                self.stream = self._process.stdin
+                # The pager handles paging itself
+                self.page_size = None
+            except OSError:
+                self._process = None
+
+    @classmethod
+    def from_options(cls, stream=None):
+        """Create a Renderer from the module-level output options."""
+        return cls(stream=stream, page_size=OPTIONS["page_size"],
+                   pager=OPTIONS["pager"])
+
+    def line(self, text=""):
+        """
+        Add a single line to the output.
+
+        Args:
+            text (str): The line to write, without a trailing newline.
+        """
+        if self.stopped:
+            return
+        self._buffer.append(text)
+        self._size += len(text) + 1
+
+        if self.page_size:
+            self._lines_on_page += 1
+            if self._lines_on_page >= self.page_size:
+                self._next_page()
+        elif self._size >= self.chunk_size:
+            self.flush()
+
+    def lines(self, texts):
+        """
+        Add several lines to the output.
+
+        Args:
+            texts (iterable): The lines to write.
+        """
+        if self.page_size:
+            for text in texts:
+                if self.stopped:
+                    return
+                self.line(text)
+            return
+
+        if self.stopped:
+            return
+        buffer = self._buffer
+        for text in texts:
+            buffer.append(text)
+            self._size += len(text) + 1
+            if self._size >= self.chunk_size:
+                self.flush()
+                buffer = self._buffer
+
+    def flush(self):
+        """Write the buffered lines to the stream."""
+        if self._buffer:
+            try:
+                self.stream.write("\n".join(self._buffer) + "\n")
+            except BrokenPipeError:
+                # The pager was closed before the end of the output
+                self.stopped = True
+            self._buffer = []
+            self._size = 0
+        try:
+            self.stream.flush()
+        except (BrokenPipeError, ValueError):
+            self.stopped = True
+
+    def _next_page(self):
+        """Flush the current page and ask whether to continue."""
+        self.flush()
+        self._lines_on_page = 0
+        answer = self.user_input(
+            f"{colors.ANSI_RESET}-- More -- (Enter to continue, q to quit) "
+        )
+        if answer.strip().lower() == "q":
+            self.stopped = True
+
+    def close(self):
+        """Flush the remaining output and wait for the pager to exit."""
+        if not self.stopped:
+            self.flush()
+        if self._process is not None:
+            try:
+                self._process.stdin.close()
+            except BrokenPipeError:
+                pass
+            self._process.wait()
+            self._process = None
+
+    def __enter__(self):
+        """Enter the runtime context."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Exit the runtime context, flushing the output."""
+        self.close()
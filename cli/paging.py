@@ -0,0 +1,146 @@
+"""
+Paging module for streaming the stock in resumable pages.
+
+Items are listed in a stable order: by warehouse, in stock order, then
+by date of stock and item id. A page ends with an opaque cursor naming
+its last item; the next page starts right after that item, found by
+bisecting the date index of its warehouse. Once the date indexes exist,
+reading a page costs O(page size) plus the bisect, not a pass over the
+stock, and a cursor stays valid while other items are added or removed.
+Building a missing index sorts the items of its warehouse once.
+
+Both live warehouses and the WarehouseSnapshots of a StockSnapshot can
+be paged; anything with a `warehouse_id` and a `date_index()` works.
+"""
+import base64
+import binascii
+import itertools
+import json
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+DEFAULT_PAGE_SIZE = 50
+
+# `rows` are (warehouse, item) pairs; `cursor` is None after the last page
+Page = namedtuple("Page", ["rows", "cursor"])
+
+
+def encode_cursor(warehouse, item):
+    """
+    Return the cursor of the position right after an item.
+
+    Args:
+        warehouse: The warehouse listing the item.
+        item: The item, with its date of stock and id.
+
+    Returns:
+        str: The opaque, URL-safe cursor.
+    """
+    position = [str(warehouse.warehouse_id), item.date_of_stock or "",
+                item.item_id]
+    return base64.urlsafe_b64encode(
+        json.dumps(position, separators=(",", ":")).encode()
+    ).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Return the position named by a cursor.
+
+    Args:
+        cursor (str): A cursor from encode_cursor.
+
+    Returns:
+        Tuple[str, str, int]: The warehouse id, date and item id.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        warehouse_id, date_of_stock, item_id = json.loads(
+            base64.urlsafe_b64decode(cursor.encode())
+        )
+    except (binascii.Error, UnicodeError, TypeError, ValueError):
+        raise ValueError(f"Invalid cursor {cursor!r}")
+    if not isinstance(date_of_stock, str) or not isinstance(item_id, int):
+        raise ValueError(f"Invalid cursor {cursor!r}")
+    return str(warehouse_id), date_of_stock, item_id
+
+
+def _start(dates, items, date_of_stock, item_id):
+    """Return the index of the first item after a (date, id) position."""
+    low = bisect_left(dates, date_of_stock)
+    high = bisect_right(dates, date_of_stock, low)
+    # Items of the same date are in id order; bisect_right grew its key
+    # argument only in Python 3.10
+    while low < high:
+        middle = (low + high) // 2
+        if items[middle].item_id <= item_id:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+def iter_stock(stock, cursor=None, warehouse=None):
+    """
+    Yield the items of the stock in listing order.
+
+    Args:
+        stock: Iterable of warehouses, e.g. a Loader or a StockSnapshot.
+        cursor (str): Start right after the position of this cursor.
+        warehouse: Only list the warehouse with this id.
+
+    Yields:
+        Tuple: The warehouse and the item.
+
+    Raises:
+        ValueError: If the cursor is malformed or names a warehouse
+            that is not listed.
+    """
+    warehouses = [
+        each for each in stock
+        if warehouse is None or str(each.warehouse_id) == str(warehouse)
+    ]
+    position = None
+    if cursor is not None:
+        warehouse_id, date_of_stock, item_id = decode_cursor(cursor)
+        ids = [str(each.warehouse_id) for each in warehouses]
+        if warehouse_id not in ids:
+            raise ValueError(f"Unknown warehouse {warehouse_id} in cursor")
+        warehouses = warehouses[ids.index(warehouse_id):]
+        position = (date_of_stock, item_id)
+    for each in warehouses:
+        dates, items = each.date_index()
+        start = 0
+        if position is not None:
+            start = _start(dates, items, *position)
+            position = None
+        for index in range(start, len(items)):
+            yield each, items[index]
+
+
+def page(stock, size=DEFAULT_PAGE_SIZE, cursor=None, warehouse=None):
+    """
+    Return one page of the stock listing.
+
+    Args:
+        stock: Iterable of warehouses, e.g. a Loader or a StockSnapshot.
+        size (int): The maximum number of items on the page.
+        cursor (str): The cursor of the previous page, None for the first.
+        warehouse: Only list the warehouse with this id.
+
+    Returns:
+        Page: The rows and the cursor of the next page.
+
+    Raises:
+        ValueError: If the size is not positive or the cursor is invalid.
+    """
+    if size < 1:
+        raise ValueError("The page size must be positive")
+    rows = list(itertools.islice(iter_stock(stock, cursor, warehouse),
+                                 size + 1))
+    if len(rows) <= size:
+        return Page(rows, None)
+    rows.pop()
+    return Page(rows, encode_cursor(*rows[-1]))
@@ -0,0 +1,236 @@
+"""
+Profiling module for opt-in timing of CLI sessions.
+
+This module records timed spans around the main operations (loading,
+authentication, search, browse, listing, ordering and log writing).
+Profiling is enabled with the WAREHOUSE_PROFILE environment variable or
+the `--profile` option; WAREHOUSE_PROFILE=cprofile (or `--cprofile`) also
+captures cProfile statistics per operation; the statistics of an
+operation leave out the operations nested in it, which have their own.
+When disabled, a span costs a single attribute check.
+
+Output, written to WAREHOUSE_PROFILE_DIR (default: profile/):
+    spans.json       count, total, mean and max time per operation
+    spans.collapsed  collapsed stacks (self time in microseconds),
+                     usable with flamegraph.pl or speedscope
+    <operation>.prof cProfile statistics, when enabled
+"""
+import atexit
+import cProfile
+import functools
+import json
+import os
+import pstats
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.realpath(__file__))
+
+
+class _Settings:
+    """Profiling switches, read on every span."""
+
+    enabled = False
+    cprofile = False
+    output_dir = os.path.join(BASE_DIR, "profile")
+
+
+settings = _Settings()
+_lock = threading.Lock()
+_local = threading.local()
+_totals = {}  # Operation name -> [count, total, max]
+_collapsed = {}  # "outer;inner" stack -> self time in seconds
+_stats = {}  # Operation name -> pstats.Stats
+
+
+def enable(cprofile=False, output_dir=None):
+    """
+    Turn profiling on.
+
+    Args:
+        cprofile (bool): True also captures cProfile stats per operation.
+        output_dir (str): The directory the results are written to.
+    """
+    settings.enabled = True
+    settings.cprofile = cprofile
+    if output_dir:
+        settings.output_dir = output_dir
+
+
+def reset():
+    """Forget every recorded span."""
+    with _lock:
+        _totals.clear()
+        _collapsed.clear()
+        _stats.clear()
+
+
+class _NullSpan:
+    """Span used while profiling is disabled."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    """Span timing one operation, nested within the current thread's spans."""
+
+    def __init__(self, name):
+        self.name = name
+        self.profiler = None
+
+    def __enter__(self):
+        stack = getattr(_local, "stack", None)
+        if stack is None:
+            stack = _local.stack = []
+            _local.profilers = []
+        if settings.cprofile:
+            # Only one profiler can run at a time: the enclosing span's is
+            # paused, so every operation gets the stats of its own code
+            profilers = _local.profilers
+            if profilers:
+                profilers[-1].disable()
+            self.profiler = cProfile.Profile()
+            profilers.append(self.profiler)
+            self.profiler.enable()
+        # Frame: name, start time, time spent in child spans
+        stack.append([self.name, time.perf_counter(), 0.0])
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.perf_counter()
+        stack = _local.stack
+        path = ";".join(frame[0] for frame in stack)
+        name, start, child_time = stack.pop()
+        elapsed = end - start
+        if stack:
+            stack[-1][2] += elapsed
+
+        if self.profiler is not None:
+            self.profiler.disable()
+            _local.profilers.pop()
+
+        with _lock:
+            total = _totals.setdefault(name, [0, 0.0, 0.0])
+            total[0] += 1
+            total[1] += elapsed
+            total[2] = max(total[2], elapsed)
+            _collapsed[path] = _collapsed.get(path, 0.0) + elapsed - child_time
+            if self.profiler is not None:
+                if name in _stats:
+                    _stats[name].add(self.profiler)
+                else:
+                    _stats[name] = pstats.Stats(self.profiler)
+        if self.profiler is not None and _local.profilers:
+            # Resumed last: reading the stats above stops any profiler
+            _local.profilers[-1].enable()
+        return False
+
+
+def span(name):
+    """
+    Return a context manager timing an operation.
+
+    Args:
+        name (str): The operation name.
+
+    Returns:
+        A context manager, which does nothing while profiling is disabled.
+    """
+    if not settings.enabled:
+        return _NULL_SPAN
+    return _Span(name)
+
+
+def profiled(name):
+    """
+    Decorate a function so every call is timed as an operation.
+
+    Args:
+        name (str): The operation name.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not settings.enabled:
+                return function(*args, **kwargs)
+            with _Span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def summary():
+    """
+    Return the recorded timings.
+
+    Returns:
+        dict: Count, total, mean and max seconds per operation.
+    """
+    with _lock:
+        return {
+            name: {
+                "count": count,
+                "total": total,
+                "mean": total / count,
+                "max": maximum,
+            }
+            for name, (count, total, maximum) in _totals.items()
+        }
+
+
+def dump(output_dir=None):
+    """
+    Write the recorded spans to disk.
+
+    Args:
+        output_dir (str): The target directory. Defaults to the
+            configured output directory.
+
+    Returns:
+        str: The directory the files were written to, or None when
+            nothing was recorded.
+    """
+    output_dir = output_dir or settings.output_dir
+    timings = summary()
+    if not timings:
+        return None
+    os.makedirs(output_dir, exist_ok=True)
+
+    with open(os.path.join(output_dir, "spans.json"), "w") as file:
+        json.dump(timings, file, indent=2)
+
+    with _lock:
+        collapsed = sorted(_collapsed.items())
+        stats = list(_stats.items())
+    with open(os.path.join(output_dir, "spans.collapsed"), "w") as file:
+        for path, seconds in collapsed:
+            file.write(f"{path} {max(1, round(seconds * 1_000_000))}\n")
+
+    for name, operation_stats in stats:
+        operation_stats.dump_stats(os.path.join(output_dir, f"{name}.prof"))
+    return output_dir
+
+
+def _configure_from_environment():
+    """Enable profiling from the WAREHOUSE_PROFILE variables."""
+    mode = os.environ.get("WAREHOUSE_PROFILE", "").lower()
+    if mode and mode not in ("0", "false", "no"):
+        enable(cprofile=mode == "cprofile",
+               output_dir=os.environ.get("WAREHOUSE_PROFILE_DIR"))
+
+
+def _dump_at_exit():
+    """Write the results when the interpreter exits."""
+    if settings.enabled:
+        dump()
+
+
+_configure_from_environment()
+atexit.register(_dump_at_exit)
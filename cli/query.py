@@ -6,19 +6,98 @@ with a Warehouse Management System. It includes commands for user
 authentication, checking stock levels,
 and performing various warehouse operations.
 """
+import argparse
 import os
 import json
+import threading
 from datetime import datetime
 from typing import List, Tuple
 
+import alerts
+import allocation
 import colors
+import metrics
+import output
+import paging
+import profiling
+import receiving
+import storage
+from cache import LRUCache, normalize_query
 from classes import Employee, Item, User, Warehouse
 from data import stock
-from loader import Loader
+from holds import HoldManager
+from incremental_export import IncrementalExporter
+from loader import STOCK_PATH, Loader
+from snapshot import SnapshotStore
+from stock_query import parse_filter, query_stock
+from views import StockViews, browse_key, search_key
+
+
+def parse_arguments(argv=None):
+    """
+    Parse the command line options of the CLI.
+
+    Args:
+        argv (List[str]): The arguments to parse. Defaults to sys.argv.
+
+    Returns:
+        argparse.Namespace: The parsed options.
+    """
+    parser = argparse.ArgumentParser(description="Warehouse Management System")
+    parser.add_argument("--no-color", action="store_true",
+                        help="disable ANSI colors in the output")
+    parser.add_argument("--summary", action="store_true",
+                        help="list only the item counts per warehouse")
+    parser.add_argument("--page-size", type=int, default=None,
+                        help="pause the listing every PAGE_SIZE lines")
+    parser.add_argument("--pager", nargs="?", default=None,
+                        const=os.environ.get("PAGER", "less -R"),
+                        help="pipe listings into a pager (default: $PAGER)")
+    parser.add_argument("--profile", action="store_true",
+                        help="time every operation and write the results "
+                             "to the profile/ directory")
+    parser.add_argument("--cprofile", action="store_true",
+                        help="like --profile, also capturing cProfile stats")
+    parser.add_argument("--allocation", choices=allocation.POLICIES,
+                        default=allocation.OPTIONS["policy"],
+                        help="how orders are split across warehouses "
+                             "(default: %(default)s)")
+    return parser.parse_args(argv)
+
+
+# Parsed before the data is loaded, so --profile also times the loading
+options = parse_arguments() if __name__ == "__main__" else None
+if options is not None and (options.profile or options.cprofile):
+    profiling.enable(cprofile=options.cprofile)
 
 personnel_loader = Loader(model="personnel")  # List of Employee objects
-stock_loader = Loader(model="stock")  # List of Warehouse objects
+# List of Warehouse objects, read from WAREHOUSE_STOCK (data/stock.json by
+# default), or loaded lazily when WAREHOUSE_SHARDS names a directory of
+# per-warehouse shards. With WAREHOUSE_INDEX=1 the warehouses are restored
+# from the index sidecar of the stock file, written on the first launch
+stock_loader = Loader(
+    model="stock", path=os.environ.get("WAREHOUSE_STOCK", STOCK_PATH),
+    shards=os.environ.get("WAREHOUSE_SHARDS"), lazy=True,
+)
 stock = stock_loader.objects
+# Changed warehouses are written back to WAREHOUSE_EXPORT_DIR after a session
+exporter = None
+if os.environ.get("WAREHOUSE_EXPORT_DIR"):
+    exporter = IncrementalExporter(os.environ["WAREHOUSE_EXPORT_DIR"])
+    if os.environ["WAREHOUSE_EXPORT_DIR"] == os.environ.get("WAREHOUSE_SHARDS"):
+        exporter.mark_clean(stock_loader)
+# Search and browse results, keyed on the normalized query
+search_cache = LRUCache(maxsize=int(os.environ.get("WAREHOUSE_CACHE_SIZE", 256)))
+_stock_views = None  # StockViews of stock_loader, created on first use
+# Held while changing the stock, so snapshots never show half an order
+stock_write_lock = threading.RLock()
+_snapshot_store = None  # SnapshotStore of stock_loader, created on first use
+# Units shown to an employee are held for them until they answer, then
+# only the planned units while they confirm, at most WAREHOUSE_HOLD_TTL
+# seconds
+holds = HoldManager()
+# Low-stock alerts for the thresholds in WAREHOUSE_ALERTS, if set
+alert_engine = alerts.from_environment(stock_loader)
 
 class AuthenticationError(Exception):
     """
@@ -44,6 +123,7 @@ def get_user_name() -> str:
     return username.capitalize()
 
 
+@profiling.profiled("authenticate")
 def validate_user(personnel, password, user_name) -> Employee:
     """
     Validate the user and return the authorized employee.
@@ -56,15 +136,18 @@ def validate_user(personnel, password, user_name) -> Employee:
     Returns:
         Employee: The authorized employee.
     """
-    for staff in personnel:
-        if staff.is_named(user_name):
-            if staff.authenticate(password):
-                staff.is_authenticated = True
-                print(f"{colors.ANSI_RESET}{'-' * 150}")
-                staff.greet()
-                return staff
+    with metrics.LOGIN_SECONDS.time():
+        for staff in personnel:
+            if staff.is_named(user_name):
+                if staff.authenticate(password):
+                    staff.is_authenticated = True
+                    metrics.LOGINS.inc(result="success")
+                    print(f"{colors.ANSI_RESET}{'-' * 150}")
+                    staff.greet()
+                    return staff
 
     # If no matching user is found, return None or raise an exception
+    metrics.LOGINS.inc(result="failure")
     raise AuthenticationError("Authentication failed")
 
 
@@ -140,22 +223,15 @@ def search_item_in_stock(stock, search_item) -> Tuple[List[str], dict, str]:
     return location, item_count_in_warehouse_dict, search_item
 
 
-def search_and_order_item(stock) -> Tuple[List[str], dict, str]:
-    """
-    Search for an item in the warehouse stock and provide options for ordering.
+def quantity_label(item):
+    """Return the quantity suffix shown for items of several units."""
+    if item.quantity == 1:
+        return ""
+    return f" (x{item.quantity})"
 
-    Args:
-        stock (List[dict]): The list of items in stock.
 
-    Returns:
-        Tuple: A tuple containing the locations where the item is found,
-            a dictionary with the count of the item in each warehouse,
-            and the searched item.
-    """
-    search_item = input(
-        f"\n{colors.ANSI_RESET}Enter the item that you are searching: "
-        f"{colors.ANSI_YELLOW}"
-    ).lower()
+def _scan_items(stock, search_item):
+    """Scan every warehouse for items whose name contains a search text."""
     location = []
     item_count_in_warehouse_dict = {}
 
@@ -166,19 +242,139 @@ def search_and_order_item(stock) -> Tuple[List[str], dict, str]:
                     f"{item.state.lower()} " f"{item.category.lower()}"
                 )
                 if search_item in item_name:
-                    
+
                     warehouse_id = warehouse.warehouse_id
                     location.append(
                         f"{item.state} {item.category.lower()}"
-                        f" - Warehouse {warehouse_id}"
+                        f" - Warehouse {warehouse_id}{quantity_label(item)}"
                     )
                     if warehouse_id in item_count_in_warehouse_dict:
-                        item_count_in_warehouse_dict[warehouse_id] += 1
+                        item_count_in_warehouse_dict[warehouse_id] += item.quantity
                     else:
-                        item_count_in_warehouse_dict[warehouse_id] = 1
+                        item_count_in_warehouse_dict[warehouse_id] = item.quantity
+
+    return location, item_count_in_warehouse_dict
+
+
+def stock_views():
+    """
+    Return the derived views of the live stock.
+
+    The views are recreated, and the cache emptied, when stock_loader is
+    replaced.
+
+    Returns:
+        StockViews: The views following stock_loader.
+    """
+    global _stock_views
+    if _stock_views is None or _stock_views.loader is not stock_loader:
+        if _stock_views is not None:
+            _stock_views.close()
+        search_cache.clear()
+        _stock_views = StockViews(stock_loader, search_cache)
+    return _stock_views
+
+
+def stock_snapshot():
+    """
+    Return a consistent, immutable snapshot of the live stock.
+
+    Returns:
+        StockSnapshot: The latest snapshot of stock_loader.
+    """
+    global _snapshot_store
+    if _snapshot_store is None or _snapshot_store.stock is not stock_loader:
+        if _snapshot_store is not None:
+            _snapshot_store.close()
+        _snapshot_store = SnapshotStore(stock_loader, stock_write_lock)
+    return _snapshot_store.snapshot()
+
+
+@profiling.profiled("search")
+def find_items(stock, search_item):
+    """
+    Find the items whose "state category" name contains a search text.
+
+    Results for the live stock are cached until a change of the stock
+    touches a matching item; results for other stocks are cached until
+    the stock version changes.
+
+    Args:
+        stock (List[Warehouse]): The warehouses to search.
+        search_item (str): The normalized text to search for.
+
+    Returns:
+        Tuple: A list with the location of every matching item and
+            a dictionary with the count of the item in each warehouse.
+    """
+    with metrics.SEARCH_SECONDS.time():
+        key = search_key(stock, search_item)
+        # Entries of the live stock are evicted by the views instead
+        version = 0 if stock_views().covers(stock) else Warehouse.stock_version
+        found, result = search_cache.get(key, version)
+        if not found:
+            result = _scan_items(stock, search_item)
+            search_cache.put(key, version, result)
+
+    location, item_count_in_warehouse_dict = result
+    metrics.SEARCHES.inc(result="hit" if location else "miss")
+    return list(location), dict(item_count_in_warehouse_dict)
+
+
+def search_and_order_item(stock) -> Tuple[List[str], dict, str]:
+    """
+    Search for an item in the warehouse stock and provide options for ordering.
+
+    Args:
+        stock (List[dict]): The list of items in stock.
+
+    Returns:
+        Tuple: A tuple containing the locations where the item is found,
+            a dictionary with the count of the item in each warehouse,
+            and the searched item.
+    """
+    search_item = normalize_query(input(
+        f"\n{colors.ANSI_RESET}Enter the item that you are searching: "
+        f"{colors.ANSI_YELLOW}"
+    ))
+    location, item_count_in_warehouse_dict = find_items(stock, search_item)
 
     return location, item_count_in_warehouse_dict, search_item
 
+
+def fuzzy_search_item(search_item, limit=5):
+    """
+    Return the item names closest to a possibly misspelled search.
+
+    Args:
+        search_item (str): The item that was searched.
+        limit (int): The maximum number of candidates.
+
+    Returns:
+        list: Tuples of (name, score, dict of count per warehouse),
+            best match first.
+    """
+    return stock_views().fuzzy_index().search(search_item, limit=limit)
+
+
+def print_suggestions(search_item):
+    """
+    Print the closest matches for a search that found nothing.
+
+    Args:
+        search_item (str): The item that was searched.
+    """
+    candidates = fuzzy_search_item(search_item)
+    if not candidates:
+        return
+    print(f"{colors.ANSI_RESET}\nDid you mean:")
+    for name, _, counts in candidates:
+        print(
+            f"{' ' * 15}{colors.ANSI_BLUE}{name}{colors.ANSI_RESET} "
+            f"({sum(counts.values())} available)"
+        )
+
+
 def process_search_and_order(actions, authorized_employee):
     """
     Search for an item, display availability, and provide options for ordering.
@@ -191,31 +387,44 @@ def process_search_and_order(actions, authorized_employee):
         None
     """
     location, item_count_in_warehouse_dict, search_item = search_and_order_item(stock)
+    hold = None
+    if len(location) > 0 and isinstance(authorized_employee, Employee):
+        hold, item_count_in_warehouse_dict = hold_stock(
+            search_item, authorized_employee
+        )
     if len(location) > 0:
-        print(f"\n{colors.ANSI_RESET}Quantity Availability: {len(location)}\n")
-        print("Location:")
-        for i in location:
-            print(f"{' ' * 15}{colors.ANSI_BLUE}{i}{colors.ANSI_RESET}")
-        for warehouse, count in item_count_in_warehouse_dict.items():
-            if max(item_count_in_warehouse_dict.values()) == count:
-                print(
-                    f"\nMaximum availability: {colors.ANSI_BLUE}{count} "
-                    f"in {warehouse}{colors.ANSI_RESET}\n"
-                )
-        print("." * 120)
-
-        if isinstance(authorized_employee, Employee):
-            place_order = input(
-                f"Do you want to place an order for the item {search_item}?"
-                f" (y/n) - {colors.ANSI_YELLOW}"
+        try:
+            print(
+                f"\n{colors.ANSI_RESET}Quantity Availability: "
+                f"{sum(item_count_in_warehouse_dict.values())}\n"
             )
-            if place_order.lower() == "y":
-                placing_order(
-                    search_item, sum(item_count_in_warehouse_dict.values()), actions
+            print("Location:")
+            for i in location:
+                print(f"{' ' * 15}{colors.ANSI_BLUE}{i}{colors.ANSI_RESET}")
+            for warehouse, count in item_count_in_warehouse_dict.items():
+                if max(item_count_in_warehouse_dict.values()) == count:
+                    print(
+                        f"\nMaximum availability: {colors.ANSI_BLUE}{count} "
+                        f"in {warehouse}{colors.ANSI_RESET}\n"
+                    )
+            print("." * 120)
+
+            if isinstance(authorized_employee, Employee):
+                place_order = input(
+                    f"Do you want to place an order for the item "
+                    f"{search_item}? (y/n) - {colors.ANSI_YELLOW}"
                 )
+                if place_order.lower() == "y":
+                    placing_order(
+                        search_item, sum(item_count_in_warehouse_dict.values()),
+                        actions, authorized_employee,
+                    )
+        finally:
+            holds.release(hold)
 
     else:
         print(f"{colors.ANSI_RED}\nNot in stock")
+        print_suggestions(search_item)
 
     actions.append(f"Searched for {search_item}")
     continue_session = input(
@@ -237,29 +446,145 @@ def validate_order_quantity(search_item):
         print(f"{colors.ANSI_RED}Invalid input! Please enter a valid integer.{colors.ANSI_RESET}")
         return None
 
-def placing_order(search_item, total_item_count_in_warehouses, actions):
+@profiling.profiled("order")
+def take_items(search_item, quantity, plan=None, reserved=None):
+    """
+    Take up to `quantity` units matching a search out of the stock.
+
+    Items are matched the same way as in `find_items` and taken from
+    the warehouses chosen by the allocation planner. Items of several
+    units are decremented rather than removed.
+
+    Args:
+        search_item (str): The normalized text that was searched.
+        quantity (int): The number of units to take.
+        plan (List[Tuple[Warehouse, int]]): A plan from
+            allocation.plan_allocation. Planned here when omitted.
+        reserved (dict): Units per (warehouse id, name) held by other
+            sessions, which are left alone.
+
+    Returns:
+        int: The number of units actually taken.
+    """
+    with metrics.ORDER_SECONDS.time():
+        # Planned under the lock too, so no other order changes the
+        # availability the plan is computed from
+        with stock_write_lock:
+            if plan is None:
+                plan = allocation.plan_allocation(stock_loader, search_item,
+                                                  quantity, reserved=reserved)
+            taken = allocation.execute_allocation(plan, search_item,
+                                                  reserved=reserved)
+
+    metrics.ORDERS.inc()
+    metrics.ORDER_UNITS.inc(taken)
+    metrics.ORDER_SIZE.observe(taken)
+    if taken < quantity:
+        metrics.ORDER_SHORTFALL.inc(quantity - taken)
+    return taken
+
+
+def receive_delivery(records, source=None):
+    """
+    Add a delivery to the live stock as one batch.
+
+    Args:
+        records (iterable): The delivered stock records, e.g. from
+            receiving.iter_delivery.
+        source (str): The file the records came from, for the journal.
+
+    Returns:
+        receiving.Receipt: The batch id, the items and units added and
+            the records left out.
+    """
+    return receiving.receive(stock_loader, records, source=source,
+                             write_lock=stock_write_lock)
+
+
+def hold_stock(search_item, authorized_employee):
+    """
+    Hold the units matching a search that are shown to an employee.
+
+    The hold lasts until the employee answers, when confirm_order narrows
+    it to the planned units, or until it expires.
+
+    Args:
+        search_item (str): The normalized text that was searched.
+        authorized_employee (Employee): The employee the units are shown to.
+
+    Returns:
+        Tuple[Hold, dict]: The hold and the units per warehouse id the
+            employee may order, leaving out units held by other sessions.
+    """
+    with stock_write_lock:
+        counts = holds.available(stock_loader, search_item,
+                                 authorized_employee)
+        shown = [
+            (warehouse, counts[str(warehouse.warehouse_id)])
+            for warehouse in stock_loader
+            if str(warehouse.warehouse_id) in counts
+        ]
+        hold = holds.place(authorized_employee, shown, search_item)
+    return hold, counts
+
+
+def confirm_order(search_item, quantity, actions, owner=None):
+    """
+    Show the allocation plan of an order and place it once confirmed.
+
+    Args:
+        search_item (str): The normalized text that was searched.
+        quantity (int): The number of units to order.
+        actions (list): The session actions, appended to when ordered.
+        owner: The session ordering; units other sessions hold are skipped.
+    """
+    # Planning and holding form one step, so two sessions never plan
+    # against the same free units
+    with stock_write_lock:
+        reserved = holds.reserved(search_item, owner)
+        plan = allocation.plan_allocation(stock_loader, search_item, quantity,
+                                          reserved=reserved)
+        # Replaces the hold of the units shown with the planned units only
+        hold = (holds.place(owner, plan, search_item)
+                if owner is not None else None)
+    try:
+        print(f"{colors.ANSI_RESET}\nAllocation "
+              f"({allocation.OPTIONS['policy']}):")
+        for line in allocation.describe_plan(plan):
+            print(f"{' ' * 4}{colors.ANSI_PURPLE}{line}{colors.ANSI_RESET}")
+        confirm = input(f"{colors.ANSI_BLUE}Place this order? (y/n) - "
+                        f"{colors.ANSI_YELLOW}")
+        if confirm.lower() != "y":
+            print(f"{colors.ANSI_RESET}Order cancelled.")
+            return
+
+        with stock_write_lock:
+            # Holds placed by others since the plan was made count too
+            ordered = take_items(search_item, quantity, plan,
+                                 holds.reserved(search_item, owner))
+    finally:
+        holds.release(hold)
+
+    # save_stock_data_to_json(stock_loader.objects)
+    print(f"{colors.ANSI_RESET}{'%' * 150}")
+    print(f"\n{' ' * 50}{colors.ANSI_GREEN}Order placed: "
+          f"{ordered} * {search_item}{colors.ANSI_RESET}\n")
+    print(f"{'%' * 150}")
+    actions.append(f"Ordered {ordered} of {search_item}")
+
+
+def placing_order(search_item, total_item_count_in_warehouses, actions,
+                  owner=None):
     order_quantity = validate_order_quantity(search_item)
 
     if order_quantity is not None:
         if order_quantity <= total_item_count_in_warehouses:
-            for warehouse in stock_loader:
-                for item in warehouse.stock:
-                    if isinstance(item, Item) and item.category.lower() == search_item.lower():
-                        warehouse.stock.remove(item)
-                        # Update the order quantity
-                        order_quantity -= 1  
-
-                        if order_quantity == 0:
-                            break
-
-            # save_stock_data_to_json(stock_loader.objects)
-            print(f"{colors.ANSI_RESET}{'%' * 150}")
-            print(f"\n{' ' * 50}{colors.ANSI_GREEN}Order placed: "
-                  f"{order_quantity} * {search_item}{colors.ANSI_RESET}\n")
-            print(f"{'%' * 150}")
-            actions.append(f"Ordered {order_quantity} of {search_item}")
+            confirm_order(search_item, order_quantity, actions, owner)
 
         else:
+            metrics.ORDER_SHORTFALL.inc(
+                order_quantity - total_item_count_in_warehouses
+            )
             print(f"{colors.ANSI_RESET}{'-' * 100}")
             print(f"{colors.ANSI_RED}There are not this many available. "
                   f"The maximum quantity that can be ordered is "
@@ -271,23 +596,8 @@ def placing_order(search_item, total_item_count_in_warehouses, actions):
                 f"(y/n) -  {colors.ANSI_YELLOW}")
 
             if ask_order_max.lower() == "y":
-                for warehouse in stock_loader:
-                    for item in warehouse.stock:
-                        if isinstance(item, Item) and item.category.lower() == search_item.lower():
-                            warehouse.stock.remove(item)
-                            # Update the order quantity
-                            order_quantity -= 1
-                
-                            if order_quantity == 0:
-                                break
-
-                # save_stock_data_to_json(stock_loader.objects)            
-                print(f"{colors.ANSI_RESET}{'%' * 150}")
-                print(f"\n{' ' * 50}{colors.ANSI_GREEN}Order placed: "
-                      f"{total_item_count_in_warehouses} * "
-                      f"{search_item}{colors.ANSI_RESET}\n")
-                print(f"{'%' * 150}")
-                actions.append(f"Ordered {total_item_count_in_warehouses} of {search_item}")
+                confirm_order(search_item, total_item_count_in_warehouses,
+                              actions, owner)
 
 BASE_DIR = os.path.dirname(os.path.realpath(__file__))
 STOCK_JSON_PATH = os.path.join(BASE_DIR, "data", "stock.json")
@@ -342,10 +652,47 @@ STOCK_JSON_PATH = os.path.join(BASE_DIR, "data", "stock.json")
 #         json_file.write(json.dumps(stock_data))
 
 
+@profiling.profiled("browse")
+def category_counts():
+    """
+    Return the number of items per category in the live stock.
+
+    Returns:
+        dict: The count of items per category, kept up to date by the views.
+    """
+    return stock_views().category_counts()
+
+
+@profiling.profiled("browse")
+def browse_category(category):
+    """
+    Return the items of a category with their warehouse.
+
+    Args:
+        category (str): The category to browse.
+
+    Returns:
+        List[Tuple[Item, Warehouse]]: The matching items, cached until
+            a change of the stock touches the category.
+    """
+    key = browse_key(category)
+    stock_views()
+    found, result = search_cache.get(key, 0)
+    if not found:
+        result = [
+            (item, warehouse)
+            for warehouse in stock_loader
+            for item in warehouse.stock
+            if item.category == category
+        ]
+        search_cache.put(key, 0, result)
+    return result
+
+
 def category_selection(actions, authorized_employee):
     """Browse items by category."""
     category_select = Warehouse()
-    dict_id_category = category_select.browse_by_category()
+    dict_id_category = category_select.browse_by_category(category_counts())
     select_category = input(f"Type the category number to browse: {colors.ANSI_YELLOW}")
     print()
 
@@ -356,14 +703,12 @@ def category_selection(actions, authorized_employee):
             category_name = value_id
             count_items_by_category = 0
 
-            for warehouse in stock_loader:
-                for item in warehouse.stock:
-                    if value_id == item.category:
-                        count_items_by_category += 1
-                        print(
-                            f"{' ' * 25}{colors.ANSI_GREEN}{item.state} "
-                            f"{item.category}, {warehouse}"
-                        )
+            for item, warehouse in browse_category(value_id):
+                count_items_by_category += item.quantity
+                print(
+                    f"{' ' * 25}{colors.ANSI_GREEN}{item.state} "
+                    f"{item.category}, {warehouse}{quantity_label(item)}"
+                )
 
     if int(select_category) not in dict_id_category.keys():
         print(f"{colors.ANSI_RED}Invalid input!{colors.ANSI_RESET}")
@@ -384,6 +729,52 @@ def category_selection(actions, authorized_employee):
         run(actions, authorized_employee)
 
 
+@profiling.profiled("filter")
+def filter_stock(expression):
+    """
+    Return the items matching a filter expression.
+
+    Args:
+        expression (str): Terms such as
+            `category:router state:red since:2021-01-01 limit:10`.
+
+    Returns:
+        List[Item]: The matching items, read under the write lock so no
+            order is seen half-way.
+
+    Raises:
+        ValueError: If the expression is not valid.
+    """
+    filters = parse_filter(expression)
+    with stock_write_lock:
+        return query_stock(stock_loader, **filters)
+
+
+def filter_selection(actions):
+    """Filter the stock with a filter expression."""
+    print(
+        "Filter terms: category:, state:, warehouse:, since:, until:, "
+        "limit:, order: (date, -date, quantity, -quantity)"
+    )
+    expression = input(f"Type the filter: {colors.ANSI_YELLOW}")
+    print(colors.ANSI_RESET)
+    try:
+        items = filter_stock(expression)
+    except ValueError as error:
+        print(f"{colors.ANSI_RED}Invalid filter: {error}{colors.ANSI_RESET}")
+    else:
+        for item in items:
+            print(
+                f"{' ' * 25}{colors.ANSI_GREEN}{item.state} {item.category}, "
+                f"Warehouse {item.warehouse}, {item.date_of_stock}"
+                f"{quantity_label(item)}{colors.ANSI_RESET}"
+            )
+        print(f"{'.' * 120}")
+        print(f"\nMatching items: {sum(item.quantity for item in items)}\n")
+        print("." * 120)
+        actions.append(f"Filtered the stock by {expression}")
+
+
 def select_operation(user_input=input):
     """
     Display the main menu and return the user's selection.
@@ -397,53 +788,95 @@ def select_operation(user_input=input):
         print("1. List items by warehouse")
         print("2. Search an item and place an order")
         print("3. Browse by category")
-        print("4. Quit")
+        print("4. Filter stock")
+        print("5. Quit")
 
-        user_selection = user_input("Enter your selection (1-4): ")
+        user_selection = user_input("Enter your selection (1-5): ")
 
         # Attempt to convert the user input to an integer
         selection = int(user_selection)
 
-        if 1 <= selection <= 4:
+        if 1 <= selection <= 5:
             return str(selection)
         else:
-            print(f"{colors.ANSI_RED}Invalid input! Please enter a number between 1 and 4.{colors.ANSI_RESET}")
+            print(f"{colors.ANSI_RED}Invalid input! Please enter a number between 1 and 5.{colors.ANSI_RESET}")
             return select_operation(user_input=user_input)
     except ValueError:
         print(f"{colors.ANSI_RED}Invalid input! Please enter a valid number.{colors.ANSI_RESET}")
         return select_operation(user_input=user_input)
 
-def item_list_by_warehouse():
-    """List items by warehouse."""
-    total_items = 0  # Initialize total_items counter
-    warehouses = []
+@profiling.profiled("listing")
+def stock_page(size=paging.DEFAULT_PAGE_SIZE, cursor=None, warehouse=None):
+    """
+    Return one page of the stock listing, e.g. for a front end.
 
-    for warehouse in stock_loader:
-        # Create a list to store item info in the warehouse
-        warehouse_items = []
+    The page is read from the current snapshot. Publishing a snapshot
+    after a change copies the warehouses changed since the previous one,
+    in O(their items), reusing the order of their live date indexes; a
+    page of an unchanged snapshot costs O(size) plus a bisect, however
+    large the stock is.
 
-        for item in warehouse.stock:
-            if isinstance(item, Item):
-                item_name = f"{item.state.lower()} {item.category.lower()}"
-                warehouse_items.append(item_name)
+    Args:
+        size (int): The maximum number of items on the page.
+        cursor (str): The cursor of the previous page, None for the first.
+        warehouse: Only list the warehouse with this id.
 
-        # Print warehouse and item info
-        print(f"{colors.ANSI_BLUE}Warehouse: {warehouse} {colors.ANSI_RESET}")
+    Returns:
+        paging.Page: (warehouse snapshot, item record) rows and the cursor
+            of the next page, None after the last one.
+    """
+    return paging.page(stock_snapshot(), size, cursor, warehouse)
 
-        for item_name in warehouse_items:
-            print(f"  {colors.ANSI_BLUE}{item_name}{colors.ANSI_RESET}")
 
-        print(
-            f"{colors.ANSI_BLUE}Total items in {warehouse}: "
-            f"{len(warehouse.stock)} {colors.ANSI_RESET} "
-        )
-        print(f"{'-' * 100}")
+@profiling.profiled("listing")
+def item_list_by_warehouse(summary_only=None):
+    """
+    List items by warehouse.
+
+    The listing reads a snapshot of the stock, so orders placed while
+    it is written do not show up half-way. It is rendered into a buffer
+    and written in large chunks, optionally through a pager or page by
+    page.
+
+    Args:
+        summary_only (bool): True prints only the counts per warehouse.
+            Defaults to the `--summary` command line option.
+
+    Returns:
+        Tuple: The total amount of items and the list of warehouse
+            snapshots.
+    """
+    if summary_only is None:
+        summary_only = output.OPTIONS["summary"]
+    total_items = 0  # Initialize total_items counter
+    warehouses = []
+
+    with output.Renderer.from_options() as renderer:
+        for warehouse in stock_snapshot():
+            # Print warehouse and item info
+            renderer.line(
+                f"{colors.ANSI_BLUE}Warehouse: {warehouse} {colors.ANSI_RESET}"
+            )
 
-        total_items += len(warehouse.stock)
-        # Append warehouse to the list
-        warehouses.append(warehouse)
+            if not summary_only:
+                blue, reset = colors.ANSI_BLUE, colors.ANSI_RESET
+                renderer.lines(
+                    f"  {blue}{item.state.lower()} "
+                    f"{item.category.lower()}{quantity_label(item)}{reset}"
+                    for item in warehouse.items
+                )
+
+            renderer.line(
+                f"{colors.ANSI_BLUE}Total items in {warehouse}: "
+                f"{warehouse.occupancy()} {colors.ANSI_RESET} "
+            )
+            renderer.line(f"{'-' * 100}")
 
-    print(f"Total items in all warehouses: {total_items}")
+            total_items += warehouse.occupancy()
+            # Append warehouse to the list
+            warehouses.append(warehouse)
+
+        renderer.line(f"Total items in all warehouses: {total_items}")
     return total_items, warehouses
 
 
@@ -468,37 +901,49 @@ def run(actions, authorized_employee=None, user_input=input):
         elif menu_selection == "2":
             search_result = search_and_order_item(stock)
             location, item_count_in_warehouse_dict, search_item = search_result
+            hold = None
+            if len(location) > 0 and isinstance(authorized_employee, Employee):
+                hold, item_count_in_warehouse_dict = hold_stock(
+                    search_item, authorized_employee
+                )
             # Continue with the rest of the operations using the obtained data
             if len(location) > 0:
-                print(
-                    f"\n{colors.ANSI_BLUE}Quantity Availability: " f"{len(location)}\n"
-                )
-                print("Location:")
-                for i in location:
-                    print(f"{' ' * 15}{colors.ANSI_BLUE}{i}{colors.ANSI_RESET}")
-                for warehouse, count in item_count_in_warehouse_dict.items():
-                    if max(item_count_in_warehouse_dict.values()) == count:
-                        print(
-                            f"\nMaximum availability: "
-                            f"{colors.ANSI_BLUE}{count} "
-                            f"in {warehouse}{colors.ANSI_RESET}\n"
-                        )
-                print("." * 120)
-
-                if isinstance(authorized_employee, Employee):
-                    place_order = input(
-                        f"Do you want to place an order for the item "
-                        f"{search_item}? (y/n) - {colors.ANSI_YELLOW}"
+                try:
+                    print(
+                        f"\n{colors.ANSI_BLUE}Quantity Availability: "
+                        f"{sum(item_count_in_warehouse_dict.values())}\n"
                     )
-                    if place_order.lower() in ("y", "Y"):
-                        placing_order(
-                            search_item,
-                            sum(item_count_in_warehouse_dict.values()),
-                            actions,
+                    print("Location:")
+                    for i in location:
+                        print(f"{' ' * 15}{colors.ANSI_BLUE}{i}"
+                              f"{colors.ANSI_RESET}")
+                    for warehouse, count in item_count_in_warehouse_dict.items():
+                        if max(item_count_in_warehouse_dict.values()) == count:
+                            print(
+                                f"\nMaximum availability: "
+                                f"{colors.ANSI_BLUE}{count} "
+                                f"in {warehouse}{colors.ANSI_RESET}\n"
+                            )
+                    print("." * 120)
+
+                    if isinstance(authorized_employee, Employee):
+                        place_order = input(
+                            f"Do you want to place an order for the item "
+                            f"{search_item}? (y/n) - {colors.ANSI_YELLOW}"
                         )
+                        if place_order.lower() in ("y", "Y"):
+                            placing_order(
+                                search_item,
+                                sum(item_count_in_warehouse_dict.values()),
+                                actions,
+                                authorized_employee,
+                            )
+                finally:
+                    holds.release(hold)
             else:
-                search_item = ""
                 print(f"{colors.ANSI_RED}\nNot in stock")
+                print_suggestions(search_item)
+                search_item = ""
 
             if search_item is not None:
                 actions.append(f"Searched for {search_item}")
@@ -514,22 +959,40 @@ def run(actions, authorized_employee=None, user_input=input):
         elif menu_selection == "3":
             category_selection(actions, authorized_employee)
 
-        # Else, if user selects operation 4
+        # Else, if user picks operation 4
         elif menu_selection == "4":
+            filter_selection(actions)
+            continue_session = input(
+                f"\n{'*' * 20}  {colors.ANSI_BLUE}Do you want to continue "
+                f"with another operation? (y/n){colors.ANSI_RESET}  "
+                f"{'*' * 20}   -   {colors.ANSI_YELLOW}"
+            )
+            if continue_session.lower() != "y":
+                break
+
+        # Else, if user selects operation 5
+        elif menu_selection == "5":
             break
 
         else:
             print("*" * 150)
             print(
                 f"{colors.ANSI_RED}Invalid input, please enter a number "
-                f"between 1 and 4 for a valid operation{colors.ANSI_RESET}"
+                f"between 1 and 5 for a valid operation{colors.ANSI_RESET}"
             )
             print("*" * 150)
 
 
+@profiling.profiled("session")
 def start_shopping():
     """Starts the shopping application."""
     actions = []
+    if stock_loader.errors:
+        print(
+            f"{colors.ANSI_RED}{len(stock_loader.errors)} problems in the "
+            f"stock data; the invalid records were skipped "
+            f"(see validation.py).{colors.ANSI_RESET}"
+        )
     username = get_user_name()
     authorized_employee = user_authentication(username)
 
@@ -546,7 +1009,11 @@ def start_shopping():
     # Create the log directory if it doesn't exist
     os.makedirs(os.path.dirname(log_file), exist_ok=True)
 
-    run(actions, authorized_employee, user_input=input)
+    holds.start_reaper()
+    try:
+        run(actions, authorized_employee, user_input=input)
+    finally:
+        holds.stop_reaper()
 
     print()
 
@@ -557,19 +1024,34 @@ def start_shopping():
     if isinstance(authorized_employee, Employee):
         authorized_employee.bye(actions)
         employee_log_path = os.path.join(BASE_DIR, "log/employee_log.txt")
-        with open(employee_log_path, 'a') as file1:
-            for action in actions:
-                log_entry = f"{username}. {action.strip()}. {timestamp}.\n"
-                file1.write(log_entry)
+        with profiling.span("log"):
+            storage.append_log(employee_log_path, [
+                f"{username}. {action.strip()}. {timestamp}.\n"
+                for action in actions
+            ])
 
     else:
         authorized_employee.bye(actions)
         user_log_path = os.path.join(BASE_DIR, "log/user_log.txt")
-        with open(user_log_path, 'a') as file1:
-            for action in actions:
-                log_entry = f"{username}. {action.strip()}. {timestamp}.\n"
-                file1.write(log_entry)
+        with profiling.span("log"):
+            storage.append_log(user_log_path, [
+                f"{username}. {action.strip()}. {timestamp}.\n"
+                for action in actions
+            ])
+
+    if exporter is not None:
+        exporter.export(stock_loader)
+    if stock_loader.index_thread is not None:
+        # A short session must not cut the first sidecar write off
+        stock_loader.index_thread.join()
 
 
 if __name__=="__main__":
+    output.configure(
+        color=not options.no_color,
+        summary=options.summary,
+        page_size=options.page_size,
+        pager=options.pager,
+    )
+    allocation.OPTIONS["policy"] = options.allocation
     start_shopping()
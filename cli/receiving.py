@@ -0,0 +1,286 @@
+"""
+Receiving module for bulk deliveries of stock.
+
+A goods-received file lists the delivered items, as CSV with the columns
+`state,category,warehouse,date_of_stock,quantity` or as JSON lines (a
+JSON array works too). `receive` validates the records, journals the
+whole batch as one line of the receipts journal, then adds the items to
+their warehouses with Warehouse.add_items, which updates the indexes and
+counters once per batch.
+
+The journal is written and synced before the stock changes. When the
+stock is saved to a file, as `main` does, the entry names that file and
+a second line marks the batch applied once the file is replaced; a batch
+journaled for a file but never marked, e.g. after a crash, is replayed
+by `replay_journal` the next time the file is received into. Batches
+received into a live stock only, e.g. through query.receive_delivery,
+are kept in the journal as a record.
+
+Usage:
+    python receiving.py delivery.csv --stock data/stock.json
+"""
+import argparse
+import contextlib
+import csv
+import json
+import os
+import uuid
+from collections import namedtuple
+from datetime import datetime
+
+import loader
+import storage
+import validation
+from classes import Item
+from incremental_export import item_record, iter_json_array, write_atomically
+
+JOURNAL_PATH = os.environ.get(
+    "WAREHOUSE_RECEIPTS_JOURNAL",
+    os.path.join(loader.BASE_DIR, "log", "receipts.jsonl"),
+)
+
+# `errors` are the validation.RecordErrors of the records left out
+Receipt = namedtuple("Receipt", ["batch", "items", "units", "errors"])
+
+
+def _csv_record(row):
+    """Convert a CSV row to a stock record; empty cells are left out."""
+    record = {key: value for key, value in row.items() if value not in ("", None)}
+    for field in ("warehouse", "quantity"):
+        value = record.get(field)
+        if isinstance(value, str) and value.strip().isdigit():
+            record[field] = int(value)
+    return record
+
+
+def iter_delivery(path):
+    """
+    Stream the records of a goods-received file.
+
+    Args:
+        path (str): A `.csv`, `.jsonl`/`.ndjson` or `.json` file, plain or
+            compressed.
+
+    Yields:
+        dict: The records, as in `stock.json`.
+    """
+    name = path
+    for suffix in (".gz", ".xz", ".lzma"):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    if name.endswith(".json"):
+        yield from storage.iter_records(path)
+        return
+    with storage.open_text(path) as file:
+        if name.endswith(".csv"):
+            for row in csv.DictReader(file):
+                yield _csv_record(row)
+            return
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _journal(path, entry):
+    """Append one batch to the journal as a single synced line."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    line = json.dumps(entry) + "\n"
+    with open(path, "a") as file:
+        file.write(line)
+        file.flush()
+        os.fsync(file.fileno())
+
+
+def receive(stock, records, journal=JOURNAL_PATH, source=None,
+            stock_path=None, write_lock=None):
+    """
+    Add a delivery to the stock as one batch.
+
+    Records for warehouses not in the stock, and records that fail
+    validation, are left out and reported.
+
+    Args:
+        stock: Iterable of Warehouse objects, e.g. a Loader.
+        records (iterable): The delivered stock records.
+        journal (str): The receipts journal, None to skip journaling.
+        source (str): The file the records came from, for the journal.
+        stock_path (str): The file the stock is saved to afterwards. The
+            caller marks the batch applied with `mark_applied` once the
+            file is written, otherwise the batch is replayed.
+        write_lock (threading.RLock): The lock writers of `stock` hold,
+            e.g. query.stock_write_lock for the live stock. The batch is
+            added under it; required when other threads use the stock.
+
+    Returns:
+        Receipt: The batch id, the numbers of items and units added and
+            the errors.
+    """
+    warehouses = {str(warehouse.warehouse_id): warehouse for warehouse in stock}
+    report = validation.validate_stock(records, warehouse_ids=set(warehouses))
+    batch = uuid.uuid4().hex
+    if journal is not None and report.valid:
+        entry = {
+            "batch": batch,
+            "received_at": datetime.now().isoformat(timespec="milliseconds"),
+            "source": source,
+            "columns": report.valid,
+        }
+        if stock_path is not None:
+            entry["stock"] = os.path.abspath(stock_path)
+        _journal(journal, entry)
+    with write_lock or contextlib.nullcontext():
+        return _apply(warehouses, batch, report.valid, report.errors)
+
+
+def _apply(warehouses, batch, columns, errors):
+    """Add compiled delivery columns to their warehouses."""
+    items = units = 0
+    for warehouse_id, (value, states, categories, dates,
+                       quantities) in columns.items():
+        units += warehouses[warehouse_id].add_items(
+            Item(state, category, date_of_stock, value, quantity)
+            for state, category, date_of_stock, quantity
+            in zip(states, categories, dates, quantities)
+        )
+        items += len(states)
+    return Receipt(batch, items, units, errors)
+
+
+def mark_applied(batch, journal=JOURNAL_PATH):
+    """
+    Record in the journal that a batch was saved to its stock file.
+
+    Args:
+        batch (str): The batch id of the Receipt.
+        journal (str): The receipts journal.
+    """
+    _journal(journal, {"batch": batch, "applied": True})
+
+
+def read_journal(path=JOURNAL_PATH):
+    """
+    Read the batches of a receipts journal, oldest first.
+
+    A torn last line, left by a crash while journaling, is ignored; its
+    batch was never applied.
+
+    Args:
+        path (str): The journal file.
+
+    Returns:
+        List[dict]: The journal entries, without the applied markers.
+    """
+    if not os.path.exists(path):
+        return []
+    entries = []
+    with open(path) as file:
+        for line in file:
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                break
+    return [entry for entry in entries if "applied" not in entry]
+
+
+def pending_batches(stock_path, journal=JOURNAL_PATH):
+    """
+    Return the batches journaled for a stock file but never saved to it.
+
+    Args:
+        stock_path (str): The stock file.
+        journal (str): The receipts journal.
+
+    Returns:
+        List[dict]: The journal entries of the pending batches, oldest
+            first.
+    """
+    if not os.path.exists(journal):
+        return []
+    stock_path = os.path.abspath(stock_path)
+    entries, applied = [], set()
+    with open(journal) as file:
+        for line in file:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                break
+            if "applied" in entry:
+                applied.add(entry["batch"])
+            elif entry.get("stock") == stock_path:
+                entries.append(entry)
+    return [entry for entry in entries if entry["batch"] not in applied]
+
+
+def replay_journal(stock, stock_path, journal=JOURNAL_PATH, write_lock=None):
+    """
+    Add the pending batches of a stock file to its loaded stock.
+
+    Args:
+        stock: Iterable of Warehouse objects loaded from `stock_path`.
+        stock_path (str): The stock file.
+        journal (str): The receipts journal.
+        write_lock (threading.RLock): The lock writers of `stock` hold.
+
+    Returns:
+        List[Receipt]: One receipt per replayed batch. The caller marks
+            them applied once the stock file is saved.
+    """
+    warehouses = {str(warehouse.warehouse_id): warehouse for warehouse in stock}
+    receipts = []
+    with write_lock or contextlib.nullcontext():
+        for entry in pending_batches(stock_path, journal):
+            columns = {warehouse_id: column
+                       for warehouse_id, column in entry["columns"].items()
+                       if warehouse_id in warehouses}
+            receipts.append(_apply(warehouses, entry["batch"], columns, []))
+    return receipts
+
+
+def save_stock(stock, path):
+    """
+    Replace a stock file with the current stock.
+
+    Args:
+        stock: Iterable of Warehouse objects, e.g. a Loader.
+        path (str): The stock file, compressed again when it ends in
+            `.gz`, `.xz` or `.lzma`.
+    """
+    chunks, mode = storage.compress_chunks(path, iter_json_array(
+        item_record(item, warehouse)
+        for warehouse in stock
+        for item in warehouse.stock
+    ))
+    write_atomically(path, chunks, mode=mode)
+
+
+def main(argv=None):
+    """Receive a delivery into a stock file from the command line."""
+    parser = argparse.ArgumentParser(description="Receive a delivery of stock")
+    parser.add_argument("delivery", help="goods-received file (.csv, .jsonl "
+                                         "or .json, optionally compressed)")
+    parser.add_argument("--stock", default=loader.STOCK_PATH,
+                        help="stock file to add the delivery to")
+    parser.add_argument("--journal", default=JOURNAL_PATH,
+                        help="receipts journal (default: log/receipts.jsonl)")
+    options = parser.parse_args(argv)
+
+    stock = loader.Loader(model="stock", path=options.stock)
+    recovered = replay_journal(stock, options.stock, options.journal)
+    for receipt in recovered:
+        print(f"Replayed {receipt.units} units of the unsaved batch "
+              f"{receipt.batch}")
+    receipt = receive(stock, iter_delivery(options.delivery), options.journal,
+                      source=options.delivery, stock_path=options.stock)
+    for error in receipt.errors:
+        print(error)
+    save_stock(stock, options.stock)
+    for saved in recovered + [receipt]:
+        mark_applied(saved.batch, options.journal)
+    print(f"Received {receipt.units} units in {receipt.items} items "
+          f"(batch {receipt.batch}), {len(receipt.errors)} errors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+Replay module for load testing with recorded sessions.
+
+The action logs hold every session of the CLI: its actions are written
+together when the user quits, so the lines of one user sharing a
+timestamp form one session. This module turns them back into sessions
+of operations, runs `multiplier` copies of every session concurrently
+against the query layer, and reports the throughput, the latency
+percentiles of every kind of operation and the orders that could not be
+filled completely ("lost" orders).
+
+Actions are replayed as:
+
+    Listed ...                  every page of query.stock_page
+    Searched for X              query.find_items(query.stock, X)
+    Browsed the category C      query.browse_category(C)
+    Ordered N of X              query.take_items(X, N)
+    Filtered the stock by E     query.filter_stock(E)
+
+Orders change the stock in memory only; nothing is written back. An
+operation that raises is counted as an error with its exception, and so
+is an exception raised in any other thread while the sessions run, e.g.
+by an event subscriber, so races under load are not hidden.
+
+Usage:
+    python replay.py --multiplier 20 --workers 16
+    python replay.py --stock data/100000/stock.json --out replay.json
+"""
+import argparse
+import json
+import math
+import threading
+import time
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import query
+from benchmark import use_stock
+from exporters import LOG_PATHS, log_records
+from loader import Loader
+
+KINDS = ("list", "search", "browse", "order", "filter")
+
+# `argument` is the search, category or filter; `quantity` the units ordered
+Operation = namedtuple("Operation", ["kind", "argument", "quantity"])
+Session = namedtuple("Session", ["log", "user_name", "timestamp", "operations"])
+# One run of an operation; `taken` is only set for orders
+Result = namedtuple("Result", ["kind", "seconds", "quantity", "taken", "error"])
+# `thread_errors` are the exceptions raised in other threads during the run
+ReplayReport = namedtuple("ReplayReport",
+                          ["sessions", "seconds", "results", "thread_errors"])
+
+
+def parse_action(action):
+    """
+    Convert a logged action to the operation replaying it.
+
+    Args:
+        action (str): The action of a log line, e.g. "Ordered 3 of red router".
+
+    Returns:
+        Operation: The operation, or None for actions that are not
+            replayed, e.g. a search that found nothing or an empty order.
+    """
+    if action.startswith("Listed "):
+        return Operation("list", None, 0)
+    if action.startswith("Searched for "):
+        return Operation("search", action[len("Searched for "):], 0)
+    if action.startswith("Browsed the category "):
+        return Operation("browse", action[len("Browsed the category "):], 0)
+    if action.startswith("Filtered the stock by "):
+        return Operation("filter", action[len("Filtered the stock by "):], 0)
+    if action.startswith("Ordered "):
+        quantity, _, search_item = action[len("Ordered "):].partition(" of ")
+        if quantity.isdigit() and int(quantity) > 0 and search_item:
+            return Operation("order", search_item, int(quantity))
+    return None
+
+
+def load_sessions(log_paths=None):
+    """
+    Read the recorded sessions from the action logs.
+
+    Args:
+        log_paths (dict): Log name -> current log file. Defaults to the
+            employee and user logs.
+
+    Returns:
+        List[Session]: The sessions with at least one replayed operation,
+            in the order of the logs.
+    """
+    sessions = []
+    key = None
+    for record in log_records(log_paths or LOG_PATHS):
+        operation = parse_action(record["action"])
+        if operation is None:
+            continue
+        record_key = (record["log"], record["user_name"], record["timestamp"])
+        if record_key != key:
+            key = record_key
+            sessions.append(Session(*key, []))
+        sessions[-1].operations.append(operation)
+    return sessions
+
+
+def run_operation(operation):
+    """
+    Run one operation against the query layer.
+
+    Args:
+        operation (Operation): The operation to run.
+
+    Returns:
+        int: The units taken by an order, None for other operations.
+
+    Raises:
+        ValueError: If the kind of the operation is unknown.
+    """
+    if operation.kind == "list":
+        cursor = None
+        while True:
+            cursor = query.stock_page(cursor=cursor).cursor
+            if cursor is None:
+                return None
+    if operation.kind == "search":
+        query.find_items(query.stock, operation.argument)
+    elif operation.kind == "browse":
+        query.browse_category(operation.argument)
+    elif operation.kind == "filter":
+        query.filter_stock(operation.argument)
+    elif operation.kind == "order":
+        return query.take_items(operation.argument, operation.quantity)
+    else:
+        raise ValueError(f"Unknown operation {operation.kind!r}")
+    return None
+
+
+def _describe(exception):
+    """Return the type and message of an exception, for the report."""
+    return f"{type(exception).__name__}: {exception}"
+
+
+def run_session(session):
+    """
+    Run the operations of a session one after the other.
+
+    An operation that fails is recorded with its error and the session
+    goes on, as a user would.
+
+    Args:
+        session (Session): The session to run.
+
+    Returns:
+        List[Result]: One result per operation.
+    """
+    results = []
+    for operation in session.operations:
+        taken = error = None
+        start = time.perf_counter()
+        try:
+            taken = run_operation(operation)
+        except Exception as exception:
+            error = _describe(exception)
+        results.append(Result(operation.kind, time.perf_counter() - start,
+                              operation.quantity, taken, error))
+    return results
+
+
+def replay(sessions, multiplier=1, workers=None):
+    """
+    Run copies of the sessions concurrently.
+
+    Args:
+        sessions (List[Session]): The sessions to replay.
+        multiplier (int): The number of copies of every session.
+        workers (int): The number of sessions running at the same time.
+            Defaults to one per copy, at most 32.
+
+    Returns:
+        ReplayReport: The number of sessions run, the wall time in
+            seconds, the results of every operation and the exceptions
+            raised in other threads meanwhile.
+
+    Raises:
+        ValueError: If the multiplier or the number of workers is not
+            positive.
+    """
+    if multiplier < 1:
+        raise ValueError(f"The multiplier must be positive, not {multiplier}")
+    runs = [session for session in sessions for _ in range(multiplier)]
+    if workers is None:
+        workers = max(1, min(32, len(runs)))
+    if workers < 1:
+        raise ValueError(f"The number of workers must be positive, not {workers}")
+
+    # Created once here rather than raced for by the first sessions
+    query.stock_views()
+    query.stock_snapshot()
+    thread_errors = []
+    excepthook = threading.excepthook
+
+    def record(arguments):
+        thread_errors.append(_describe(arguments.exc_value))
+        excepthook(arguments)
+
+    threading.excepthook = record
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = [result
+                       for session_results in executor.map(run_session, runs)
+                       for result in session_results]
+    finally:
+        threading.excepthook = excepthook
+    return ReplayReport(len(runs), time.perf_counter() - start, results,
+                        thread_errors)
+
+
+def percentile(values, fraction):
+    """
+    Return a percentile of values by the nearest-rank method.
+
+    Args:
+        values (List[float]): The values, in any order.
+        fraction (float): The percentile as a fraction, e.g. 0.99.
+
+    Returns:
+        float: The value, or None without values.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def summarize(report):
+    """
+    Compute the figures of a replay.
+
+    Args:
+        report (ReplayReport): The replay.
+
+    Returns:
+        dict: The totals, the throughput in operations per second, the
+            errors per exception type, the latency percentiles per kind
+            in seconds and the lost orders.
+    """
+    errors = Counter(result.error.split(":", 1)[0]
+                     for result in report.results if result.error is not None)
+    errors.update(error.split(":", 1)[0] for error in report.thread_errors)
+    latencies = {}
+    for result in report.results:
+        latencies.setdefault(result.kind, []).append(result.seconds)
+    orders = [result for result in report.results if result.kind == "order"]
+    lost = [result for result in orders
+            if result.error is not None or result.taken < result.quantity]
+    return {
+        "sessions": report.sessions,
+        "operations": len(report.results),
+        "seconds": report.seconds,
+        "throughput": (len(report.results) / report.seconds
+                       if report.seconds else None),
+        "errors": sum(errors.values()),
+        "error_types": dict(errors.most_common()),
+        "latency": {
+            kind: {
+                "count": len(values),
+                "p50": percentile(values, 0.5),
+                "p95": percentile(values, 0.95),
+                "p99": percentile(values, 0.99),
+                "max": max(values),
+            }
+            for kind, values in sorted(latencies.items(),
+                                       key=lambda pair: KINDS.index(pair[0]))
+        },
+        "orders": len(orders),
+        "lost_orders": len(lost),
+        "lost_units": sum(result.quantity - (result.taken or 0)
+                          for result in lost),
+    }
+
+
+def _milliseconds(seconds):
+    """Format a latency for the summary."""
+    return f"{seconds * 1000:.2f} ms"
+
+
+def main(argv=None):
+    """Replay the recorded sessions from the command line."""
+    parser = argparse.ArgumentParser(
+        description="Replay the logged sessions against the query layer"
+    )
+    parser.add_argument("--employee-log", default=LOG_PATHS["employee"],
+                        help="employee action log (default: log/employee_log.txt)")
+    parser.add_argument("--user-log", default=LOG_PATHS["user"],
+                        help="user action log (default: log/user_log.txt)")
+    parser.add_argument("--stock", default=None,
+                        help="stock file to replay against (default: the live stock)")
+    parser.add_argument("--multiplier", type=int, default=1,
+                        help="copies of every session (default: 1)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="sessions running at the same time (default: "
+                             "one per copy, at most 32)")
+    parser.add_argument("--out", default=None, help="write the summary to this JSON file")
+    options = parser.parse_args(argv)
+
+    sessions = load_sessions({"employee": options.employee_log,
+                              "user": options.user_log})
+    if options.stock:
+        with use_stock(Loader(model="stock", path=options.stock)):
+            report = replay(sessions, options.multiplier, options.workers)
+    else:
+        report = replay(sessions, options.multiplier, options.workers)
+    summary = summarize(report)
+
+    print(f"{summary['sessions']} sessions, {summary['operations']} operations "
+          f"in {summary['seconds']:.2f} s "
+          f"({summary['throughput'] or 0:.1f} operations/s), "
+          f"{summary['errors']} errors")
+    for error_type, count in summary["error_types"].items():
+        print(f"{error_type:>24}: {count}")
+    for kind, figures in summary["latency"].items():
+        print(f"{kind:>8}: {figures['count']} runs, "
+              f"p50 {_milliseconds(figures['p50'])}, "
+              f"p95 {_milliseconds(figures['p95'])}, "
+              f"p99 {_milliseconds(figures['p99'])}, "
+              f"max {_milliseconds(figures['max'])}")
+    print(f"Lost orders: {summary['lost_orders']} of {summary['orders']} "
+          f"({summary['lost_units']} units)")
+
+    if options.out:
+        with open(options.out, "w") as file:
+            json.dump(summary, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""
+Shards module for per-warehouse stock files.
+
+This module splits a stock file into one file per warehouse
+(`stock_<warehouse>.json`) plus a small `manifest.json` holding the item
+count and the category and state counts of every warehouse. Shards can be
+parsed in parallel worker processes, which return compact columns (states,
+categories and dates) that the Loader assembles into Warehouse objects,
+or loaded lazily one warehouse at a time. The rows of a shard are checked
+by validation.validate_stock as they are parsed, like a stock file, and
+invalid rows are left out.
+
+Usage:
+    python shards.py data/stock.json data/shards
+"""
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import validation
+
+SHARD_PREFIX = "stock_"
+SHARD_SUFFIX = ".json"
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+
+
+def shard_path(directory, warehouse_id):
+    """Return the shard file of a warehouse."""
+    return os.path.join(directory, f"{SHARD_PREFIX}{warehouse_id}{SHARD_SUFFIX}")
+
+
+def shard_paths(directory):
+    """
+    Return the shard files of a directory.
+
+    Args:
+        directory (str): The shard directory.
+
+    Returns:
+        List[str]: The shard paths, sorted by file name.
+    """
+    return [
+        os.path.join(directory, name)
+        for name in sorted(os.listdir(directory))
+        if name.startswith(SHARD_PREFIX) and name.endswith(SHARD_SUFFIX)
+    ]
+
+
+def write_shards(records, directory):
+    """
+    Split stock records into one file per warehouse.
+
+    Args:
+        records (iterable): Stock records with a `warehouse` key.
+        directory (str): The output directory.
+
+    Returns:
+        dict: The number of records (not units) written per warehouse id.
+    """
+    os.makedirs(directory, exist_ok=True)
+    by_warehouse = {}
+    for record in records:
+        by_warehouse.setdefault(str(record["warehouse"]), []).append(record)
+    for warehouse_id, warehouse_records in by_warehouse.items():
+        with open(shard_path(directory, warehouse_id), "w") as file:
+            json.dump(warehouse_records, file)
+    write_manifest(directory, by_warehouse)
+    return {warehouse_id: len(warehouse_records)
+            for warehouse_id, warehouse_records in by_warehouse.items()}
+
+
+def write_manifest(directory, by_warehouse):
+    """
+    Write the manifest describing the shards of a directory.
+
+    Args:
+        directory (str): The shard directory.
+        by_warehouse (dict): Warehouse id -> list of stock records.
+    """
+    warehouses = {}
+    for warehouse_id, records in by_warehouse.items():
+        categories = {}
+        states = {}
+        count = 0
+        for record in records:
+            quantity = record.get("quantity", 1)
+            count += quantity
+            categories[record.get("category")] = (
+                categories.get(record.get("category"), 0) + quantity
+            )
+            states[record.get("state")] = (
+                states.get(record.get("state"), 0) + quantity
+            )
+        dates = [record["date_of_stock"] for record in records
+                 if record.get("date_of_stock") is not None]
+        warehouses[warehouse_id] = {
+            "file": os.path.basename(shard_path(directory, warehouse_id)),
+            "count": count,
+            "categories": categories,
+            "states": states,
+            "oldest": min(dates) if dates else None,
+            "newest": max(dates) if dates else None,
+        }
+    with open(os.path.join(directory, MANIFEST_NAME), "w") as file:
+        json.dump({"version": MANIFEST_VERSION, "warehouses": warehouses}, file)
+
+
+def read_manifest(directory):
+    """
+    Read the manifest of a shard directory.
+
+    Args:
+        directory (str): The shard directory.
+
+    Returns:
+        dict: Warehouse id -> manifest entry, or None when the directory
+            has no manifest of a supported version.
+    """
+    path = os.path.join(directory, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path) as file:
+        manifest = json.load(file)
+    if manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest["warehouses"]
+
+
+def read_shard(path):
+    """
+    Parse and validate one shard.
+
+    Args:
+        path (str): The shard file.
+
+    Returns:
+        validation.ValidationReport: The columns of the valid rows, and
+            the errors of the others. An error's index names the shard
+            file and the row, e.g. "stock_2.json[3]".
+    """
+    with open(path) as file:
+        records = json.loads(file.read())
+    report = validation.validate_stock(records)
+    name = os.path.basename(path)
+    return report._replace(errors=[
+        error._replace(index=f"{name}[{error.index}]")
+        for error in report.errors
+    ])
+
+
+def parse_shard(path):
+    """
+    Parse one shard into columns, leaving out invalid rows.
+
+    Args:
+        path (str): The shard file.
+
+    Returns:
+        dict: Warehouse id -> (warehouse value, states, categories, dates,
+            quantities).
+    """
+    return read_shard(path).valid
+
+
+def parse_shards(paths, workers=None):
+    """
+    Parse and validate shards, in parallel when there is more than one.
+
+    Args:
+        paths (List[str]): The shard files.
+        workers (int): The number of worker processes. Defaults to the
+            number of CPUs; 1 parses in the current process.
+
+    Yields:
+        validation.ValidationReport: The report of every shard, from
+            read_shard, in the order of `paths`.
+    """
+    if workers == 1 or len(paths) < 2:
+        for path in paths:
+            yield read_shard(path)
+        return
+
+    workers = min(workers or os.cpu_count() or 1, len(paths))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(read_shard, paths)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python shards.py <stock.json> <shard directory>")
+        sys.exit(1)
+    with open(sys.argv[1]) as file:
+        counts = write_shards(json.loads(file.read()), sys.argv[2])
+    for warehouse_id, count in sorted(counts.items()):
+        print(f"Warehouse {warehouse_id}: {count} items")
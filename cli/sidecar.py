@@ -0,0 +1,283 @@
+"""
+Sidecar module for persisted stock indexes.
+
+Loading a stock file builds the name index and the aggregates of every
+warehouse item by item. This module saves them next to the data file,
+as `<stock file>.idx`, so the next launch can restore the warehouses
+without parsing JSON or rebuilding indexes.
+
+The sidecar is keyed by a hash of the data file's content, and a
+sidecar written for other content is ignored. A sidecar file holds:
+
+    struct "<8sII"  magic, format version, header length
+    header          UTF-8 JSON: digest, string table, the errors of the
+                    skipped records, and per warehouse its id,
+                    aggregates, names and column offsets
+    padding         to a multiple of 4 bytes
+    columns         native uint32: per item the state, category, date,
+                    quantity and name codes; per name its (date, count)
+                    pairs
+
+The file is memory-mapped and the columns are read in place.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+from array import array
+from collections import namedtuple
+
+import storage
+import validation
+from incremental_export import write_atomically
+
+MAGIC = b"WHIDX\x00\x00\x00"
+FORMAT_VERSION = 2
+SUFFIX = ".idx"
+_PREFIX = struct.Struct("<8sII")
+_ITEM_COLUMNS = 5  # state, category, date, quantity, name
+
+# `errors` are the validation.RecordErrors of the records left out
+Restored = namedtuple("Restored", ["warehouses", "errors"])
+
+
+def sidecar_path(path):
+    """Return the sidecar file of a data file."""
+    return path + SUFFIX
+
+
+def file_digest(path):
+    """
+    Hash the content of a file.
+
+    Args:
+        path (str): The file to hash.
+
+    Returns:
+        str: The hexadecimal BLAKE2b digest of the file.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as file:
+        while True:
+            chunk = file.read(storage.CHUNK_SIZE * 16)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _name(record):
+    """Return the normalized name of a record, as Warehouse indexes it."""
+    state, category = record.get("state"), record.get("category")
+    if state is None or category is None:
+        return ""
+    return f"{state} {category}".lower()
+
+
+def build_sidecar(path, digest=None):
+    """
+    Build the sidecar of a stock file.
+
+    Args:
+        path (str): The (possibly compressed) stock file.
+        digest (str): The content hash of the file, computed when omitted.
+
+    Returns:
+        bytes: The content of the sidecar file.
+    """
+    digest = digest or file_digest(path)
+    strings = [None]
+    codes = {None: 0}
+
+    def code(value):
+        number = codes.get(value)
+        if number is None:
+            number = codes[value] = len(strings)
+            strings.append(value)
+        return number
+
+    warehouses = {}
+    errors = []
+    for index, record in enumerate(storage.iter_records(path)):
+        problems = validation.stock_record_errors(record)
+        if problems:
+            # Skipped by the Loader too, which reports the same errors
+            errors.extend([index, field, message]
+                          for field, message in problems)
+            continue
+        warehouse_id = str(record["warehouse"])
+        warehouse = warehouses.get(warehouse_id)
+        if warehouse is None:
+            warehouse = warehouses[warehouse_id] = {
+                "id": warehouse_id, "value": record["warehouse"],
+                "items": array("I"), "total": 0, "categories": {},
+                "states": {}, "names": {},
+            }
+        quantity = record.get("quantity", 1)
+        category, state = record.get("category"), record.get("state")
+        date_of_stock = record.get("date_of_stock")
+        name = _name(record)
+        names = warehouse["names"]
+        if name not in names:
+            names[name] = (len(names), {})
+        name_code, dates = names[name]
+        warehouse["items"].extend((code(state), code(category),
+                                   code(date_of_stock), quantity, name_code))
+        warehouse["total"] += quantity
+        categories, states = warehouse["categories"], warehouse["states"]
+        categories[category] = categories.get(category, 0) + quantity
+        states[state] = states.get(state, 0) + quantity
+        # Units without a date count towards the name but not its dates
+        dates[date_of_stock] = dates.get(date_of_stock, 0) + quantity
+
+    columns = array("I")
+    header_warehouses = []
+    for warehouse in warehouses.values():
+        item_offset = len(columns)
+        columns.extend(warehouse["items"])
+        names = []
+        for name, (_, dates) in warehouse["names"].items():
+            date_offset = len(columns)
+            for date_of_stock, count in dates.items():
+                columns.extend((code(date_of_stock), count))
+            names.append([name, date_offset, len(dates)])
+        header_warehouses.append({
+            "id": warehouse["id"],
+            "value": warehouse["value"],
+            "items": [item_offset, len(warehouse["items"]) // _ITEM_COLUMNS],
+            "total": warehouse["total"],
+            "categories": list(warehouse["categories"].items()),
+            "states": list(warehouse["states"].items()),
+            "names": names,
+        })
+
+    header = json.dumps({
+        "digest": digest,
+        "byteorder": sys.byteorder,
+        "strings": strings,
+        "errors": errors,
+        "warehouses": header_warehouses,
+    }).encode()
+    padding = b"\x00" * (-(_PREFIX.size + len(header)) % 4)
+    return (_PREFIX.pack(MAGIC, FORMAT_VERSION, len(header)) + header
+            + padding + columns.tobytes())
+
+
+def write_sidecar(path, digest=None):
+    """
+    Build the sidecar of a stock file and write it atomically.
+
+    Args:
+        path (str): The stock file.
+        digest (str): The content hash of the file, computed when omitted.
+    """
+    write_atomically(sidecar_path(path), [build_sidecar(path, digest)],
+                     mode="wb")
+
+
+def rebuild_in_background(path, digest=None):
+    """
+    Write the sidecar of a stock file from a daemon thread.
+
+    A sidecar that cannot be written, e.g. in a read-only directory, is
+    skipped; the stock is then simply parsed again on the next launch.
+
+    Args:
+        path (str): The stock file.
+        digest (str): The content hash of the file, computed when omitted.
+
+    Returns:
+        threading.Thread: The started thread.
+    """
+    def rebuild():
+        try:
+            write_sidecar(path, digest)
+        except (OSError, ValueError, TypeError, OverflowError):
+            pass
+
+    thread = threading.Thread(target=rebuild, daemon=True, name="sidecar")
+    thread.start()
+    return thread
+
+
+def load_sidecar(path, warehouse_class, item_class, digest=None):
+    """
+    Restore the warehouses of a stock file from its sidecar.
+
+    Args:
+        path (str): The stock file.
+        warehouse_class (type): The Warehouse class to instantiate.
+        item_class (type): The Item class to instantiate.
+        digest (str): The content hash of the file, computed when omitted.
+
+    Returns:
+        Restored: The restored warehouses and the errors of the records
+            left out, or None when there is no sidecar or it was written
+            for other content or another format.
+    """
+    try:
+        file = open(sidecar_path(path), "rb")
+    except OSError:
+        return None
+    with file:
+        if os.fstat(file.fileno()).st_size < _PREFIX.size:
+            return None
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return _load_mapped(mapped, path, warehouse_class, item_class,
+                                digest)
+
+
+def _load_mapped(mapped, path, warehouse_class, item_class, digest):
+    """Restore the warehouses from a memory-mapped sidecar."""
+    magic, version, header_length = _PREFIX.unpack_from(mapped)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        return None
+    start = _PREFIX.size + header_length
+    header = json.loads(mapped[_PREFIX.size:start])
+    if header["byteorder"] != sys.byteorder:
+        return None
+    if header["digest"] != (digest or file_digest(path)):
+        return None
+
+    start += -start % 4
+    errors = [validation.RecordError(*error) for error in header["errors"]]
+    with memoryview(mapped)[start:] as raw, raw.cast("I") as columns:
+        return Restored([
+            _restore(entry, header["strings"], columns,
+                     warehouse_class, item_class)
+            for entry in header["warehouses"]
+        ], errors)
+
+
+def _restore(entry, strings, columns, warehouse_class, item_class):
+    """Build one warehouse from its sidecar entry."""
+    offset, count = entry["items"]
+    end = offset + count * _ITEM_COLUMNS
+    value = entry["value"]
+    items = [
+        item_class(strings[state], strings[category], strings[date_of_stock],
+                   value, quantity)
+        for state, category, date_of_stock, quantity in zip(
+            columns[offset:end:_ITEM_COLUMNS].tolist(),
+            columns[offset + 1:end:_ITEM_COLUMNS].tolist(),
+            columns[offset + 2:end:_ITEM_COLUMNS].tolist(),
+            columns[offset + 3:end:_ITEM_COLUMNS].tolist(),
+        )
+    ]
+    names = [name for name, _, _ in entry["names"]]
+    keys = [names[code] for code in columns[offset + 4:end:_ITEM_COLUMNS].tolist()]
+    date_counts = {}
+    for name, date_offset, length in entry["names"]:
+        pairs = columns[date_offset:date_offset + 2 * length].tolist()
+        date_counts[name] = dict(zip(map(strings.__getitem__, pairs[0::2]),
+                                     pairs[1::2]))
+
+    warehouse = warehouse_class(entry["id"])
+    warehouse._restore(
+        items, keys, entry["total"], dict(entry["categories"]),
+        dict(entry["states"]), date_counts,
+    )
+    return warehouse
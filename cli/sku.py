@@ -0,0 +1,66 @@
+"""
+SKU module for converting between unit and aggregated stock records.
+
+Unit stock has one record per physical unit. Aggregated stock has one
+record per (warehouse, state, category, date_of_stock) with a `quantity`.
+The Loader reads both formats; this module converts between them.
+
+Usage:
+    python sku.py aggregate data/stock.json data/stock_aggregated.json
+    python sku.py expand data/stock_aggregated.json data/stock.json
+"""
+import sys
+
+import storage
+from generator import write_json_array
+
+KEY_FIELDS = ("warehouse", "state", "category", "date_of_stock")
+
+
+def aggregate_records(records):
+    """
+    Merge identical units into records with a quantity.
+
+    Args:
+        records (iterable): Unit or aggregated stock records.
+
+    Returns:
+        list: One record per (warehouse, state, category, date_of_stock),
+            in order of first appearance.
+    """
+    aggregated = {}
+    for record in records:
+        key = tuple(record.get(field) for field in KEY_FIELDS)
+        if key in aggregated:
+            aggregated[key]["quantity"] += record.get("quantity", 1)
+        else:
+            aggregated[key] = dict(record, quantity=record.get("quantity", 1))
+    return list(aggregated.values())
+
+
+def expand_records(records):
+    """
+    Split records with a quantity into one record per unit.
+
+    Args:
+        records (iterable): Aggregated or unit stock records.
+
+    Yields:
+        dict: Unit records, without a quantity.
+    """
+    for record in records:
+        unit = {field: value for field, value in record.items()
+                if field != "quantity"}
+        for _ in range(record.get("quantity", 1)):
+            yield dict(unit)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] not in ("aggregate", "expand"):
+        print("Usage: python sku.py aggregate|expand <input> <output>")
+        sys.exit(1)
+    source_records = storage.iter_records(sys.argv[2])
+    if sys.argv[1] == "aggregate":
+        write_json_array(aggregate_records(source_records), sys.argv[3])
+    else:
+        write_json_array(expand_records(source_records), sys.argv[3])
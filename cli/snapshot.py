@@ -0,0 +1,214 @@
+"""
+Snapshot module for consistent reads of a changing stock.
+
+A SnapshotStore hands out immutable, versioned StockSnapshots of a list
+of warehouses. Getting the current snapshot is a single attribute read,
+so long readers such as the listing take no lock and never see half of
+an order. Writers hold the store's write lock for the duration of a
+change, e.g. an order over several warehouses.
+
+A new snapshot version is published on the first read after the change.
+The warehouses touched since the previous version are copied; every
+other warehouse is shared with the previous snapshot. Changes are
+tracked through the event bus.
+"""
+import threading
+from collections import namedtuple
+from types import MappingProxyType
+
+import events
+import shards
+from classes import Item, LazyWarehouse, date_key
+
+# Immutable copy of an Item
+ItemRecord = namedtuple(
+    "ItemRecord", ["state", "category", "date_of_stock", "quantity", "item_id"]
+)
+
+
+class WarehouseSnapshot:
+    """Immutable copy of the stock of one warehouse."""
+
+    def __init__(self, warehouse):
+        """
+        Initialize a WarehouseSnapshot instance from a live warehouse.
+
+        Args:
+            warehouse (Warehouse): The warehouse to copy. A LazyWarehouse
+                that was never loaded is not read; its shard file is
+                parsed if the items are asked for.
+        """
+        self.warehouse_id = warehouse.warehouse_id
+        self.version = warehouse.version
+        self.total = warehouse.occupancy()
+        self.categories = MappingProxyType(warehouse.category_counts())
+        self._path = None
+        self._items = None
+        self._by_date = None
+        if isinstance(warehouse, LazyWarehouse) and not warehouse.is_loaded:
+            # Unchanged since the shard was written
+            self._path = warehouse.path
+        else:
+            self._items = tuple(
+                ItemRecord(item.state, item.category, item.date_of_stock,
+                           item.quantity, item.item_id)
+                for item in warehouse.stock
+                if isinstance(item, Item)
+            )
+            live_index = warehouse.date_index(build=False)
+            if live_index is not None:
+                # Reuse the order of the live index instead of sorting
+                dates, live_items = live_index
+                by_id = {record.item_id: record for record in self._items}
+                self._by_date = (
+                    list(dates),
+                    [by_id[item.item_id] for item in live_items],
+                )
+
+    @property
+    def items(self):
+        """Return the items of the warehouse, as ItemRecords."""
+        if self._items is None:
+            rows = (
+                (state, category, date_of_stock, quantity)
+                for _, states, categories, dates, quantities
+                in shards.parse_shard(self._path).values()
+                for state, category, date_of_stock, quantity
+                in zip(states, categories, dates, quantities)
+            )
+            # Numbered in the order the warehouse would load them
+            self._items = tuple(
+                ItemRecord(*row, item_id) for item_id, row in enumerate(rows)
+            )
+        return self._items
+
+    def date_index(self):
+        """
+        Return the items sorted by date of stock and id.
+
+        Returns:
+            Tuple[list, list]: The sorted dates, "" for items without a
+                date, and the items in the same order. Copied from the
+                live warehouse when it has an index, otherwise sorted
+                once.
+        """
+        if self._by_date is None:
+            items = sorted(self.items, key=date_key)
+            self._by_date = (list(map(date_key, items)), items)
+        return self._by_date
+
+    def occupancy(self):
+        """Return the total amount of items, counting every unit."""
+        return self.total
+
+    def __str__(self):
+        """Return the same string as the warehouse."""
+        return f"Warehouse {self.warehouse_id}"
+
+
+class StockSnapshot:
+    """Immutable, versioned copy of the stock of every warehouse."""
+
+    def __init__(self, version, warehouses):
+        """
+        Initialize a StockSnapshot instance.
+
+        Args:
+            version (int): The snapshot version, counted by the store.
+            warehouses (tuple): The WarehouseSnapshots, in stock order.
+        """
+        self.version = version
+        self.warehouses = warehouses
+
+    def __iter__(self):
+        """Iterate over the WarehouseSnapshots."""
+        return iter(self.warehouses)
+
+    def __len__(self):
+        """Return the number of warehouses."""
+        return len(self.warehouses)
+
+    def total(self):
+        """Return the total amount of items in all warehouses."""
+        return sum(warehouse.total for warehouse in self.warehouses)
+
+
+class SnapshotStore:
+    """Copy-on-write store of the snapshots of a stock."""
+
+    def __init__(self, stock, write_lock=None, bus=None):
+        """
+        Initialize a SnapshotStore instance with a first snapshot.
+
+        Args:
+            stock: Iterable of Warehouse objects, e.g. a Loader.
+            write_lock (threading.RLock): The lock writers hold while
+                changing the stock. A new lock is created when omitted.
+            bus (EventBus): The bus to follow. Defaults to events.bus.
+        """
+        self.stock = stock
+        self.write_lock = write_lock or threading.RLock()
+        self.bus = bus or events.bus
+        self._dirty = set()  # Positions of the warehouses changed since
+        with self.write_lock:
+            self._warehouses = list(stock)
+            self._positions = {
+                id(warehouse): position
+                for position, warehouse in enumerate(self._warehouses)
+            }
+            self._current = StockSnapshot(0, tuple(
+                WarehouseSnapshot(warehouse) for warehouse in self._warehouses
+            ))
+            self.bus.subscribe(self._changed)
+
+    def close(self):
+        """Stop following the stock."""
+        self.bus.unsubscribe(self._changed)
+
+    def _changed(self, event):
+        """Remember that a warehouse changed."""
+        position = self._positions.get(id(event.warehouse))
+        if position is not None:
+            self._dirty.add(position)
+
+    def snapshot(self):
+        """
+        Return the latest consistent snapshot.
+
+        Without changes since the last call this is a single attribute
+        read. After a change, the touched warehouses are copied first,
+        unless a writer is still busy; the previous snapshot is returned
+        then.
+
+        Returns:
+            StockSnapshot: The snapshot, never modified afterwards.
+        """
+        if not self._dirty:
+            return self._current
+        if self.write_lock.acquire(blocking=False):
+            try:
+                self._publish()
+            finally:
+                self.write_lock.release()
+        return self._current
+
+    def write(self):
+        """
+        Return the lock to hold while changing the stock.
+
+        Example:
+            with store.write():
+                warehouse.take(item, 2)
+        """
+        return self.write_lock
+
+    def _publish(self):
+        """Copy the changed warehouses into a new snapshot version."""
+        if not self._dirty:
+            return
+        warehouses = list(self._current.warehouses)
+        while self._dirty:
+            position = self._dirty.pop()
+            warehouses[position] = WarehouseSnapshot(self._warehouses[position])
+        self._current = StockSnapshot(self._current.version + 1,
+                                      tuple(warehouses))
@@ -0,0 +1,225 @@
+"""
+Stock query module for compound filters over the warehouses.
+
+`query_stock` selects the items matching a category, a state, a warehouse
+and a range of dates of stock. A small planner looks at the indexes each
+warehouse keeps and, per warehouse, reads the candidates from the most
+selective one:
+
+    warehouse   the warehouses are picked by id before anything is read
+    name        the name index buckets of the category and state
+    date        the date index, bisected for the range of dates
+    scan        every item, when no index applies
+
+Only one index is read per warehouse: the name buckets and the date
+range are not intersected. The candidates of the cheapest index are
+checked against the remaining filters instead, so a query costs about
+the size of the smallest candidate set, even when the intersection is
+much smaller.
+
+The same filters can be written as an expression for the CLI, e.g.
+`category:router state:red since:2021-01-01 limit:10`, and parsed with
+`parse_filter`.
+"""
+import heapq
+import itertools
+import shlex
+from collections import namedtuple
+
+from classes import Item, date_bounds
+
+# How the candidates of one warehouse are read, and how many there are
+QueryPlan = namedtuple("QueryPlan", ["warehouse", "index", "estimate"])
+
+# order_by -> (sort key, descending)
+ORDERS = {
+    "date": (lambda item: item.date_of_stock or "", False),
+    "-date": (lambda item: item.date_of_stock or "", True),
+    "quantity": (lambda item: item.quantity, False),
+    "-quantity": (lambda item: item.quantity, True),
+}
+
+# Filter expression term -> query_stock argument
+_TERMS = {
+    "category": "category",
+    "state": "state",
+    "warehouse": "warehouse",
+    "since": "since",
+    "until": "until",
+    "limit": "limit",
+    "order": "order_by",
+}
+
+
+def _plan(warehouse, category, state, since, until):
+    """
+    Pick the index to read the candidates of one warehouse from.
+
+    The name index is always cheap to estimate. The date index is
+    estimated only when it is already built, or when it is the only
+    index that applies; building it sorts the whole stock.
+
+    Returns:
+        Tuple[QueryPlan, list]: The plan and the candidate items.
+    """
+    options = []
+    if category is not None or state is not None:
+        buckets = warehouse.postings(category, state)
+        options.append((sum(map(len, buckets)), "name",
+                        lambda: itertools.chain.from_iterable(buckets)))
+    if since is not None or until is not None:
+        index = warehouse.date_index(build=not options)
+        if index is not None:
+            dates, items = index
+            start, end = date_bounds(dates, since, until)
+            options.append((end - start, "date", lambda: items[start:end]))
+    if not options:
+        stock = warehouse.stock
+        options.append((len(stock), "scan", lambda: stock))
+    estimate, index, candidates = min(options, key=lambda option: option[0])
+    return QueryPlan(warehouse, index, estimate), candidates()
+
+
+def plan_query(stock, category=None, state=None, warehouse=None,
+               stocked_between=None):
+    """
+    Return the plan query_stock follows for a set of filters.
+
+    Args:
+        stock: Iterable of Warehouse objects, e.g. a Loader.
+        category, state, warehouse, stocked_between: As for query_stock.
+
+    Returns:
+        List[QueryPlan]: The index read and its number of candidates, for
+            every warehouse that is read at all.
+    """
+    since, until = stocked_between or (None, None)
+    return [
+        _plan(each, category, state, since, until)[0]
+        for each in _warehouses(stock, warehouse)
+    ]
+
+
+def _warehouses(stock, warehouse):
+    """Return the warehouses of the stock with a given id, or all of them."""
+    if warehouse is None:
+        return list(stock)
+    return [each for each in stock if str(each.warehouse_id) == str(warehouse)]
+
+
+def _matcher(category, state, since, until):
+    """Return the predicate that checks every filter on one item."""
+    category = category.lower() if category is not None else None
+    state = state.lower() if state is not None else None
+    if until is not None:
+        until += "\uffff"  # Includes the times of the last day
+
+    def matches(item):
+        if not isinstance(item, Item):
+            return False
+        if category is not None and (item.category or "").lower() != category:
+            return False
+        if state is not None and (item.state or "").lower() != state:
+            return False
+        if since is not None or until is not None:
+            date_of_stock = item.date_of_stock
+            if date_of_stock is None:
+                return False
+            if since is not None and date_of_stock < since:
+                return False
+            if until is not None and date_of_stock > until:
+                return False
+        return True
+
+    return matches
+
+
+def query_stock(stock, category=None, state=None, warehouse=None,
+                stocked_between=None, limit=None, order_by=None):
+    """
+    Return the items matching every given filter.
+
+    Args:
+        stock: Iterable of Warehouse objects, e.g. a Loader.
+        category (str): The category, compared case-insensitively.
+        state (str): The state, compared case-insensitively.
+        warehouse: The id of the only warehouse to read.
+        stocked_between (Tuple[str, str]): The first and last date of
+            stock included; either may be None. A date without a time
+            includes the whole day.
+        limit (int): The maximum number of items returned.
+        order_by (str): "date", "-date", "quantity" or "-quantity".
+            Defaults to the warehouse order, then the index order.
+
+    Returns:
+        List[Item]: The matching items.
+
+    Raises:
+        ValueError: If order_by or limit is not valid.
+    """
+    if order_by is not None and order_by not in ORDERS:
+        raise ValueError(
+            f"Unknown order {order_by!r}, expected one of {', '.join(ORDERS)}"
+        )
+    if limit is not None and limit < 0:
+        raise ValueError("The limit cannot be negative")
+    since, until = stocked_between or (None, None)
+    matches = _matcher(category, state, since, until)
+
+    def matching():
+        for each in _warehouses(stock, warehouse):
+            _, candidates = _plan(each, category, state, since, until)
+            yield from filter(matches, candidates)
+
+    if order_by is None:
+        return list(itertools.islice(matching(), limit))
+    key, descending = ORDERS[order_by]
+    if limit is None:
+        return sorted(matching(), key=key, reverse=descending)
+    select = heapq.nlargest if descending else heapq.nsmallest
+    return select(limit, matching(), key=key)
+
+
+def parse_filter(expression):
+    """
+    Parse a filter expression into query_stock arguments.
+
+    Terms are `name:value` pairs separated by spaces; values with spaces
+    are quoted, e.g. `category:"game console" since:2021-01-01 limit:5`.
+    The names are category, state, warehouse, since, until, limit and
+    order.
+
+    Args:
+        expression (str): The filter expression.
+
+    Returns:
+        dict: The keyword arguments of query_stock.
+
+    Raises:
+        ValueError: If a term is malformed or unknown.
+    """
+    arguments = {}
+    since = until = None
+    for term in shlex.split(expression):
+        name, separator, value = term.partition(":")
+        name = name.lower()
+        if not separator or not value:
+            raise ValueError(f"Expected name:value, got {term!r}")
+        if name not in _TERMS:
+            raise ValueError(
+                f"Unknown filter {name!r}, expected one of {', '.join(_TERMS)}"
+            )
+        if name == "since":
+            since = value
+        elif name == "until":
+            until = value
+        elif name == "limit":
+            try:
+                arguments["limit"] = int(value)
+            except ValueError:
+                raise ValueError(f"The limit must be a number, got {value!r}")
+        else:
+            arguments[_TERMS[name]] = value
+    if since is not None or until is not None:
+        arguments["stocked_between"] = (since, until)
+    return arguments
@@ -0,0 +1,237 @@
+"""
+Storage module for compressed data files and rotated logs.
+
+This module opens plain, gzip (`.gz`) and lzma (`.xz`, `.lzma`) files
+transparently and parses JSON arrays incrementally, so a compressed stock
+file is decompressed and decoded one chunk at a time instead of being
+inflated into memory as a whole. It also appends to action logs with
+size-based rotation, compressing rotated logs, and reads them back
+oldest first.
+"""
+import gzip
+import json
+import lzma
+import os
+import zlib
+
+CHUNK_SIZE = 64 * 1024
+LOG_MAX_BYTES = int(os.environ.get("WAREHOUSE_LOG_MAX_BYTES", 1024 * 1024))
+LOG_BACKUPS = int(os.environ.get("WAREHOUSE_LOG_BACKUPS", 5))
+# Characters that may follow an element of a JSON array
+_DELIMITERS = " \t\r\n,]"
+
+
+def open_text(path, mode="rt"):
+    """
+    Open a plain, gzip or lzma file in text mode, based on its extension.
+
+    Args:
+        path (str): The file to open.
+        mode (str): "rt", "wt" or "at".
+
+    Returns:
+        A text file object.
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, mode)
+    if path.endswith((".xz", ".lzma")):
+        return lzma.open(path, mode)
+    return open(path, mode[0])
+
+
+def _skip_whitespace(buffer, position):
+    """Return the position of the next non-whitespace character."""
+    while position < len(buffer) and buffer[position] in " \t\r\n":
+        position += 1
+    return position
+
+
+def iter_json_array(file, chunk_size=CHUNK_SIZE):
+    """
+    Parse a JSON array incrementally.
+
+    Args:
+        file: A text file object positioned at the array.
+        chunk_size (int): The number of characters read at a time.
+
+    Yields:
+        The elements of the array, one at a time.
+
+    Raises:
+        ValueError: If the file does not hold a JSON array.
+    """
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size)
+    eof = not buffer
+    position = _skip_whitespace(buffer, 0)
+    if position >= len(buffer) or buffer[position] != "[":
+        raise ValueError("Expected a JSON array.")
+    position += 1
+
+    while True:
+        position = _skip_whitespace(buffer, position)
+        if position < len(buffer) and buffer[position] == ",":
+            position = _skip_whitespace(buffer, position + 1)
+        if position < len(buffer) and buffer[position] == "]":
+            return
+
+        try:
+            element, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            end = None
+        # A number or literal may continue in the next chunk, e.g. "-1."
+        # decodes as -1, so it is only complete once a delimiter follows
+        if end is None or (
+            not eof
+            and not isinstance(element, (dict, list, str))
+            and (end == len(buffer) or buffer[end] not in _DELIMITERS)
+        ):
+            # The element continues in the next chunk
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+
+        yield element
+        position = end
+        if position >= chunk_size:
+            # Drop the parsed part so the buffer stays about one chunk long
+            buffer = buffer[position:]
+            position = 0
+
+
+def iter_records(path):
+    """
+    Stream the records of a (possibly compressed) JSON array file.
+
+    Args:
+        path (str): The file to read.
+
+    Yields:
+        dict: The records of the file.
+    """
+    with open_text(path) as file:
+        yield from iter_json_array(file)
+
+
+def compress(path, target):
+    """
+    Write a compressed copy of a file, chosen by the target extension.
+
+    Args:
+        path (str): The file to compress.
+        target (str): The compressed file, ending in `.gz` or `.xz`.
+    """
+    with open(path, "rb") as source:
+        opener = gzip.open if target.endswith(".gz") else lzma.open
+        with opener(target, "wb") as destination:
+            while True:
+                chunk = source.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                destination.write(chunk)
+
+
+def compress_chunks(path, chunks):
+    """
+    Compress text chunks for a file, chosen by its extension.
+
+    Args:
+        path (str): The file the chunks are written to.
+        chunks (iterable): The text to write, in pieces.
+
+    Returns:
+        Tuple[iterable, str]: The chunks to write, compressed to bytes for
+            a `.gz`, `.xz` or `.lzma` file, and the matching file mode
+            ("w" or "wb").
+    """
+    if path.endswith(".gz"):
+        compressor = zlib.compressobj(wbits=31)  # gzip header and trailer
+    elif path.endswith((".xz", ".lzma")):
+        compressor = lzma.LZMACompressor(
+            lzma.FORMAT_XZ if path.endswith(".xz") else lzma.FORMAT_ALONE
+        )
+    else:
+        return chunks, "w"
+
+    def compressed():
+        for chunk in chunks:
+            data = compressor.compress(chunk.encode())
+            if data:
+                yield data
+        yield compressor.flush()
+
+    return compressed(), "wb"
+
+
+def rotated_log_paths(path):
+    """
+    Return the existing log files of a log, oldest first.
+
+    Args:
+        path (str): The current log file, e.g. `log/user_log.txt`.
+
+    Returns:
+        List[str]: The rotated `<path>.<n>.gz` files, then the log itself.
+    """
+    paths = []
+    number = 1
+    while os.path.exists(f"{path}.{number}.gz"):
+        paths.append(f"{path}.{number}.gz")
+        number += 1
+    paths.reverse()
+    if os.path.exists(path):
+        paths.append(path)
+    return paths
+
+
+def rotate_log(path, backups=LOG_BACKUPS):
+    """
+    Compress the current log into `<path>.1.gz`, shifting older logs.
+
+    Args:
+        path (str): The current log file.
+        backups (int): The number of rotated logs kept.
+    """
+    oldest = f"{path}.{backups}.gz"
+    if os.path.exists(oldest):
+        os.remove(oldest)
+    for number in range(backups - 1, 0, -1):
+        if os.path.exists(f"{path}.{number}.gz"):
+            os.replace(f"{path}.{number}.gz", f"{path}.{number + 1}.gz")
+    compress(path, f"{path}.1.gz")
+    os.remove(path)
+
+
+def append_log(path, lines, max_bytes=LOG_MAX_BYTES):
+    """
+    Append lines to a log, rotating it first when it is too large.
+
+    Args:
+        path (str): The log file.
+        lines (iterable): The lines to append, with their newlines.
+        max_bytes (int): The size above which the log is rotated.
+    """
+    if max_bytes and os.path.exists(path) and os.path.getsize(path) >= max_bytes:
+        rotate_log(path)
+    with open(path, "a") as file:
+        file.writelines(lines)
+
+
+def iter_log_lines(path):
+    """
+    Stream the lines of a log and its rotated files, oldest first.
+
+    Args:
+        path (str): The current log file.
+
+    Yields:
+        str: The log lines, without their newlines.
+    """
+    for log_path in rotated_log_paths(path):
+        with open_text(log_path) as file:
+            for line in file:
+                yield line.rstrip("\n")
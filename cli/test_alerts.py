@@ -0,0 +1,106 @@
+"""
+This module contains unit tests for the alerts module.
+
+The tests follow orders, removals and deliveries through the event bus
+and check the low-stock and restocked alerts of per-warehouse and
+all-warehouse thresholds.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+import alerts
+from classes import Item, Warehouse
+
+
+class TestAlertEngine(unittest.TestCase):
+    """Test case for the AlertEngine class."""
+
+    def setUp(self):
+        """Create two warehouses of routers and mice and an alert engine."""
+        self.stock = []
+        for warehouse_id in (1, 2):
+            warehouse = Warehouse(warehouse_id)
+            warehouse.add_item(Item("Red", "Router", "2021-01-01", warehouse_id, 4))
+            warehouse.add_item(Item("Blue", "Mouse", "2021-01-01", warehouse_id, 1))
+            self.stock.append(warehouse)
+        self.received = []
+        self.engine = alerts.AlertEngine(self.stock, {
+            "categories": {"Router": 6},
+            "warehouses": {"2": {"Router": 3, "Mouse": 2}},
+        }, [self.received.append])
+
+    def tearDown(self):
+        """Stop the engine following the stock."""
+        self.engine.close()
+
+    def test_initial_alerts(self):
+        """Test that thresholds already crossed are reported at once."""
+        self.assertEqual(self.received, [
+            alerts.Alert(alerts.LOW, "2", "Mouse", 1, 2),
+        ])
+        self.assertEqual(self.engine.low(), self.received)
+
+    def test_crossings(self):
+        """Test alerts when counters cross their thresholds."""
+        self.received.clear()
+        first, second = self.stock
+        second.take(second.stock[0], 1)  # 3 left in 2, 7 overall
+        self.assertEqual(self.received, [])
+        second.take(second.stock[0], 1)  # 2 left in 2, 6 overall
+        self.assertEqual(self.received, [
+            alerts.Alert(alerts.LOW, "2", "Router", 2, 3),
+        ])
+        first.remove_item(first.stock[0])  # 2 overall
+        self.assertEqual(self.received[1:], [
+            alerts.Alert(alerts.LOW, None, "Router", 2, 6),
+        ])
+        second.add_items([
+            Item("Red", "Router", "2021-02-01", 2, 5),
+            Item("Blue", "Mouse", "2021-02-01", 2),
+        ])
+        self.assertEqual(self.received[2:], [
+            alerts.Alert(alerts.RESTOCKED, "2", "Router", 7, 3),
+            alerts.Alert(alerts.RESTOCKED, None, "Router", 7, 6),
+            alerts.Alert(alerts.RESTOCKED, "2", "Mouse", 2, 2),
+        ])
+        self.assertEqual(self.engine.low(), [])
+
+    def test_other_stock_is_ignored(self):
+        """Test that changes of other warehouses are not counted."""
+        self.received.clear()
+        other = Warehouse(2)
+        other.add_item(Item("Red", "Router", "2021-01-01", 2, 9))
+        other.take(other.stock[0], 9)
+        self.assertEqual(self.received, [])
+
+
+class TestAlertConfiguration(unittest.TestCase):
+    """Test case for the thresholds file and the alert log."""
+
+    def test_thresholds_and_log(self):
+        """Test reading thresholds and writing alerts to a file."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "thresholds.json")
+            with open(path, "w") as file:
+                json.dump({"categories": {"Router": 2}}, file)
+            self.assertEqual(alerts.load_thresholds(path),
+                             {"categories": {"Router": 2}})
+            with open(path, "w") as file:
+                json.dump({"warehouses": {"1": {"Router": -1}}}, file)
+            with self.assertRaises(ValueError):
+                alerts.load_thresholds(path)
+
+            log_path = os.path.join(directory, "log", "alerts.txt")
+            alerts.AlertLog(log_path)(alerts.Alert(alerts.LOW, "2", "Router", 4, 5))
+            with open(log_path) as file:
+                line = file.read()
+        self.assertTrue(line.endswith(
+            ". Low stock of Router in Warehouse 2: 4 units (threshold 5).\n"
+        ))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+"""
+This module contains unit tests for the allocation module.
+
+The tests cover the plans of every allocation policy, their execution
+and the per-warehouse availability they are built from.
+"""
+
+import threading
+import unittest
+from unittest.mock import patch
+
+import allocation
+import query
+from allocation import describe_plan, execute_allocation, plan_allocation
+from classes import Item, Warehouse
+
+
+def make_warehouse(warehouse_id, routers, mice=0):
+    """Return a warehouse with (date, quantity) routers and unit mice."""
+    warehouse = Warehouse(warehouse_id)
+    for date_of_stock, quantity in routers:
+        warehouse.add_item(
+            Item("Red", "Router", date_of_stock, warehouse_id, quantity)
+        )
+    for _ in range(mice):
+        warehouse.add_item(Item("Blue", "Mouse", "2021-01-01", warehouse_id))
+    return warehouse
+
+
+class TestAllocation(unittest.TestCase):
+    """Test case for planning and executing allocations."""
+
+    def setUp(self):
+        """Create three warehouses with routers of several dates."""
+        self.first = make_warehouse(1, [("2022-01-01", 3)], mice=10)
+        self.second = make_warehouse(2, [("2020-01-01", 2), ("2023-01-01", 5)])
+        self.third = make_warehouse(3, [("2021-01-01", 4)], mice=2)
+        self.stock = [self.first, self.second, self.third]
+
+    def units(self, plan):
+        """Return the units of a plan per warehouse id."""
+        return {warehouse.warehouse_id: units for warehouse, units in plan}
+
+    def test_availability(self):
+        """Test the units and oldest date of a warehouse."""
+        self.assertEqual(self.second.availability("router"), (7, "2020-01-01"))
+        self.assertEqual(self.second.availability("mouse"), (0, None))
+        self.second.take(self.second.stock[0], 2)
+        self.assertEqual(self.second.availability("red"), (5, "2023-01-01"))
+
+    def test_fewest(self):
+        """Test that the largest availability is used first."""
+        plan = plan_allocation(self.stock, "red router", 9, "fewest")
+        self.assertEqual(self.units(plan), {2: 7, 3: 2})
+
+    def test_fifo(self):
+        """Test that the oldest units are used first."""
+        plan = plan_allocation(self.stock, "red router", 9, "fifo")
+        # 2020 in 2, 2021 in 3, then 2022 in 1, before the 2023 units of 2
+        self.assertEqual([warehouse.warehouse_id for warehouse, _ in plan],
+                         [2, 3, 1])
+        self.assertEqual(self.units(plan), {2: 2, 3: 4, 1: 3})
+
+    def test_fifo_interleaved_dates(self):
+        """Test FIFO across warehouses whose dates interleave."""
+        first = make_warehouse("A", [("2019-01-01", 2), ("2023-01-01", 3)])
+        second = make_warehouse("B", [("2020-01-01", 2)])
+        third = make_warehouse("C", [(None, 4)])
+        stock = [first, second, third]
+        plan = plan_allocation(stock, "red router", 8, "fifo")
+        self.assertEqual(self.units(plan), {"A": 5, "B": 2, "C": 1})
+        self.assertEqual(self.units(plan_allocation(stock, "red router", 4,
+                                                    "fifo")),
+                         {"A": 2, "B": 2})
+
+        plan = plan_allocation(stock, "red router", 4, "fifo")
+        self.assertEqual(execute_allocation(plan, "red router", "fifo"), 4)
+        self.assertEqual(first.availability("router"), (3, "2023-01-01"))
+        self.assertEqual(second.occupancy(), 0)
+
+    def test_fifo_leaves_held_units(self):
+        """Test that held units are left out of a FIFO plan."""
+        first = make_warehouse("A", [("2019-01-01", 2), ("2023-01-01", 3)])
+        second = make_warehouse("B", [("2020-01-01", 2)])
+        # 4 of A's units are held: the 2023 ones and one of 2019
+        plan = plan_allocation([first, second], "red router", 3, "fifo",
+                               reserved={("A", "red router"): 4})
+        self.assertEqual(self.units(plan), {"A": 1, "B": 2})
+
+    def test_balance(self):
+        """Test that the fullest warehouses are used first."""
+        # Occupancies 13, 7 and 6: the first warehouse is drained first
+        plan = plan_allocation(self.stock, "red router", 4, "balance")
+        self.assertEqual(self.units(plan), {1: 3, 2: 1})
+        self.assertEqual(sum(self.units(plan).values()), 4)
+
+    def test_shortfall(self):
+        """Test a plan for more units than are in stock."""
+        plan = plan_allocation(self.stock, "red router", 100, "fewest")
+        self.assertEqual(sum(units for _, units in plan), 14)
+        self.assertEqual(plan_allocation(self.stock, "printer", 1), [])
+
+    def test_unknown_policy(self):
+        """Test that an unknown policy is rejected."""
+        with self.assertRaises(ValueError):
+            plan_allocation(self.stock, "red router", 1, "random")
+
+    def test_execute_fifo_takes_oldest(self):
+        """Test that executing a FIFO plan takes the oldest items."""
+        plan = plan_allocation(self.stock, "red router", 3, "fifo")
+        self.assertEqual(execute_allocation(plan, "red router", "fifo"), 3)
+        self.assertEqual(self.second.availability("router"), (5, "2023-01-01"))
+        self.assertEqual(self.third.availability("router"), (3, "2021-01-01"))
+
+    def test_describe_plan(self):
+        """Test the lines describing a plan."""
+        plan = plan_allocation(self.stock, "red router", 9, "fewest")
+        self.assertEqual(describe_plan(plan),
+                         ["Warehouse 2: 7", "Warehouse 3: 2"])
+
+
+class TestOrderLocking(unittest.TestCase):
+    """Test case for orders planned and taken by the query module."""
+
+    def test_plan_is_made_under_the_write_lock(self):
+        """Test that no other order can change the stock while planning."""
+        stock = [make_warehouse(1, [("2021-01-01", 3)]),
+                 make_warehouse(2, [("2020-01-01", 4)])]
+        held = []
+        original = allocation.plan_allocation
+
+        def try_lock():
+            lock = query.stock_write_lock
+            acquired = lock.acquire(blocking=False)
+            if acquired:
+                lock.release()
+            held.append(not acquired)
+
+        def plan_allocation(*args, **kwargs):
+            # Another thread cannot take the lock while the plan is made
+            other = threading.Thread(target=try_lock)
+            other.start()
+            other.join()
+            return original(*args, **kwargs)
+
+        with patch.object(query, "stock_loader", stock), \
+                patch.object(allocation, "plan_allocation", plan_allocation):
+            self.assertEqual(query.take_items("red router", 5), 5)
+        self.assertEqual(held, [True])
+
+
+if __name__ == "__main__":
+    unittest.main()
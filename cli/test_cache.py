@@ -0,0 +1,134 @@
+"""
+This module contains unit tests for the cache module.
+
+The tests cover the LRU eviction, the hit and miss counters
+and the invalidation of cached searches by the stock version.
+"""
+
+import gc
+import sys
+import threading
+import unittest
+import weakref
+
+import query
+from cache import LRUCache, normalize_query
+from classes import Item, Warehouse
+from views import search_key
+
+
+class Stock(list):
+    """List of warehouses that can be weakly referenced."""
+
+
+class TestLRUCache(unittest.TestCase):
+    """Test case for the LRUCache class."""
+
+    def test_hits_and_misses_are_counted(self):
+        """Test the hit and miss counters."""
+        cache = LRUCache(maxsize=2)
+        self.assertEqual(cache.get("a", 1), (False, None))
+        cache.put("a", 1, "value")
+        self.assertEqual(cache.get("a", 1), (True, "value"))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_least_recently_used_entry_is_evicted(self):
+        """Test that the oldest entry is evicted first."""
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1, "a")
+        cache.put("b", 1, "b")
+        cache.get("a", 1)
+        cache.put("c", 1, "c")
+        self.assertEqual(cache.get("b", 1), (False, None))
+        self.assertEqual(cache.get("a", 1), (True, "a"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_newer_version_is_a_miss(self):
+        """Test that entries of an older stock version are dropped."""
+        cache = LRUCache()
+        cache.put("a", 1, "old")
+        self.assertEqual(cache.get("a", 2), (False, None))
+        self.assertEqual(len(cache), 0)
+
+    def test_concurrent_get_put_evict(self):
+        """Test that threads can look up, store and evict at once."""
+        cache = LRUCache(maxsize=32)
+        errors = []
+
+        def work(number):
+            try:
+                for step in range(3000):
+                    key = ("search", step % 40)
+                    # Alternate versions so lookups also drop stale entries
+                    version = step // 40 % 2
+                    if not cache.get(key, version)[0]:
+                        cache.put(key, version, step)
+                    if step % 5 == number % 5:
+                        cache.evict(lambda key: key[1] % 4 == number % 4)
+            except Exception as error:
+                errors.append(error)
+
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        try:
+            threads = [threading.Thread(target=work, args=(number,))
+                       for number in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            sys.setswitchinterval(interval)
+        self.assertEqual(errors, [])
+        self.assertLessEqual(len(cache), 32)
+        stats = cache.stats()
+        self.assertEqual(stats["hits"] + stats["misses"], 8 * 3000)
+
+    def test_normalize_query(self):
+        """Test that case and whitespace do not matter."""
+        self.assertEqual(normalize_query("  Second  Hand printer "),
+                         "second hand printer")
+
+
+class TestSearchCache(unittest.TestCase):
+    """Test case for the cached searches of the query module."""
+
+    def test_add_item_invalidates_search(self):
+        """Test that a new item is found after a cached search."""
+        warehouse = Warehouse("9")
+        warehouse.add_item(Item(state="Red", category="Router"))
+        stock = [warehouse]
+
+        location, counts = query.find_items(stock, "red router")
+        hits = query.search_cache.hits
+        query.find_items(stock, "red router")
+        self.assertEqual(query.search_cache.hits, hits + 1)
+
+        warehouse.add_item(Item(state="Red", category="Router"))
+        location, counts = query.find_items(stock, "red router")
+        self.assertEqual(counts, {"9": 2})
+
+    def test_search_key_refers_to_the_stock(self):
+        """Test that a cached search keeps its stock, not only its id."""
+        stock = Stock([Warehouse("9")])
+        stock[0].add_item(Item(state="Red", category="Router"))
+        reference = weakref.ref(stock)
+        query.find_items(stock, "red router")
+        del stock
+        gc.collect()
+        # Alive while its entry is cached, so no new stock gets its id
+        self.assertIsNotNone(reference())
+
+        other = Stock([Warehouse("8")])
+        other[0].add_item(Item(state="Blue", category="Router"))
+        self.assertNotEqual(search_key(reference(), "router"),
+                            search_key(other, "router"))
+        self.assertEqual(search_key(other, "router"),
+                         search_key(other, "router"))
+        _, counts = query.find_items(other, "red router")
+        self.assertEqual(counts, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
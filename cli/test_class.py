@@ -11,8 +11,9 @@ ordering, warehouse operations, and item properties.
 
 """
 
+import random
 import unittest
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from classes import Employee, Item, User, Warehouse, MissingArgument
 
@@ -193,6 +194,156 @@ class TestWarehouse(unittest.TestCase):
         # "electronics" (non-existent item)
         self.assertEqual(len(warehouse.search("used electronics")), 0)
 
+    def test_search_index_stays_in_sync_under_mutation(self):
+        """Test that search follows items being added and removed."""
+        # Create a warehouse with two identical items
+        warehouse = Warehouse()
+        item1 = Item(state="Used", category="Books", date_of_stock="2023-01-01")
+        item2 = Item(state="Used", category="Books", date_of_stock="2023-02-01")
+        warehouse.add_item(item1)
+        warehouse.add_item(item2)
+        self.assertEqual(
+            warehouse.search("used books"),
+            [(item1, "2023-01-01"), (item2, "2023-02-01")],
+        )
+
+        # Removing one item leaves only the other one
+        warehouse.remove_item(item1)
+        self.assertEqual(warehouse.search("USED BOOKS"), [(item2, "2023-02-01")])
+
+        # Removing the last item empties the result
+        warehouse.remove_item(item2)
+        self.assertEqual(warehouse.search("used books"), [])
+
+        # Adding an item again makes it searchable
+        warehouse.add_item(item1)
+        self.assertEqual(warehouse.search("used books"), [(item1, "2023-01-01")])
+
+    def test_summary_follows_added_and_removed_items(self):
+        """Test the incrementally maintained warehouse summary."""
+        # Create a warehouse with items of two categories
+        warehouse = Warehouse("1")
+        old = Item(state="Used", category="Books", date_of_stock="2020-01-01")
+        middle = Item(state="New", category="Books", date_of_stock="2021-01-01")
+        new = Item(state="New", category="Mouse", date_of_stock="2022-01-01")
+        for item in (old, middle, new):
+            warehouse.add_item(item)
+
+        summary = warehouse.summary()
+        self.assertEqual(summary["total"], 3)
+        self.assertEqual(summary["categories"], {"Books": 2, "Mouse": 1})
+        self.assertEqual(summary["states"], {"Used": 1, "New": 2})
+        self.assertEqual(summary["oldest"], "2020-01-01")
+        self.assertEqual(summary["newest"], "2022-01-01")
+
+        # Removing the oldest and newest items moves the date range
+        warehouse.remove_item(old)
+        warehouse.remove_item(new)
+        summary = warehouse.summary()
+        self.assertEqual(summary["total"], 1)
+        self.assertEqual(summary["categories"], {"Books": 1})
+        self.assertEqual(summary["states"], {"New": 1})
+        self.assertEqual(summary["oldest"], "2021-01-01")
+        self.assertEqual(summary["newest"], "2021-01-01")
+        self.assertEqual(warehouse.occupancy(), len(warehouse.stock))
+
+        # An empty warehouse has no date range
+        warehouse.remove_item(middle)
+        self.assertIsNone(warehouse.summary()["oldest"])
+
+    def test_date_range_under_fifo_removals(self):
+        """Test the date range while the oldest items are taken first."""
+        rng = random.Random(3)
+        warehouse = Warehouse("1")
+        items = []
+        for day in rng.sample(range(1, 400), 200):
+            date_of_stock = (datetime(2020, 1, 1) + timedelta(days=day)
+                             ).strftime("%Y-%m-%d")
+            item = Item(state=rng.choice(["Red", "Blue"]), category="Router",
+                        date_of_stock=date_of_stock)
+            warehouse.add_item(item)
+            items.append(item)
+
+        for step in range(300):
+            if items and step % 3:
+                oldest = min(items, key=lambda item: item.date_of_stock)
+                warehouse.take(oldest, 1)
+                items.remove(oldest)
+            else:
+                # Stock again on a date that may have been removed
+                item = Item(state="Red", category="Router",
+                            date_of_stock=rng.choice(items or [Item(
+                                date_of_stock="2021-06-01")]).date_of_stock)
+                warehouse.add_item(item)
+                items.append(item)
+            dates = [item.date_of_stock for item in items]
+            summary = warehouse.summary()
+            self.assertEqual(summary["oldest"], min(dates, default=None))
+            self.assertEqual(summary["newest"], max(dates, default=None))
+            red = [item.date_of_stock for item in items if item.state == "Red"]
+            self.assertEqual(warehouse.availability("red router"),
+                             (len(red), min(red, default=None)))
+
+    def test_date_index_kept_in_step(self):
+        """Test that the kept date index matches a fresh sort."""
+        rng = random.Random(5)
+        warehouse = Warehouse("1")
+
+        def new_item():
+            date_of_stock = rng.choice([None, "2021-01-01", "2021-01-02",
+                                        "2021-01-03 10:00:00"])
+            return Item(state="Red", category="Router",
+                        date_of_stock=date_of_stock, quantity=2)
+
+        for _ in range(20):
+            warehouse.add_item(new_item())
+        warehouse.date_index()
+        for step in range(200):
+            stock = warehouse.stock
+            if step % 4 == 0:
+                warehouse.add_items([new_item() for _ in range(3)])
+            elif step % 4 == 1 or not stock:
+                warehouse.add_item(new_item())
+            elif step % 4 == 2:
+                warehouse.take(rng.choice(stock), 1)
+            else:
+                warehouse.remove_item(rng.choice(stock))
+            dates, items = warehouse.date_index()
+            expected = sorted(warehouse.stock, key=lambda item: (
+                item.date_of_stock or "", item.item_id))
+            self.assertEqual([item.item_id for item in items],
+                             [item.item_id for item in expected])
+            self.assertEqual(dates,
+                             [item.date_of_stock or "" for item in expected])
+
+    def test_take_decrements_quantity(self):
+        """Test taking units out of an item of several units."""
+        warehouse = Warehouse("1")
+        item = Item(state="Red", category="Router",
+                    date_of_stock="2021-01-01", quantity=500)
+        warehouse.add_item(item)
+        self.assertEqual(warehouse.occupancy(), 500)
+
+        # Taking part of the units keeps the item
+        self.assertEqual(warehouse.take(item, 120), 120)
+        self.assertEqual(item.quantity, 380)
+        self.assertEqual(warehouse.summary()["categories"], {"Router": 380})
+        self.assertEqual(len(warehouse.stock), 1)
+
+        # Taking more than available removes the item
+        self.assertEqual(warehouse.take(item, 1000), 380)
+        self.assertEqual(warehouse.occupancy(), 0)
+        self.assertEqual(warehouse.search("red router"), [])
+
+    def test_search_string_entries_return_pseudo_items(self):
+        """Test that string entries are found as items without a date."""
+        warehouse = Warehouse()
+        warehouse.add_item("new electronics")
+        result = warehouse.search("New Electronics")
+        self.assertEqual(len(result), 1)
+        self.assertIsInstance(result[0][0], Item)
+        self.assertIsNone(result[0][1])
+
 class TestItem(unittest.TestCase):
     """Test case for the Item class."""
 
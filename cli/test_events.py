@@ -0,0 +1,127 @@
+"""
+This module contains unit tests for the events and views modules.
+
+The tests cover the events published by warehouse changes, tailing
+them, and the derived views updated from them.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+import events
+from cache import LRUCache
+from classes import Item, Warehouse
+from views import StockViews, browse_key, search_key
+
+
+class TestEvents(unittest.TestCase):
+    """Test case for the event bus."""
+
+    def setUp(self):
+        self.received = []
+        events.bus.subscribe(self.received.append)
+        self.warehouse = Warehouse(1)
+
+    def tearDown(self):
+        events.bus.unsubscribe(self.received.append)
+
+    def test_changes_publish_typed_events(self):
+        """Test the events of an addition, a partial take and a removal."""
+        item = Item("Red", "Router", "2021-01-01", 1, 3)
+        self.warehouse.add_item(item)
+        self.warehouse.take(item, 2)
+        self.warehouse.take(item, 5)
+        other = Item("Blue", "Mouse", "2021-01-01", 1)
+        self.warehouse.add_item(other)
+        self.warehouse.remove_item(other)
+
+        self.assertEqual(
+            [(event.kind, event.quantity) for event in self.received],
+            [(events.ITEM_ADDED, 3), (events.ITEM_TAKEN, 2),
+             (events.ITEM_TAKEN, 1), (events.ITEM_ADDED, 1),
+             (events.ITEM_REMOVED, 1)],
+        )
+        sequences = [event.sequence for event in self.received]
+        self.assertEqual(sequences, sorted(sequences))
+        self.assertTrue(all(event.warehouse is self.warehouse
+                            for event in self.received))
+
+    def test_tail(self):
+        """Test reading the events after a sequence number."""
+        tail = events.EventTail(events.bus, maxlen=2)
+        try:
+            for _ in range(3):
+                self.warehouse.add_item(Item("Red", "Router"))
+            recorded = tail.read()
+            self.assertEqual(len(recorded), 2)
+            self.assertEqual(tail.read(since=recorded[0].sequence),
+                             recorded[1:])
+        finally:
+            tail.close()
+
+    def test_json_lines_sink(self):
+        """Test that the events are appended to a file."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "events.jsonl")
+            sink = events.JsonLinesSink(events.bus, path)
+            self.warehouse.add_item(Item("Red", "Router", "2021-01-01", 1, 4))
+            sink.close()
+            with open(path) as file:
+                records = [json.loads(line) for line in file]
+        self.assertEqual(len(records), 1)
+        self.assertEqual(records[0]["kind"], "added")
+        self.assertEqual(records[0]["warehouse"], 1)
+        self.assertEqual(records[0]["quantity"], 4)
+
+
+class TestStockViews(unittest.TestCase):
+    """Test case for the views kept in sync by events."""
+
+    def setUp(self):
+        self.warehouse = Warehouse(1)
+        self.router = Item("Red", "Router", "2021-01-01", 1, 2)
+        self.warehouse.add_item(self.router)
+        self.warehouse.add_item(Item("Blue", "Mouse", "2021-01-01", 1))
+        self.stock = [self.warehouse]
+        self.cache = LRUCache()
+        self.views = StockViews(self.stock, self.cache)
+
+    def tearDown(self):
+        self.views.close()
+
+    def test_category_counts_follow_changes(self):
+        """Test that the counts are updated without a rebuild."""
+        self.assertEqual(self.views.category_counts(), {"Router": 2, "Mouse": 1})
+        self.warehouse.take(self.router, 2)
+        self.warehouse.add_item(Item("Red", "Camera", "2021-01-01", 1))
+        self.assertEqual(self.views.category_counts(), {"Mouse": 1, "Camera": 1})
+
+    def test_fuzzy_index_follows_changes(self):
+        """Test that the fuzzy index counts follow orders."""
+        self.assertEqual(self.views.fuzzy_index().search("red routr")[0][2],
+                         {1: 2})
+        self.warehouse.take(self.router, 1)
+        self.assertEqual(self.views.fuzzy_index().search("red routr")[0][2],
+                         {1: 1})
+
+    def test_only_matching_cache_entries_are_evicted(self):
+        """Test that a change keeps the unrelated cached results."""
+        self.cache.put(search_key(self.stock, "router"), 0, "routers")
+        self.cache.put(search_key(self.stock, "mouse"), 0, "mice")
+        self.cache.put(browse_key("Router"), 0, "routers")
+        self.warehouse.take(self.router, 1)
+        self.assertEqual(self.cache.get(search_key(self.stock, "mouse"), 0),
+                         (True, "mice"))
+        self.assertEqual(len(self.cache), 1)
+
+    def test_other_stocks_are_ignored(self):
+        """Test that changes of other warehouses leave the views alone."""
+        self.views.category_counts()
+        Warehouse(2).add_item(Item("Red", "Router", "2021-01-01", 2))
+        self.assertEqual(self.views.category_counts(), {"Router": 2, "Mouse": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
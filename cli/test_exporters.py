@@ -0,0 +1,118 @@
+"""
+This module contains unit tests for the exporters module.
+
+The tests write stock, personnel and log exports as plain and gzip
+compressed CSV and NDJSON files and read them back.
+"""
+
+import csv
+import gzip
+import json
+import os
+import tempfile
+import unittest
+
+import exporters
+import storage
+from classes import Item, Warehouse
+
+
+class TestExporters(unittest.TestCase):
+    """Test case for the streaming exporters."""
+
+    def setUp(self):
+        """Create a temporary directory and a warehouse of four entries."""
+        self.directory = tempfile.TemporaryDirectory()
+        warehouse = Warehouse(1)
+        for item in (
+            Item("Red", "Router", "2021-01-01", None, 2),
+            Item("Blue", "Mouse", "2021-02-01", 1),
+            Item("Red", "Mouse", None, 1),
+            "Red Router",
+        ):
+            warehouse.add_item(item)
+        self.stock = [warehouse]
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.directory.cleanup()
+
+    def path(self, name):
+        """Return the path of a file in the temporary directory."""
+        return os.path.join(self.directory.name, name)
+
+    def test_stock_csv(self):
+        """Test a CSV export of the stock, with the filters."""
+        path = self.path("stock.csv")
+        count = exporters.export(path, exporters.stock_records(self.stock),
+                                 exporters.STOCK_FIELDS)
+        self.assertEqual(count, 3)
+        with open(path, newline="") as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual(rows[0], {"warehouse": "1", "state": "Red",
+                                   "category": "Router",
+                                   "date_of_stock": "2021-01-01",
+                                   "quantity": "2"})
+        self.assertEqual(rows[2]["date_of_stock"], "")
+
+        mice = list(exporters.stock_records(self.stock, category="mouse"))
+        self.assertEqual([record["state"] for record in mice], ["Blue", "Red"])
+        red_mice = list(exporters.stock_records(self.stock, search="red",
+                                                category="Mouse"))
+        self.assertEqual(len(red_mice), 1)
+
+    def test_compressed_ndjson(self):
+        """Test a gzip NDJSON export written in many chunks."""
+        path = self.path("stock.ndjson.gz")
+        records = [{"number": number, "text": "x" * 50}
+                   for number in range(5000)]
+        self.assertEqual(exporters.export(path, iter(records), ["number"]),
+                         5000)
+        with gzip.open(path, "rt") as file:
+            self.assertEqual([json.loads(line) for line in file], records)
+
+    def test_personnel(self):
+        """Test that the hierarchy is flattened without passwords."""
+        personnel = [
+            {"user_name": "Juno", "password": "compte", "head_of": [
+                {"user_name": "India", "password": "cali", "head_of": [
+                    {"user_name": "Marc", "password": "janis"}]}]},
+            {"user_name": "Jeremy", "password": "coppers"},
+        ]
+        self.assertEqual(list(exporters.personnel_records(personnel)), [
+            {"user_name": "Juno", "manager": None, "level": 0},
+            {"user_name": "India", "manager": "Juno", "level": 1},
+            {"user_name": "Marc", "manager": "India", "level": 2},
+            {"user_name": "Jeremy", "manager": None, "level": 0},
+        ])
+
+    def test_logs(self):
+        """Test parsing rotated logs and skipping malformed lines."""
+        log_path = self.path("employee_log.txt")
+        storage.append_log(log_path, [
+            "Jeremy. Listed 5000 items from 4 Warehouses. 2023-12-14 14:28:51.597.\n",
+        ])
+        storage.rotate_log(log_path)
+        storage.append_log(log_path, [
+            "not a log line\n",
+            "Jeremy. Ordered 2 of red router. 2023-12-15 10:00:00.000.\n",
+        ])
+        records = list(exporters.log_records({"employee": log_path}))
+        self.assertEqual([record["kind"] for record in records],
+                         ["Listed", "Ordered"])
+        self.assertEqual(records[1], {
+            "log": "employee", "user_name": "Jeremy", "kind": "Ordered",
+            "action": "Ordered 2 of red router",
+            "timestamp": "2023-12-15 10:00:00.000",
+        })
+
+    def test_format_of(self):
+        """Test the format taken from the file name."""
+        self.assertEqual(exporters.format_of("a.csv.gz"), "csv")
+        self.assertEqual(exporters.format_of("a.jsonl"), "ndjson")
+        with self.assertRaises(ValueError):
+            exporters.format_of("a.json")
+
+
+if __name__ == "__main__":
+    unittest.main()
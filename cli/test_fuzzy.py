@@ -0,0 +1,46 @@
+"""
+This module contains unit tests for the fuzzy module.
+
+The tests check that misspelled searches find the intended
+item names and that availability counts follow the stock.
+"""
+
+import unittest
+
+from classes import Item, Warehouse
+from fuzzy import TrigramIndex
+
+
+class TestTrigramIndex(unittest.TestCase):
+    """Test case for the TrigramIndex class."""
+
+    def setUp(self):
+        """Create two warehouses with a few items."""
+        warehouse1 = Warehouse("1")
+        warehouse2 = Warehouse("2")
+        warehouse1.add_item(Item(state="Red", category="Router"))
+        warehouse1.add_item(Item(state="Red", category="Router"))
+        warehouse2.add_item(Item(state="Red", category="Router"))
+        warehouse2.add_item(Item(state="Second hand", category="Printer"))
+        self.index = TrigramIndex.from_stock([warehouse1, warehouse2])
+
+    def test_misspelled_search_finds_item(self):
+        """Test that a typo still ranks the right name first."""
+        name, score, counts = self.index.search("roter")[0]
+        self.assertEqual(name, "router")
+        self.assertEqual(counts, {"1": 2, "2": 1})
+        self.assertGreater(score, 0.5)
+
+    def test_unrelated_search_finds_nothing(self):
+        """Test that an unrelated term returns no candidates."""
+        self.assertEqual(self.index.search("xyz"), [])
+
+    def test_removed_units_update_counts(self):
+        """Test that names without stock are no longer suggested."""
+        self.index.remove("Second hand Printer", "2")
+        self.index.remove("Printer", "2")
+        self.assertEqual(self.index.search("second hand printr"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+"""
+This module contains unit tests for the generator and benchmark modules.
+
+The tests check that generated datasets are reproducible, load through
+the Loader and that the regression check compares against the baseline.
+"""
+
+import os
+import tempfile
+import unittest
+
+import generator
+from benchmark import find_regressions
+from loader import Loader
+
+
+class TestGenerator(unittest.TestCase):
+    """Test case for the dataset generator."""
+
+    def test_same_seed_gives_same_stock(self):
+        """Test that the generator is deterministic."""
+        first = list(generator.generate_stock(100, seed=3))
+        second = list(generator.generate_stock(100, seed=3))
+        self.assertEqual(first, second)
+        self.assertEqual(len(first), 100)
+
+    def test_generated_dataset_loads(self):
+        """Test that the generated files are read by the Loader."""
+        with tempfile.TemporaryDirectory() as out:
+            stock_path, personnel_path = generator.generate_dataset(
+                500, out, seed=1, warehouses=3
+            )
+            stock = Loader(model="stock", path=stock_path)
+            personnel = Loader(model="personnel", path=personnel_path)
+            self.assertTrue(os.path.exists(stock_path))
+
+        self.assertEqual(sum(len(w.stock) for w in stock), 500)
+        self.assertLessEqual(len(stock.objects), 3)
+        self.assertGreater(len(personnel.objects), 0)
+
+
+class TestBenchmark(unittest.TestCase):
+    """Test case for the benchmark regression check."""
+
+    def test_find_regressions(self):
+        """Test that only slowdowns above the threshold are reported."""
+        baseline = {"10000": {"load": 1.0, "search": 1.0}}
+        results = {"10000": {"load": 1.1, "search": 1.5}}
+        regressions = find_regressions(results, baseline, 0.2)
+        self.assertEqual(len(regressions), 1)
+        self.assertTrue(regressions[0].startswith("search"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,193 @@
+"""
+This module contains unit tests for the holds module.
+
+The tests cover placing holds for allocation plans, releasing and
+expiring them, the availability other sessions see, and orders that
+skip held units.
+"""
+
+import json
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+import query
+from allocation import execute_allocation, plan_allocation
+from benchmark import use_stock
+from classes import Employee, Item, Warehouse
+from holds import HoldManager
+from loader import Loader
+
+
+class FakeClock:
+    """Clock advanced by hand."""
+
+    def __init__(self):
+        """Start the clock at zero."""
+        self.now = 0.0
+
+    def __call__(self):
+        """Return the current time."""
+        return self.now
+
+
+class TestHolds(unittest.TestCase):
+    """Test case for the HoldManager class."""
+
+    def setUp(self):
+        """Create a manager with a fake clock and two warehouses."""
+        self.clock = FakeClock()
+        self.holds = HoldManager(ttl=10, clock=self.clock)
+        self.first, self.second = Warehouse(1), Warehouse(2)
+        self.first.add_item(Item("Red", "Router", "2021-01-01", 1, 3))
+        self.second.add_item(Item("Red", "Router", "2022-01-01", 2, 2))
+        self.second.add_item(Item("Blue", "Router", "2022-01-01", 2, 4))
+        self.stock = [self.first, self.second]
+        # Every red router of both warehouses
+        self.red_plan = [(self.first, 3), (self.second, 2)]
+
+    def test_hold_hides_units_from_others(self):
+        """Test that held units are not available to other owners."""
+        hold = self.holds.place("alice", self.red_plan, "red router")
+        self.assertEqual(hold.total, 5)
+        self.assertEqual(self.holds.available(self.stock, "red router", "alice"),
+                         {"1": 3, "2": 2})
+        self.assertEqual(self.holds.available(self.stock, "router", "bob"),
+                         {"2": 4})
+        self.assertEqual(self.holds.reserved("router", "bob"),
+                         {(1, "red router"): 3, (2, "red router"): 2})
+        self.assertEqual(self.holds.reserved("router", "alice"), {})
+
+    def test_only_planned_units_are_held(self):
+        """Test that a broad search holds the planned units only."""
+        hold = self.holds.place("alice", [(self.second, 3)], "router")
+        self.assertEqual(hold.units, {(2, "red router"): 2,
+                                      (2, "blue router"): 1})
+        self.assertEqual(self.holds.available(self.stock, "router", "bob"),
+                         {"1": 3, "2": 3})
+
+    def test_second_hold_gets_the_rest(self):
+        """Test that a hold leaves out the units others hold."""
+        self.holds.place("alice", [(self.second, 2)], "red router")
+        hold = self.holds.place("bob", [(self.second, 6)], "router")
+        self.assertEqual(hold.units, {(2, "blue router"): 4})
+
+    def test_new_hold_replaces_previous(self):
+        """Test that an owner keeps a single hold."""
+        self.holds.place("alice", self.red_plan, "red router")
+        self.holds.place("alice", [(self.second, 4)], "blue router")
+        self.assertEqual(len(self.holds), 1)
+        self.assertEqual(self.holds.available(self.stock, "red router", "bob"),
+                         {"1": 3, "2": 2})
+
+    def test_release(self):
+        """Test that a released hold frees its units, once."""
+        hold = self.holds.place("alice", self.red_plan, "red router")
+        self.holds.release(hold)
+        self.holds.release(hold)
+        self.assertEqual(len(self.holds), 0)
+        self.assertEqual(self.holds.reserved("router", "bob"), {})
+
+    def test_reap_in_deadline_order(self):
+        """Test that holds expire in the order of their deadlines."""
+        self.holds.place("alice", self.red_plan, "red router", ttl=5)
+        self.holds.place("bob", [(self.second, 4)], "blue router", ttl=20)
+        self.clock.now = 4
+        self.assertEqual(self.holds.reap(), 1)
+        self.assertEqual(len(self.holds), 2)
+        self.clock.now = 5
+        self.assertEqual(self.holds.reap(), 15)
+        self.assertEqual(self.holds.reserved("router", "carol"),
+                         {(2, "blue router"): 4})
+        self.clock.now = 25
+        self.assertIsNone(self.holds.reap())
+        self.assertEqual(len(self.holds), 0)
+
+    def test_reaper_thread(self):
+        """Test that the reaper thread releases an expired hold."""
+        holds = HoldManager(ttl=0.05)
+        holds.start_reaper()
+        try:
+            holds.place("alice", self.red_plan, "red router")
+            deadline = time.monotonic() + 2
+            while len(holds) and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(len(holds), 0)
+        finally:
+            holds.stop_reaper()
+
+    def test_order_skips_held_units(self):
+        """Test that an order leaves the units other owners hold."""
+        self.holds.place("alice", self.red_plan, "red router")
+        reserved = self.holds.reserved("router", "bob")
+        plan = plan_allocation(self.stock, "router", 10, "fewest", reserved)
+        self.assertEqual(sum(units for _, units in plan), 4)
+        self.assertEqual(execute_allocation(plan, "router", "fewest", reserved), 4)
+        self.assertEqual(self.stock[1].units_by_name("router"),
+                         {"red router": 2})
+
+
+class TestOrderFlowHolds(unittest.TestCase):
+    """Test case for the holds of the search-and-order flow."""
+
+    def setUp(self):
+        """Load 3 and 2 red routers into two warehouses of the query module."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "stock.json")
+            with open(path, "w") as file:
+                json.dump([
+                    {"state": "Red", "category": "Router", "warehouse": 1,
+                     "date_of_stock": "2021-01-01 10:00:00", "quantity": 3},
+                    {"state": "Red", "category": "Router", "warehouse": 2,
+                     "date_of_stock": "2022-01-01 10:00:00", "quantity": 2},
+                ], file)
+            self.loader = Loader(model="stock", path=path)
+        self.alice = Employee("Alice", "secret")
+        self.bob = Employee("Bob", "secret")
+
+    def tearDown(self):
+        """Drop the holds left in the query module."""
+        for owner in (self.alice, self.bob):
+            query.holds.release(query.holds.place(owner, [], "red router"))
+
+    def free_for_bob(self):
+        """Return the units Bob may order while Alice is answering."""
+        return sum(query.holds.available(self.loader, "red router",
+                                         self.bob).values())
+
+    def test_shown_units_are_held_until_answered(self):
+        """Test the hold from the availability to the confirmation."""
+        free = []
+
+        def answer(prompt):
+            free.append(self.free_for_bob())
+            if "searching" in prompt:
+                return "red router"
+            if "How much" in prompt:
+                return "2"
+            return "y" if "place an order" in prompt else "n"
+
+        with use_stock(self.loader), patch("builtins.input", answer), \
+                patch("builtins.print"):
+            query.process_search_and_order([], self.alice)
+
+        # Search, order?, quantity, confirm, continue?
+        self.assertEqual(free, [5, 0, 0, 3, 5])
+        self.assertEqual(len(query.holds), 0)
+
+    def test_confirm_plans_around_other_holds(self):
+        """Test that an order only plans the units others do not hold."""
+        with use_stock(self.loader):
+            query.hold_stock("red router", self.alice)
+            with patch("builtins.input", return_value="y"), \
+                    patch("builtins.print"):
+                actions = []
+                query.confirm_order("red router", 5, actions, self.bob)
+        self.assertEqual(actions, ["Ordered 0 of red router"])
+        self.assertEqual(sum(w.occupancy() for w in self.loader), 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+This module contains unit tests for the incremental_export module.
+
+The tests check that only changed warehouses are rewritten and that
+the exported shards load back into the same stock.
+"""
+
+import os
+import tempfile
+import unittest
+
+from classes import Item, Warehouse
+from incremental_export import IncrementalExporter
+from loader import Loader
+
+
+class TestIncrementalExporter(unittest.TestCase):
+    """Test case for the IncrementalExporter class."""
+
+    def setUp(self):
+        """Create two warehouses and a temporary export directory."""
+        self.warehouses = [Warehouse("1"), Warehouse("2")]
+        for number, warehouse in enumerate(self.warehouses):
+            for day in range(1, 4):
+                warehouse.add_item(Item("Red", "Router", f"2021-0{day}-0{number + 1}",
+                                        int(warehouse.warehouse_id)))
+        self.directory = tempfile.TemporaryDirectory()
+        self.exporter = IncrementalExporter(self.directory.name)
+
+    def tearDown(self):
+        """Remove the export directory."""
+        self.directory.cleanup()
+
+    def test_only_changed_warehouses_are_written(self):
+        """Test the dirty tracking between exports."""
+        self.assertEqual(self.exporter.export(self.warehouses), ["1", "2"])
+        self.assertEqual(self.exporter.export(self.warehouses), [])
+
+        warehouse = self.warehouses[1]
+        warehouse.remove_item(warehouse.stock[0])
+        self.assertEqual(self.exporter.export(self.warehouses), ["2"])
+        self.assertFalse(any(name.endswith(".tmp")
+                             for name in os.listdir(self.directory.name)))
+
+    def test_export_loads_back(self):
+        """Test that the exported shards and manifest are readable."""
+        self.warehouses[0].add_item(Item("Blue", "Mouse", "2022-01-01", 1))
+        self.exporter.export(self.warehouses)
+
+        loader = Loader(model="stock", shards=self.directory.name, lazy=True)
+        summaries = {warehouse.warehouse_id: warehouse.summary()
+                     for warehouse in loader}
+        self.assertEqual(summaries["1"]["total"], 4)
+        self.assertEqual(summaries["1"]["newest"], "2022-01-01")
+
+        warehouse = next(w for w in loader if w.warehouse_id == "1")
+        self.assertEqual(len(warehouse.stock), 4)
+        self.assertEqual(warehouse.version, 0)
+
+
+class TestLoaderToDict(unittest.TestCase):
+    """Test case for Loader.to_dict."""
+
+    def test_to_dict_leaves_items_untouched(self):
+        """Test that to_dict returns copies with the warehouse set."""
+        loader = Loader(model="stock")
+        item = loader.objects[0].stock[0]
+        attributes = dict(vars(item))
+        records = loader.to_dict()
+        self.assertEqual(len(records), 5000)
+        records[0]["state"] = "changed"
+        self.assertEqual(vars(item), attributes)
+
+
+if __name__ == "__main__":
+    unittest.main()
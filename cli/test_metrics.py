@@ -0,0 +1,65 @@
+"""
+This module contains unit tests for the metrics module.
+
+The tests cover counters, histogram quantile estimates and
+the Prometheus and JSON dumps of a registry.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+from metrics import Registry
+
+
+class TestMetrics(unittest.TestCase):
+    """Test case for the metrics registry."""
+
+    def setUp(self):
+        """Create an empty registry."""
+        self.registry = Registry()
+
+    def test_counter_with_labels(self):
+        """Test that labelled series are counted separately."""
+        logins = self.registry.counter("logins_total", "Logins.")
+        logins.inc(result="success")
+        logins.inc(result="success")
+        logins.inc(result="failure")
+        self.assertEqual(logins.value(result="success"), 2)
+        self.assertEqual(logins.value(result="failure"), 1)
+        self.assertIn('logins_total{result="success"} 2',
+                      self.registry.to_prometheus())
+
+    def test_histogram_quantiles(self):
+        """Test that quantiles fall in the right bucket."""
+        latency = self.registry.histogram("latency", "Latency.", (1, 10, 100))
+        for _ in range(98):
+            latency.observe(0.5)
+        latency.observe(50)
+        latency.observe(50)
+        self.assertLessEqual(latency.quantile(0.5), 1)
+        self.assertGreater(latency.quantile(0.995), 10)
+        self.assertEqual(latency.count(), 100)
+
+    def test_same_name_returns_same_metric(self):
+        """Test that metrics are registered once per name."""
+        first = self.registry.counter("orders_total")
+        self.assertIs(self.registry.counter("orders_total"), first)
+        with self.assertRaises(ValueError):
+            self.registry.histogram("orders_total")
+
+    def test_dump_json(self):
+        """Test the JSON dump with quantile estimates."""
+        self.registry.histogram("latency", "Latency.").observe(0.002)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "metrics.json")
+            self.registry.dump(path)
+            with open(path) as file:
+                data = json.load(file)
+        self.assertEqual(data["latency"]["total"]["count"], 1)
+        self.assertIn("p99", data["latency"]["total"])
+
+
+if __name__ == "__main__":
+    unittest.main()
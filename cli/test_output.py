@@ -0,0 +1,65 @@
+"""
+This module contains unit tests for the output module.
+
+The tests cover the buffered Renderer, its pagination prompt
+and the summary-only listing of the query module.
+"""
+
+import unittest
+from io import StringIO
+from unittest.mock import patch
+
+import query
+from output import Renderer
+
+
+class CountingStream(StringIO):
+    """StringIO that counts how many times write() is called."""
+
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+
+
+class TestRenderer(unittest.TestCase):
+    """Test case for the Renderer class."""
+
+    def test_lines_are_written_in_chunks(self):
+        """Test that many lines result in few writes."""
+        stream = CountingStream()
+        with Renderer(stream=stream, chunk_size=1024) as renderer:
+            renderer.lines(f"item {i}" for i in range(1000))
+        self.assertEqual(len(stream.getvalue().splitlines()), 1000)
+        self.assertLess(stream.writes, 20)
+
+    def test_pagination_stops_on_quit(self):
+        """Test that answering q at the prompt stops the output."""
+        stream = StringIO()
+        answers = iter(["", "q"])
+        with Renderer(stream=stream, page_size=10,
+                      user_input=lambda _: next(answers)) as renderer:
+            renderer.lines(f"item {i}" for i in range(100))
+        self.assertEqual(len(stream.getvalue().splitlines()), 20)
+        self.assertTrue(renderer.stopped)
+
+
+class TestListing(unittest.TestCase):
+    """Test case for the listing of items by warehouse."""
+
+    @patch("sys.stdout", new_callable=StringIO)
+    def test_summary_only_listing(self, mock_stdout):
+        """Test that the summary mode prints counts without items."""
+        total_items, warehouses = query.item_list_by_warehouse(summary_only=True)
+        actual_output = mock_stdout.getvalue()
+        self.assertEqual(total_items, 5000)
+        self.assertIn("Total items in Warehouse 4: 1223", actual_output)
+        self.assertNotIn("elegant pen drive", actual_output)
+        self.assertLess(len(actual_output.splitlines()), 3 * len(warehouses) + 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+"""
+This module contains unit tests for the paging module.
+
+The tests walk the stock page by page, resume cursors after the stock
+changed, and page snapshots of lazily loaded shards.
+"""
+
+import tempfile
+import unittest
+
+import generator
+import shards
+from classes import Item, Warehouse
+from loader import Loader
+from paging import decode_cursor, encode_cursor, iter_stock, page
+from snapshot import SnapshotStore
+
+
+def walk(stock, size, **kwargs):
+    """Return every row, read page by page, and the number of pages."""
+    rows, cursor, pages = [], None, 0
+    while True:
+        result = page(stock, size, cursor, **kwargs)
+        rows.extend(result.rows)
+        pages += 1
+        cursor = result.cursor
+        if cursor is None:
+            return rows, pages
+
+
+def positions(rows):
+    """Return the (warehouse id, date, item id) of every row."""
+    return [(warehouse.warehouse_id, item.date_of_stock, item.item_id)
+            for warehouse, item in rows]
+
+
+class TestPaging(unittest.TestCase):
+    """Test case for cursor pagination."""
+
+    def setUp(self):
+        """Create two warehouses of six items, some on the same date."""
+        self.stock = []
+        for warehouse_id in (1, 2):
+            warehouse = Warehouse(warehouse_id)
+            for date_of_stock in ("2021-03-01", None, "2021-01-01",
+                                  "2021-03-01", "2021-02-01", "2021-03-01"):
+                warehouse.add_item(
+                    Item("Red", "Router", date_of_stock, warehouse_id)
+                )
+            self.stock.append(warehouse)
+
+    def test_stable_order(self):
+        """Test the order by warehouse, date and id."""
+        self.assertEqual(positions(iter_stock(self.stock))[:6], [
+            (1, None, 1), (1, "2021-01-01", 2), (1, "2021-02-01", 4),
+            (1, "2021-03-01", 0), (1, "2021-03-01", 3), (1, "2021-03-01", 5),
+        ])
+
+    def test_pages_cover_the_stock(self):
+        """Test that the pages list every item once, for every size."""
+        everything = positions(iter_stock(self.stock))
+        self.assertEqual(len(everything), 12)
+        for size in (1, 4, 5, 12, 13):
+            with self.subTest(size=size):
+                rows, pages = walk(self.stock, size)
+                self.assertEqual(positions(rows), everything)
+                self.assertEqual(pages, -(-12 // size))
+
+    def test_cursor_survives_changes(self):
+        """Test resuming after items before and after the cursor changed."""
+        first = page(self.stock, 4)
+        warehouse = self.stock[0]
+        # Remove the last item read, and add an item before and after it
+        warehouse.remove_item(first.rows[-1][1])
+        warehouse.add_item(Item("Red", "Router", "2020-01-01", 1))
+        warehouse.add_item(Item("Red", "Router", "2021-03-01", 1))
+        second = page(self.stock, 4, first.cursor)
+        self.assertEqual(positions(second.rows), [
+            (1, "2021-03-01", 3), (1, "2021-03-01", 5), (1, "2021-03-01", 7),
+            (2, None, 1),
+        ])
+
+    def test_warehouse_filter(self):
+        """Test paging a single warehouse."""
+        rows, _ = walk(self.stock, 4, warehouse="2")
+        self.assertEqual({warehouse.warehouse_id for warehouse, _ in rows}, {2})
+        self.assertEqual(len(rows), 6)
+
+    def test_invalid_cursors(self):
+        """Test that malformed and foreign cursors are rejected."""
+        other = Warehouse(9)
+        other.add_item(Item("Red", "Router", "2021-01-01", 9))
+        foreign = encode_cursor(other, other.stock[0])
+        self.assertEqual(decode_cursor(foreign), ("9", "2021-01-01", 0))
+        for cursor in ("not a cursor", "bnVsbA==", foreign):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(ValueError):
+                    page(self.stock, 4, cursor)
+        with self.assertRaises(ValueError):
+            page(self.stock, 0)
+
+    def test_snapshot_after_changes(self):
+        """Test that a snapshot copies the order of the live date index."""
+        store = SnapshotStore(self.stock)
+        try:
+            page(self.stock, 12)
+            warehouse = self.stock[0]
+            warehouse.add_item(Item("Red", "Router", "2021-02-01", 1))
+            warehouse.take(warehouse.stock[0], 1)
+            warehouse.add_items([Item("Red", "Router", None, 1)])
+            rows, _ = walk(store.snapshot(), 5)
+            self.assertEqual(positions(rows), positions(iter_stock(self.stock)))
+        finally:
+            store.close()
+
+    def test_snapshot_of_lazy_shards(self):
+        """Test that snapshots page like the live stock."""
+        records = list(generator.generate_stock(120, seed=2, warehouses=3))
+        with tempfile.TemporaryDirectory() as directory:
+            shards.write_shards(records, directory)
+            loader = Loader(model="stock", shards=directory, lazy=True)
+            store = SnapshotStore(loader)
+            try:
+                rows, _ = walk(store.snapshot(), 7)
+                self.assertFalse(any(w.is_loaded for w in loader))
+                self.assertEqual(positions(rows), positions(iter_stock(loader)))
+            finally:
+                store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
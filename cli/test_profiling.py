@@ -0,0 +1,99 @@
+"""
+This module contains unit tests for the profiling module.
+
+The tests check that nothing is recorded while profiling is disabled
+and that nested spans produce collapsed stacks for flame graphs.
+"""
+
+import os
+import pstats
+import tempfile
+import unittest
+
+import profiling
+
+
+class TestProfiling(unittest.TestCase):
+    """Test case for the profiling spans."""
+
+    def setUp(self):
+        """Start every test with profiling disabled and no spans."""
+        self.enabled = profiling.settings.enabled
+        profiling.settings.enabled = False
+        profiling.reset()
+
+    def tearDown(self):
+        """Restore the profiling settings."""
+        profiling.settings.enabled = self.enabled
+        profiling.settings.cprofile = False
+        profiling.reset()
+
+    def test_disabled_profiling_records_nothing(self):
+        """Test that spans are no-ops while disabled."""
+        with profiling.span("search"):
+            pass
+        profiling.profiled("order")(lambda: None)()
+        self.assertEqual(profiling.summary(), {})
+
+    def test_nested_spans_are_collapsed(self):
+        """Test the timings and collapsed stacks of nested spans."""
+        profiling.enable()
+
+        @profiling.profiled("search")
+        def search():
+            with profiling.span("log"):
+                pass
+
+        with profiling.span("session"):
+            search()
+            search()
+
+        timings = profiling.summary()
+        self.assertEqual(timings["search"]["count"], 2)
+        self.assertEqual(timings["session"]["count"], 1)
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            profiling.dump(output_dir)
+            with open(os.path.join(output_dir, "spans.collapsed")) as file:
+                stacks = [line.split()[0] for line in file]
+        self.assertIn("session;search;log", stacks)
+
+    def test_nested_spans_get_their_own_stats(self):
+        """Test that an operation inside a session has cProfile stats."""
+        profiling.enable(cprofile=True)
+
+        def busy():
+            return sum(range(1000))
+
+        @profiling.profiled("search")
+        def search():
+            busy()
+
+        with profiling.span("session"):
+            search()
+            sorted(range(10))
+
+        with tempfile.TemporaryDirectory() as output_dir:
+            profiling.dump(output_dir)
+            self.assertEqual(
+                sorted(name for name in os.listdir(output_dir)
+                       if name.endswith(".prof")),
+                ["search.prof", "session.prof"],
+            )
+            search_functions = {
+                function for _, _, function in pstats.Stats(
+                    os.path.join(output_dir, "search.prof")
+                ).stats
+            }
+            session_functions = {
+                function for _, _, function in pstats.Stats(
+                    os.path.join(output_dir, "session.prof")
+                ).stats
+            }
+        self.assertIn("busy", search_functions)
+        self.assertNotIn("busy", session_functions)
+        self.assertIn("<built-in method builtins.sorted>", session_functions)
+
+
+if __name__ == "__main__":
+    unittest.main()
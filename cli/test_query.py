@@ -73,7 +73,8 @@ class TestQueryFunctions(unittest.TestCase):
             self.assertIn("1. List items by warehouse", prints)
             self.assertIn("2. Search an item and place an order", prints)
             self.assertIn("3. Browse by category", prints)
-            self.assertIn("4. Quit", prints)
+            self.assertIn("4. Filter stock", prints)
+            self.assertIn("5. Quit", prints)
 
     def test_search_and_order_item(self):
         """Test the search_and_order_item function."""
@@ -0,0 +1,209 @@
+"""
+This module contains unit tests for the receiving module.
+
+The tests compare batches added with Warehouse.add_items to items added
+one by one, and receive CSV and JSON lines deliveries with their journal.
+"""
+
+import csv
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+import events
+import generator
+import receiving
+from cache import LRUCache
+from classes import Item, Warehouse
+from loader import Loader
+from views import StockViews
+
+
+GOOD = {"state": "Red", "category": "Router", "warehouse": 1,
+        "date_of_stock": "2021-01-01 10:00:00"}
+
+
+def records():
+    return list(generator.generate_stock(300, seed=5, warehouses=1,
+                                         max_quantity=3))
+
+
+def make_items():
+    return [Item(record["state"], record["category"], record["date_of_stock"],
+                 record["warehouse"], record.get("quantity", 1))
+            for record in records()]
+
+
+def describe(warehouse):
+    return (
+        [vars(item) for item in warehouse.stock],
+        {name: sorted(item.item_id for item in items)
+         for name, items in warehouse._index.items()},
+        warehouse.category_counts(),
+        warehouse.summary(),
+        {name: warehouse.availability(name) for name in warehouse._names},
+        [item.item_id for item in warehouse.date_index()[1]],
+    )
+
+
+class TestAddItems(unittest.TestCase):
+    """Test case for Warehouse.add_items."""
+
+    def test_batch_matches_single_items(self):
+        """Test that a batch leaves the same index and aggregates."""
+        single, batch = Warehouse(1), Warehouse(1)
+        single.add_item(Item("Red", "Router", "2019-01-01", 1))
+        batch.add_item(Item("Red", "Router", "2019-01-01", 1))
+        for item in make_items():
+            single.add_item(item)
+        self.assertEqual(batch.add_items(make_items()),
+                         sum(item.quantity for item in make_items()))
+        self.assertEqual(describe(batch), describe(single))
+        self.assertEqual(batch.add_items([]), 0)
+
+    def test_one_event_per_batch(self):
+        """Test that a batch is a single change of the warehouse."""
+        warehouse = Warehouse(1)
+        received = []
+        events.bus.subscribe(received.append)
+        try:
+            warehouse.add_items(make_items())
+        finally:
+            events.bus.unsubscribe(received.append)
+        self.assertEqual(warehouse.version, 1)
+        self.assertEqual([(event.kind, len(event.item)) for event in received],
+                         [(events.ITEMS_RECEIVED, 300)])
+        self.assertEqual(events.event_record(received[0])["items"], 300)
+
+    def test_views_follow_batches(self):
+        """Test that the category counts include a received batch."""
+        warehouse = Warehouse(1)
+        warehouse.add_item(Item("Red", "Router", "2019-01-01", 1))
+        views = StockViews([warehouse], LRUCache())
+        try:
+            views.category_counts()
+            warehouse.add_items(make_items())
+            self.assertEqual(views.category_counts(),
+                             warehouse.category_counts())
+        finally:
+            views.close()
+
+
+class TestReceive(unittest.TestCase):
+    """Test case for receiving deliveries."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.journal = os.path.join(self.directory.name, "receipts.jsonl")
+        self.stock = [Warehouse("1"), Warehouse("2")]
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_csv_delivery(self):
+        """Test a CSV delivery with a bad row and an unknown warehouse."""
+        path = self.path("delivery.csv")
+        with open(path, "w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["state", "category", "warehouse",
+                             "date_of_stock", "quantity"])
+            writer.writerow(["Red", "Router", "1", "2021-01-01 10:00:00", "4"])
+            writer.writerow(["Blue", "Mouse", "2", "", ""])
+            writer.writerow(["Blue", "Mouse", "2", "yesterday", "1"])
+            writer.writerow(["Blue", "Mouse", "9", "2021-01-01", "1"])
+        receipt = receiving.receive(self.stock, receiving.iter_delivery(path),
+                                    self.journal, source=path)
+        self.assertEqual((receipt.items, receipt.units), (2, 5))
+        self.assertEqual([(error.index, error.field) for error in receipt.errors],
+                         [(2, "date_of_stock"), (3, "warehouse")])
+        self.assertEqual([warehouse.occupancy() for warehouse in self.stock],
+                         [4, 1])
+
+        [entry] = receiving.read_journal(self.journal)
+        self.assertEqual(entry["batch"], receipt.batch)
+        self.assertEqual(entry["source"], path)
+        self.assertEqual(entry["columns"]["1"],
+                         [1, ["Red"], ["Router"], ["2021-01-01 10:00:00"], [4]])
+
+    def test_jsonl_delivery(self):
+        """Test a JSON lines delivery and a torn journal."""
+        path = self.path("delivery.jsonl")
+        with open(path, "w") as file:
+            for record in records():
+                file.write(json.dumps(record) + "\n")
+        receipt = receiving.receive(self.stock, receiving.iter_delivery(path),
+                                    self.journal)
+        self.assertEqual(receipt.errors, [])
+        self.assertEqual(self.stock[0].occupancy(), receipt.units)
+        with open(self.journal, "a") as file:
+            file.write('{"batch": "torn')
+        self.assertEqual(len(receiving.read_journal(self.journal)), 1)
+
+    def test_write_lock_is_held(self):
+        """Test that the batch is added under the writers' lock."""
+        lock = threading.RLock()
+        held = []
+        warehouse = self.stock[0]
+        original = warehouse.add_items
+
+        def add_items(items):
+            # Another thread cannot take the lock while the batch is added
+            other = threading.Thread(
+                target=lambda: held.append(not lock.acquire(blocking=False))
+            )
+            other.start()
+            other.join()
+            return original(items)
+
+        warehouse.add_items = add_items
+        receiving.receive(self.stock, [dict(GOOD)], None, write_lock=lock)
+        self.assertEqual(held, [True])
+
+    def save_one_item(self, stock_path):
+        """Write a stock file holding one item in warehouse 1."""
+        warehouse = Warehouse("1")
+        warehouse.add_item(Item("Blue", "Mouse", "2020-01-01", 1))
+        receiving.save_stock([warehouse], stock_path)
+
+    def test_compressed_stock_file(self):
+        """Test that receiving into a compressed stock keeps it loadable."""
+        stock_path = self.path("stock.json.gz")
+        self.save_one_item(stock_path)
+        delivery = self.path("delivery.jsonl")
+        with open(delivery, "w") as file:
+            file.write(json.dumps(GOOD) + "\n")
+        receiving.main([delivery, "--stock", stock_path,
+                        "--journal", self.journal])
+        receiving.main([delivery, "--stock", stock_path,
+                        "--journal", self.journal])
+        loaded = Loader(model="stock", path=stock_path)
+        self.assertEqual([warehouse.occupancy() for warehouse in loaded], [3])
+        self.assertEqual(receiving.pending_batches(stock_path, self.journal), [])
+
+    def test_unsaved_batch_is_replayed(self):
+        """Test that a batch journaled but never saved is replayed once."""
+        stock_path = self.path("stock.json")
+        self.save_one_item(stock_path)
+        stock = [Warehouse("1")]
+        receiving.receive(stock, [dict(GOOD, quantity=3)], self.journal,
+                          stock_path=stock_path)
+        # The process stops before the stock file is saved
+
+        delivery = self.path("delivery.jsonl")
+        with open(delivery, "w") as file:
+            file.write(json.dumps(GOOD) + "\n")
+        receiving.main([delivery, "--stock", stock_path,
+                        "--journal", self.journal])
+        receiving.main([delivery, "--stock", stock_path,
+                        "--journal", self.journal])
+        loaded = Loader(model="stock", path=stock_path)
+        self.assertEqual([warehouse.occupancy() for warehouse in loaded], [6])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+"""
+This module contains unit tests for the replay module.
+
+The tests turn log lines into sessions and replay them concurrently
+against a small stock, checking the orders taken and the lost orders.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import replay
+from benchmark import use_stock
+from loader import Loader
+
+EMPLOYEE_LOG = """\
+Jeremy. Listed 4 items from 2 Warehouses. 2023-12-14 14:28:51.597.
+Jeremy. Searched for red router. 2023-12-14 14:28:51.597.
+Jeremy. Ordered 2 of red router. 2023-12-14 14:28:51.597.
+Jeremy. Browsed the category Mouse. 2023-12-14 15:01:09.067.
+Jeremy. Ordered 0 of red router. 2023-12-14 15:01:09.067.
+Juno. Filtered the stock by category:mouse limit:1. 2023-12-14 15:01:09.067.
+Juno. Quit. 2023-12-14 15:01:09.067.
+malformed line
+"""
+USER_LOG = """\
+Nina. Searched for blue mouse. 2023-12-14 14:29:01.494.
+"""
+
+
+def make_loader(directory):
+    path = os.path.join(directory, "stock.json")
+    with open(path, "w") as file:
+        json.dump([
+            {"state": "Red", "category": "Router", "warehouse": warehouse_id,
+             "date_of_stock": "2021-01-01 10:00:00", "quantity": 3}
+            for warehouse_id in (1, 2)
+        ] + [
+            {"state": "Blue", "category": "Mouse", "warehouse": warehouse_id,
+             "date_of_stock": "2021-01-01 10:00:00"}
+            for warehouse_id in (1, 2)
+        ], file)
+    return Loader(model="stock", path=path)
+
+
+class TestSessions(unittest.TestCase):
+    """Test case for reading sessions from the action logs."""
+
+    def test_parse_action(self):
+        """Test the operation replaying every kind of action."""
+        self.assertEqual(replay.parse_action("Ordered 3 of red router"),
+                         replay.Operation("order", "red router", 3))
+        self.assertEqual(replay.parse_action("Browsed the category Mouse"),
+                         replay.Operation("browse", "Mouse", 0))
+        self.assertEqual(replay.parse_action("Listed 5000 items from 4 Warehouses"),
+                         replay.Operation("list", None, 0))
+        self.assertIsNone(replay.parse_action("Ordered 0 of red router"))
+        self.assertIsNone(replay.parse_action("Searched for"))
+
+    def test_load_sessions(self):
+        """Test that actions sharing a user and timestamp form a session."""
+        with tempfile.TemporaryDirectory() as directory:
+            paths = {}
+            for log, text in (("employee", EMPLOYEE_LOG), ("user", USER_LOG)):
+                paths[log] = os.path.join(directory, f"{log}_log.txt")
+                with open(paths[log], "w") as file:
+                    file.write(text)
+            sessions = replay.load_sessions(paths)
+        self.assertEqual(
+            [(session.user_name, [operation.kind for operation in session.operations])
+             for session in sessions],
+            [("Jeremy", ["list", "search", "order"]), ("Jeremy", ["browse"]),
+             ("Juno", ["filter"]), ("Nina", ["search"])],
+        )
+
+
+class TestReplay(unittest.TestCase):
+    """Test case for replaying sessions concurrently."""
+
+    def test_replay_and_lost_orders(self):
+        """Test that orders beyond the stock are reported as lost."""
+        session = replay.Session("employee", "Jeremy", "2023-12-14", [
+            replay.Operation("list", None, 0),
+            replay.Operation("search", "red router", 0),
+            replay.Operation("order", "red router", 2),
+            replay.Operation("browse", "Mouse", 0),
+            replay.Operation("filter", "category:mouse", 0),
+            replay.Operation("filter", "colour:red", 0),
+        ])
+        with tempfile.TemporaryDirectory() as directory:
+            loader = make_loader(directory)
+        with use_stock(loader):
+            report = replay.replay([session], multiplier=4, workers=4)
+        summary = replay.summarize(report)
+
+        # 6 units for 4 orders of 2: 2 units are missing, from one order
+        # or split over two, depending on how the orders interleave
+        self.assertEqual(sum(warehouse.occupancy() for warehouse in loader), 2)
+        self.assertEqual((summary["sessions"], summary["operations"]), (4, 24))
+        self.assertEqual((summary["orders"], summary["lost_units"]), (4, 2))
+        self.assertIn(summary["lost_orders"], (1, 2))
+        self.assertEqual(summary["errors"], 4)
+        self.assertEqual(summary["error_types"], {"ValueError": 4})
+        self.assertEqual(list(summary["latency"]),
+                         ["list", "search", "browse", "order", "filter"])
+        self.assertEqual(summary["latency"]["filter"]["count"], 8)
+
+        with self.assertRaises(ValueError):
+            replay.replay([session], multiplier=0)
+
+    def test_errors_of_other_threads_are_counted(self):
+        """Test that an exception raised off the worker threads is an error."""
+        def find_items(stock, search_item):
+            worker = threading.Thread(target=lambda: {}["missing"])
+            worker.start()
+            worker.join()
+
+        session = replay.Session("employee", "Jeremy", "2023-12-14", [
+            replay.Operation("search", "red router", 0),
+        ])
+        with tempfile.TemporaryDirectory() as directory:
+            loader = make_loader(directory)
+        with use_stock(loader), \
+                patch.object(replay.query, "find_items", find_items), \
+                patch.object(threading, "excepthook", lambda arguments: None):
+            report = replay.replay([session], multiplier=3)
+        summary = replay.summarize(report)
+        self.assertEqual(report.thread_errors, ["KeyError: 'missing'"] * 3)
+        self.assertEqual(summary["errors"], 3)
+        self.assertEqual(summary["error_types"], {"KeyError": 3})
+
+    def test_percentile(self):
+        """Test the nearest-rank percentiles."""
+        values = list(range(100, 0, -1))
+        self.assertEqual(replay.percentile(values, 0.5), 50)
+        self.assertEqual(replay.percentile(values, 0.99), 99)
+        self.assertEqual(replay.percentile(values, 1), 100)
+        self.assertIsNone(replay.percentile([], 0.5))
+
+
+if __name__ == "__main__":
+    unittest.main()
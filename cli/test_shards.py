@@ -0,0 +1,128 @@
+"""
+This module contains unit tests for the shards module.
+
+The tests check that sharded stock loads in worker processes
+into the same warehouses as the single stock file.
+"""
+
+import tempfile
+import unittest
+
+import generator
+import shards
+from loader import Loader
+
+
+class TestShards(unittest.TestCase):
+    """Test case for sharded stock files."""
+
+    def test_sharded_stock_matches_plain_stock(self):
+        """Test that both layouts load the same items."""
+        records = list(generator.generate_stock(300, seed=2, warehouses=3))
+        with tempfile.TemporaryDirectory() as directory:
+            counts = shards.write_shards(records, directory)
+            self.assertEqual(len(shards.shard_paths(directory)), len(counts))
+            loader = Loader(model="stock", shards=directory, workers=2)
+
+        loaded = {
+            warehouse.warehouse_id: sorted(
+                (item.state, item.category, item.date_of_stock)
+                for item in warehouse.stock
+            )
+            for warehouse in loader
+        }
+        expected = {}
+        for record in records:
+            expected.setdefault(str(record["warehouse"]), []).append(
+                (record["state"], record["category"], record["date_of_stock"])
+            )
+        self.assertEqual(loaded, {key: sorted(value)
+                                  for key, value in expected.items()})
+
+    def test_lazy_warehouses_use_the_manifest(self):
+        """Test that counts come from the manifest until stock is read."""
+        records = list(generator.generate_stock(200, seed=4, warehouses=2))
+        with tempfile.TemporaryDirectory() as directory:
+            shards.write_shards(records, directory)
+            loader = Loader(model="stock", shards=directory, lazy=True)
+            warehouse = loader.objects[0]
+
+            self.assertFalse(warehouse.is_loaded)
+            expected = sum(1 for record in records
+                           if str(record["warehouse"]) == warehouse.warehouse_id)
+            self.assertEqual(warehouse.occupancy(), expected)
+            self.assertEqual(sum(warehouse.category_counts().values()), expected)
+            self.assertFalse(warehouse.is_loaded)
+
+            self.assertEqual(len(warehouse.stock), expected)
+            self.assertTrue(warehouse.is_loaded)
+            self.assertFalse(loader.objects[1].is_loaded)
+
+    def test_invalid_rows_are_reported(self):
+        """Test that shards are validated like a stock file."""
+        records = list(generator.generate_stock(40, seed=5, warehouses=2))
+        records[3] = dict(records[3], state=None)
+        records[7] = dict(records[7], colour="red")
+        warehouse_ids = {str(records[3]["warehouse"]),
+                         str(records[7]["warehouse"])}
+        with tempfile.TemporaryDirectory() as directory:
+            shards.write_shards(records, directory)
+            for workers in (1, 2):
+                with self.subTest(workers=workers):
+                    loader = Loader(model="stock", shards=directory,
+                                    workers=workers)
+                    self.assertEqual(
+                        sorted(error.field for error in loader.errors),
+                        ["colour", "state"],
+                    )
+                    self.assertEqual(
+                        {error.index.split("[")[0] for error in loader.errors},
+                        {f"stock_{warehouse_id}.json"
+                         for warehouse_id in warehouse_ids},
+                    )
+                    self.assertEqual(sum(len(w.stock) for w in loader), 38)
+
+            lazy = Loader(model="stock", shards=directory, lazy=True)
+            self.assertEqual(sum(len(w.stock) for w in lazy), 38)
+
+
+class TestLazySearch(unittest.TestCase):
+    """Test case for searching warehouses whose shard is not read yet."""
+
+    def setUp(self):
+        """Write a one-warehouse shard and load it eagerly for reference."""
+        self.directory = tempfile.TemporaryDirectory()
+        records = list(generator.generate_stock(200, seed=4, warehouses=1))
+        shards.write_shards(records, self.directory.name)
+        self.loaded = Loader(model="stock", shards=self.directory.name).objects[0]
+        self.lazy = Loader(model="stock", shards=self.directory.name,
+                           lazy=True).objects[0]
+
+    def tearDown(self):
+        """Remove the shard directory."""
+        self.directory.cleanup()
+
+    def test_search_loads_the_shard(self):
+        """Test that an exact name search reads an unloaded shard."""
+        name = str(self.loaded.stock[0])
+        self.assertFalse(self.lazy.is_loaded)
+        found = self.lazy.search(name)
+        self.assertTrue(self.lazy.is_loaded)
+        self.assertTrue(found)
+        self.assertEqual([(str(item), date) for item, date in found],
+                         [(str(item), date)
+                          for item, date in self.loaded.search(name)])
+
+    def test_find_loads_the_shard(self):
+        """Test that a substring search reads an unloaded shard."""
+        text = self.loaded.stock[0].category
+        self.assertFalse(self.lazy.is_loaded)
+        found = self.lazy.find(text)
+        self.assertTrue(self.lazy.is_loaded)
+        self.assertTrue(found)
+        self.assertEqual([vars(item) for item in found],
+                         [vars(item) for item in self.loaded.find(text)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+"""
+This module contains unit tests for the sidecar module.
+
+The tests check that warehouses restored from a sidecar match freshly
+parsed ones, and that stale or damaged sidecars are ignored and rebuilt.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import generator
+import sidecar
+import storage
+from classes import Item, Warehouse
+from loader import Loader
+
+
+def describe(loader):
+    """Return the items, index and aggregates of every warehouse."""
+    return [
+        (
+            warehouse.warehouse_id,
+            [vars(item) for item in warehouse.stock],
+            {name: [vars(item) for item in items]
+             for name, items in warehouse._index.items()},
+            list(warehouse.category_counts().items()),
+            warehouse.summary(),
+            {name: warehouse.availability(name) for name in warehouse._names},
+        )
+        for warehouse in loader
+    ]
+
+
+class TestSidecar(unittest.TestCase):
+    """Test case for the index sidecar of stock files."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "stock.json")
+        records = list(generator.generate_stock(300, seed=3, warehouses=3,
+                                                max_quantity=4))
+        # Records without a date are indexed too; the one without a state
+        # is skipped by the Loader and the sidecar alike
+        records.append({"state": "Red", "category": "Router", "warehouse": 1})
+        records.append({"category": "Mouse", "warehouse": 2,
+                        "date_of_stock": "2021-01-01 00:00:00"})
+        with open(self.path, "w") as file:
+            json.dump(records, file)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def load(self):
+        loader = Loader(model="stock", path=self.path, index=True)
+        if loader.index_thread is not None:
+            loader.index_thread.join()
+        return loader
+
+    def test_restored_stock_matches_parsed_stock(self):
+        """Test that the second load restores the same warehouses."""
+        parsed = self.load()
+        self.assertIsNotNone(parsed.index_thread)
+        self.assertTrue(os.path.exists(sidecar.sidecar_path(self.path)))
+
+        restored = self.load()
+        self.assertIsNone(restored.index_thread)
+        self.assertEqual(describe(restored), describe(parsed))
+        # The record without a state is reported by both loads
+        self.assertEqual(len(parsed.errors), 1)
+        self.assertEqual(restored.errors, parsed.errors)
+
+    def test_restored_stock_can_change(self):
+        """Test that restored warehouses keep their aggregates in sync."""
+        self.load()
+        parsed = Loader(model="stock", path=self.path)
+        restored = self.load()
+        for loader in (parsed, restored):
+            warehouse = loader.objects[0]
+            warehouse.take(warehouse.stock[0], 1)
+            warehouse.remove_item(warehouse.stock[-1])
+            warehouse.add_item(Item("Blue", "Camera", "2018-01-01", 1))
+        self.assertEqual(describe(restored), describe(parsed))
+
+    def test_stale_sidecar_is_rebuilt(self):
+        """Test that a sidecar of other content is ignored and replaced."""
+        self.load()
+        with open(self.path, "w") as file:
+            json.dump([{"state": "Red", "category": "Router", "warehouse": 7,
+                        "date_of_stock": "2021-01-01 00:00:00"}], file)
+
+        loader = self.load()
+        self.assertIsNotNone(loader.index_thread)
+        self.assertEqual([warehouse.warehouse_id for warehouse in loader], ["7"])
+        restored = sidecar.load_sidecar(self.path, Warehouse, Item)
+        self.assertEqual(restored.warehouses[0].occupancy(), 1)
+        self.assertEqual(restored.errors, [])
+
+    def test_cli_stock_uses_the_sidecar(self):
+        """Test that the CLI's stock loader restores from the sidecar."""
+        script = ("import query; loader = query.stock_loader; "
+                  "print(loader.path, loader.index_thread is None); "
+                  "loader.index_thread and loader.index_thread.join()")
+        environment = dict(os.environ, WAREHOUSE_STOCK=self.path,
+                           WAREHOUSE_INDEX="1")
+        environment.pop("WAREHOUSE_SHARDS", None)
+        launches = []
+        for _ in range(2):
+            launch = subprocess.run(
+                [sys.executable, "-c", script], env=environment, check=True,
+                capture_output=True, text=True,
+                cwd=os.path.dirname(os.path.abspath(sidecar.__file__)),
+            )
+            launches.append(launch.stdout.split()[-2:])
+        # Parsed and indexed on the first launch, restored on the second
+        self.assertEqual(launches, [[self.path, "False"], [self.path, "True"]])
+
+    def test_damaged_sidecar_is_ignored(self):
+        """Test that a file of another format is not restored from."""
+        with open(sidecar.sidecar_path(self.path), "wb") as file:
+            file.write(b"not a sidecar")
+        self.assertIsNone(sidecar.load_sidecar(self.path, Warehouse, Item))
+        self.assertEqual(self.load().objects[0].occupancy(),
+                         Loader(model="stock", path=self.path).objects[0]
+                         .occupancy())
+
+    def test_compressed_stock(self):
+        """Test a sidecar next to a compressed stock file."""
+        compressed = self.path + ".gz"
+        storage.compress(self.path, compressed)
+        loader = Loader(model="stock", path=compressed, index=True)
+        loader.index_thread.join()
+        restored = sidecar.load_sidecar(compressed, Warehouse, Item)
+        self.assertEqual([warehouse.summary()
+                          for warehouse in restored.warehouses],
+                         [warehouse.summary() for warehouse in loader])
+
+
+if __name__ == "__main__":
+    unittest.main()
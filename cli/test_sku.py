@@ -0,0 +1,59 @@
+"""
+This module contains unit tests for the sku module.
+
+The tests cover the conversion between unit and aggregated stock
+records and ordering from aggregated stock.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+import query
+from benchmark import use_stock
+from loader import Loader
+from sku import aggregate_records, expand_records
+
+UNITS = [
+    {"state": "Red", "category": "Router", "warehouse": 1,
+     "date_of_stock": "2021-01-01 00:00:00"},
+    {"state": "Red", "category": "Router", "warehouse": 1,
+     "date_of_stock": "2021-01-01 00:00:00"},
+    {"state": "Red", "category": "Router", "warehouse": 2,
+     "date_of_stock": "2021-01-01 00:00:00"},
+    {"state": "Blue", "category": "Mouse", "warehouse": 1,
+     "date_of_stock": "2021-02-01 00:00:00"},
+]
+
+
+class TestSku(unittest.TestCase):
+    """Test case for aggregated stock records."""
+
+    def test_aggregate_and_expand_round_trip(self):
+        """Test that aggregation merges identical units only."""
+        aggregated = aggregate_records(UNITS)
+        self.assertEqual([record["quantity"] for record in aggregated], [2, 1, 1])
+        self.assertEqual(list(expand_records(aggregated)), UNITS)
+
+    def test_order_from_aggregated_stock(self):
+        """Test that an order decrements quantities across warehouses."""
+        records = [dict(UNITS[0], quantity=300), dict(UNITS[2], quantity=400)]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "stock.json")
+            with open(path, "w") as file:
+                json.dump(records, file)
+            loader = Loader(model="stock", path=path)
+
+        with use_stock(loader):
+            _, counts = query.find_items(loader.objects, "red router")
+            self.assertEqual(counts, {"1": 300, "2": 400})
+            # The default policy drains the larger warehouse 2 first
+            self.assertEqual(query.take_items("red router", 500), 500)
+            _, counts = query.find_items(loader.objects, "red router")
+            self.assertEqual(counts, {"1": 200})
+        self.assertEqual(sum(len(w.stock) for w in loader), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
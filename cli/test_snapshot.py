@@ -0,0 +1,114 @@
+"""
+This module contains unit tests for the snapshot module.
+
+The tests cover the structural sharing between snapshot versions,
+snapshots taken while a writer is busy, lazy warehouses and readers
+running alongside orders.
+"""
+
+import tempfile
+import threading
+import unittest
+
+import generator
+import shards
+from classes import Item, Warehouse
+from loader import Loader
+from snapshot import SnapshotStore
+
+
+class TestSnapshotStore(unittest.TestCase):
+    """Test case for the SnapshotStore class."""
+
+    def setUp(self):
+        """Create two warehouses of three items of 2 units, and a store."""
+        self.stock = []
+        for warehouse_id in (1, 2):
+            warehouse = Warehouse(warehouse_id)
+            for _ in range(3):
+                warehouse.add_item(
+                    Item("Red", "Router", "2021-01-01", warehouse_id, 2)
+                )
+            self.stock.append(warehouse)
+        self.store = SnapshotStore(self.stock)
+
+    def tearDown(self):
+        """Stop the store tracking changes."""
+        self.store.close()
+
+    def test_unchanged_stock_returns_the_same_snapshot(self):
+        """Test that reading twice without changes copies nothing."""
+        self.assertIs(self.store.snapshot(), self.store.snapshot())
+        self.assertEqual(self.store.snapshot().total(), 12)
+
+    def test_only_the_touched_warehouse_is_copied(self):
+        """Test the structural sharing between versions."""
+        before = self.store.snapshot()
+        first, second = self.stock
+        with self.store.write():
+            first.take(first.stock[0], 1)
+        after = self.store.snapshot()
+
+        self.assertEqual(after.version, before.version + 1)
+        self.assertIs(after.warehouses[1], before.warehouses[1])
+        self.assertIsNot(after.warehouses[0], before.warehouses[0])
+        self.assertEqual(before.warehouses[0].total, 6)
+        self.assertEqual(after.warehouses[0].total, 5)
+        self.assertEqual(after.warehouses[0].items[0].quantity, 1)
+
+    def test_busy_writer_is_not_observed(self):
+        """Test that a snapshot never shows half of a change."""
+        first, second = self.stock
+        with self.store.write():
+            first.take(first.stock[0], 2)
+            reading = []
+            reader = threading.Thread(
+                target=lambda: reading.append(self.store.snapshot().total())
+            )
+            reader.start()
+            reader.join()
+            second.take(second.stock[0], 2)
+        self.assertEqual(reading, [12])
+        self.assertEqual(self.store.snapshot().total(), 8)
+
+    def test_readers_alongside_orders(self):
+        """Test that concurrent readers only see whole orders."""
+        totals = set()
+        done = threading.Event()
+
+        def read():
+            while not done.is_set():
+                totals.add(self.store.snapshot().total())
+
+        readers = [threading.Thread(target=read) for _ in range(3)]
+        for reader in readers:
+            reader.start()
+        for _ in range(3):
+            # Every order takes one unit from each warehouse
+            with self.store.write():
+                for warehouse in self.stock:
+                    warehouse.take(warehouse.stock[0], 1)
+        done.set()
+        for reader in readers:
+            reader.join()
+        self.assertTrue(totals <= {12, 10, 8, 6})
+
+    def test_lazy_warehouse_is_not_loaded(self):
+        """Test that a snapshot reads an unloaded shard only on demand."""
+        records = list(generator.generate_stock(50, seed=1, warehouses=1))
+        with tempfile.TemporaryDirectory() as directory:
+            shards.write_shards(records, directory)
+            loader = Loader(model="stock", shards=directory, lazy=True)
+            store = SnapshotStore(loader)
+            try:
+                snapshot = store.snapshot()
+                self.assertFalse(loader.objects[0].is_loaded)
+                self.assertEqual(snapshot.total(), 50)
+                self.assertEqual(len(snapshot.warehouses[0].items), 50)
+                self.assertFalse(loader.objects[0].is_loaded)
+            finally:
+                store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+"""
+This module contains unit tests for the stock_query module.
+
+The tests compare the planned queries with a plain scan of the stock,
+check which index the planner picks and parse filter expressions.
+"""
+
+import tempfile
+import unittest
+
+import generator
+import shards
+from classes import Item, Warehouse
+from loader import Loader
+from stock_query import parse_filter, plan_query, query_stock
+
+
+def scan(stock, category=None, state=None, since=None, until=None):
+    """Return the matching items by reading every item."""
+    return [
+        item
+        for warehouse in stock
+        for item in warehouse.stock
+        if isinstance(item, Item)
+        and (category is None or item.category.lower() == category)
+        and (state is None or item.state.lower() == state)
+        and (since is None or (item.date_of_stock or "") >= since)
+        and (until is None or (item.date_of_stock or "9999")[:10] <= until)
+    ]
+
+
+class TestQueryStock(unittest.TestCase):
+    """Test case for query_stock and plan_query."""
+
+    def setUp(self):
+        """Create two warehouses, with a plain string and an undated item."""
+        first, second = Warehouse(1), Warehouse(2)
+        for item in (
+            Item("Red", "Router", "2021-01-01 10:00:00", 1, 2),
+            Item("Blue", "Router", "2021-03-01 10:00:00", 1),
+            Item("Red", "Mouse", "2020-06-01 10:00:00", 1),
+            Item("Red", "Router", "2019-01-01 10:00:00", 1),
+            "Red Router",
+        ):
+            first.add_item(item)
+        for item in (
+            Item("Red", "Router", "2021-02-01 10:00:00", 2, 5),
+            Item("Second hand", "Game console", None, 2),
+        ):
+            second.add_item(item)
+        self.stock = [first, second]
+
+    def test_filters(self):
+        """Test every filter, alone and combined."""
+        cases = [
+            {"category": "router"},
+            {"state": "RED"},
+            {"category": "Router", "state": "red"},
+            {"since": "2021-01-01"},
+            {"until": "2021-01-01"},
+            {"category": "router", "since": "2020-01-01", "until": "2021-02-01"},
+        ]
+        for case in cases:
+            with self.subTest(**case):
+                arguments = {
+                    key: value for key, value in case.items()
+                    if key in ("category", "state")
+                }
+                if "since" in case or "until" in case:
+                    arguments["stocked_between"] = (case.get("since"),
+                                                    case.get("until"))
+                expected = scan(self.stock, case.get("category", "").lower() or None,
+                                case.get("state", "").lower() or None,
+                                case.get("since"), case.get("until"))
+                found = query_stock(self.stock, **arguments)
+                self.assertCountEqual(found, expected)
+
+    def test_warehouse_filter(self):
+        """Test that only the given warehouse is read."""
+        found = query_stock(self.stock, state="red", warehouse="2")
+        self.assertEqual([item.warehouse for item in found], [2])
+        self.assertEqual(
+            [plan.warehouse for plan in plan_query(self.stock, warehouse=2)],
+            [self.stock[1]],
+        )
+
+    def test_order_and_limit(self):
+        """Test sorting with and without a limit."""
+        dates = [item.date_of_stock
+                 for item in query_stock(self.stock, category="router",
+                                         order_by="date")]
+        self.assertEqual(dates, sorted(dates))
+        newest = query_stock(self.stock, category="router", order_by="-date",
+                             limit=2)
+        self.assertEqual([item.date_of_stock for item in newest],
+                         ["2021-03-01 10:00:00", "2021-02-01 10:00:00"])
+        largest = query_stock(self.stock, order_by="-quantity", limit=1)
+        self.assertEqual(largest[0].quantity, 5)
+        self.assertEqual(len(query_stock(self.stock, limit=3)), 3)
+        with self.assertRaises(ValueError):
+            query_stock(self.stock, order_by="colour")
+
+    def test_planner_picks_the_most_selective_index(self):
+        """Test the choice between the name and the date index."""
+        first = self.stock[0]
+        plans = plan_query([first], category="router")
+        # The estimate counts the plain "Red Router" entry of the bucket too
+        self.assertEqual([(plan.index, plan.estimate) for plan in plans],
+                         [("name", 4)])
+        # The date index is not built just to compare it
+        plans = plan_query([first], category="router",
+                           stocked_between=("2021-02-15", None))
+        self.assertEqual(plans[0].index, "name")
+        plans = plan_query([first], stocked_between=("2021-02-15", None))
+        self.assertEqual((plans[0].index, plans[0].estimate), ("date", 1))
+        # Once built, the narrower date range wins
+        plans = plan_query([first], category="router",
+                           stocked_between=("2021-02-15", None))
+        self.assertEqual((plans[0].index, plans[0].estimate), ("date", 1))
+        self.assertEqual(plan_query([first])[0].index, "scan")
+
+    def test_date_index_follows_changes(self):
+        """Test that the date index follows a change."""
+        first = self.stock[0]
+        query_stock([first], stocked_between=("2021-01-01", None))
+        first.add_item(Item("Red", "Router", "2022-01-01", 1))
+        found = query_stock([first], stocked_between=("2022-01-01", None))
+        self.assertEqual([item.date_of_stock for item in found], ["2022-01-01"])
+
+    def test_loader_query(self):
+        """Test the query on a Loader, with lazily loaded shards."""
+        records = list(generator.generate_stock(200, seed=4, warehouses=3))
+        with tempfile.TemporaryDirectory() as directory:
+            shards.write_shards(records, directory)
+            loader = Loader(model="stock", shards=directory, lazy=True)
+            found = loader.query(category="Router", warehouse=2)
+        expected = [record for record in records
+                    if record["category"] == "Router" and record["warehouse"] == 2]
+        self.assertEqual(sum(item.quantity for item in found),
+                         sum(record.get("quantity", 1) for record in expected))
+
+
+class TestParseFilter(unittest.TestCase):
+    """Test case for parse_filter."""
+
+    def test_expression(self):
+        """Test a complete filter expression."""
+        self.assertEqual(
+            parse_filter('category:"game console" state:red warehouse:2 '
+                         "since:2021-01-01 limit:5 order:-date"),
+            {"category": "game console", "state": "red", "warehouse": "2",
+             "stocked_between": ("2021-01-01", None), "limit": 5,
+             "order_by": "-date"},
+        )
+        self.assertEqual(parse_filter(""), {})
+
+    def test_invalid_terms(self):
+        """Test that malformed terms are rejected."""
+        for expression in ("router", "colour:red", "limit:ten", "state:",
+                           'category:"router'):
+            with self.subTest(expression=expression):
+                with self.assertRaises(ValueError):
+                    parse_filter(expression)
+
+
+if __name__ == "__main__":
+    unittest.main()
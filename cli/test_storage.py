@@ -0,0 +1,74 @@
+"""
+This module contains unit tests for the storage module.
+
+The tests cover the streaming JSON parser, compressed stock files
+and the rotation of action logs.
+"""
+
+import gzip
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import storage
+from loader import Loader
+
+
+class TestStorage(unittest.TestCase):
+    """Test case for the storage functions."""
+
+    def setUp(self):
+        """Create a temporary directory."""
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.directory.cleanup()
+
+    def test_iter_json_array_across_chunks(self):
+        """Test that records split between chunks are parsed."""
+        records = [{"state": "Red", "category": f"Router {i}"} for i in range(50)]
+        text = " [ " + ",\n".join(json.dumps(record) for record in records) + " ] "
+        parsed = list(storage.iter_json_array(io.StringIO(text), chunk_size=7))
+        self.assertEqual(parsed, records)
+        self.assertEqual(list(storage.iter_json_array(io.StringIO("[]"))), [])
+
+    def test_iter_json_array_scalars_across_chunks(self):
+        """Test that numbers and strings split between chunks stay whole."""
+        values = [1, 2, 33, -1.5e3, 12345, "ab, c", "Router 10", True, None,
+                  {"quantity": 250}]
+        text = json.dumps(values)
+        for chunk_size in (1, 2, 3, 5):
+            with self.subTest(chunk_size=chunk_size):
+                parsed = storage.iter_json_array(io.StringIO(text),
+                                                 chunk_size=chunk_size)
+                self.assertEqual(list(parsed), values)
+
+    def test_loader_reads_compressed_stock(self):
+        """Test that gzip and lzma stock files load like plain ones."""
+        records = [{"state": "Red", "category": "Router", "warehouse": 1,
+                    "date_of_stock": "2021-01-01 00:00:00"}] * 20
+        plain_path = os.path.join(self.directory.name, "stock.json")
+        with open(plain_path, "w") as file:
+            json.dump(records, file)
+        for extension in (".gz", ".xz"):
+            storage.compress(plain_path, plain_path + extension)
+            loader = Loader(model="stock", path=plain_path + extension)
+            self.assertEqual(loader.objects[0].occupancy(), 20)
+
+    def test_log_rotation(self):
+        """Test that rotated logs are compressed and read back in order."""
+        path = os.path.join(self.directory.name, "user_log.txt")
+        for number in range(5):
+            storage.append_log(path, [f"line {number}\n"], max_bytes=5)
+        self.assertTrue(os.path.exists(path + ".1.gz"))
+        with gzip.open(path + ".1.gz", "rt") as file:
+            self.assertEqual(file.read(), "line 3\n")
+        self.assertEqual(list(storage.iter_log_lines(path)),
+                         [f"line {number}" for number in range(5)])
+
+
+if __name__ == "__main__":
+    unittest.main()
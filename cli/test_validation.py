@@ -0,0 +1,124 @@
+"""
+This module contains unit tests for the validation module.
+
+The tests check the errors reported for bad stock and personnel records,
+the columns compiled from the valid ones, and that the Loader skips bad
+records instead of failing.
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+from loader import Loader
+from validation import (RecordError, stock_record_errors, validate_personnel,
+                        validate_stock)
+
+GOOD = {"state": "Red", "category": "Router", "warehouse": 1,
+        "date_of_stock": "2021-01-01 10:00:00"}
+
+
+class TestValidateStock(unittest.TestCase):
+    """Test case for the stock validation."""
+
+    def test_valid_records(self):
+        """Test the columns compiled from valid records."""
+        report = validate_stock([
+            GOOD,
+            {"state": "Blue", "category": "Mouse", "warehouse": 2,
+             "quantity": 3},
+            dict(GOOD, date_of_stock="2021-02-01"),
+            dict(GOOD, warehouse="1"),
+        ])
+        self.assertEqual(report.errors, [])
+        self.assertEqual(report.total, 4)
+        self.assertEqual(report.valid, {
+            "1": (1, ["Red", "Red", "Red"], ["Router"] * 3,
+                  ["2021-01-01 10:00:00", "2021-02-01", "2021-01-01 10:00:00"],
+                  [1, 1, 1]),
+            "2": (2, ["Blue"], ["Mouse"], [None], [3]),
+        })
+
+    def test_bad_records(self):
+        """Test that every problem is reported with its record index."""
+        cases = [
+            (dict(GOOD, colour="red"), [("colour", "is not a known field")]),
+            ({"category": "Router", "warehouse": 1}, [("state", "is missing")]),
+            (dict(GOOD, category=""), [("category",
+                                        "must be a non-empty string")]),
+            (dict(GOOD, date_of_stock="2021-13-01"), [("date_of_stock", None)]),
+            (dict(GOOD, date_of_stock=20210101), [("date_of_stock", None)]),
+            (dict(GOOD, warehouse=None), [("warehouse", "is missing")]),
+            (dict(GOOD, warehouse=True), [("warehouse", None)]),
+            (dict(GOOD, quantity=0), [("quantity", None)]),
+            (["Red", "Router"], [(None, "must be an object")]),
+        ]
+        for record, expected in cases:
+            with self.subTest(record=record):
+                errors = stock_record_errors(record)
+                self.assertEqual([field for field, _ in errors],
+                                 [field for field, _ in expected])
+                for (_, message), (_, wanted) in zip(errors, expected):
+                    if wanted is not None:
+                        self.assertEqual(message, wanted)
+
+        report = validate_stock([GOOD] + [record for record, _ in cases])
+        self.assertEqual(len(report.valid["1"][1]), 1)
+        self.assertEqual([error.index for error in report.errors],
+                         list(range(1, len(cases) + 1)))
+        self.assertEqual(str(report.errors[0]),
+                         "record 1: colour: is not a known field")
+
+    def test_known_warehouses(self):
+        """Test the optional set of warehouse ids."""
+        report = validate_stock([GOOD, dict(GOOD, warehouse=7)],
+                                warehouse_ids={"1", "2"})
+        self.assertEqual(report.errors, [
+            RecordError(1, "warehouse", "is not a known warehouse: 7"),
+        ])
+
+
+class TestValidatePersonnel(unittest.TestCase):
+    """Test case for the personnel validation."""
+
+    def test_nested_reports(self):
+        """Test that an invalid report is left out of its manager."""
+        report = validate_personnel([
+            {"user_name": "Juno", "password": "compte", "head_of": [
+                {"user_name": "India", "password": ""},
+                {"user_name": "Matthew", "password": "smith"},
+            ]},
+            {"user_name": "Jeremy"},
+            "Samuel",
+        ])
+        self.assertEqual([str(error) for error in report.errors], [
+            "record 0: head_of.0.password: must be a non-empty string",
+            "record 1: password: is missing",
+            "record 2: must be an object",
+        ])
+        self.assertEqual(report.valid, [
+            {"user_name": "Juno", "password": "compte", "head_of": [
+                {"user_name": "Matthew", "password": "smith"}]},
+        ])
+
+
+class TestLoaderValidation(unittest.TestCase):
+    """Test case for the validation of the Loader."""
+
+    def test_bad_records_are_skipped(self):
+        """Test that a load with bad records keeps the good ones."""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "stock.json")
+            with open(path, "w") as file:
+                json.dump([GOOD, dict(GOOD, shelf=3), {"warehouse": 2},
+                           dict(GOOD, warehouse=2)], file)
+            loader = Loader(model="stock", path=path)
+        self.assertEqual([error.index for error in loader.errors], [1, 2, 2])
+        self.assertEqual([(warehouse.warehouse_id, warehouse.occupancy())
+                          for warehouse in loader], [("1", 1), ("2", 1)])
+        self.assertEqual(Loader(model="stock").errors, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,235 @@
+"""
+Validation module for stock and personnel imports.
+
+Imported records are checked in a single pass before any object is built:
+the known keys, the types, the date of stock format and the warehouse id.
+A bad record is reported with its index and skipped, so one broken line
+no longer aborts a whole load, and no item ends up with a None state or
+category.
+
+Valid stock records are compiled into the columns of the shards module
+in the same pass, so the Loader builds its warehouses from them directly.
+Records of the usual shape are accepted by a fast path; the detailed
+checks only run for the others.
+
+Usage:
+    python validation.py data/stock.json
+    python validation.py --personnel data/personnel.json
+"""
+import argparse
+import re
+from collections import namedtuple
+
+import storage
+
+STOCK_FIELDS = frozenset(
+    ("state", "category", "date_of_stock", "warehouse", "quantity")
+)
+PERSONNEL_FIELDS = frozenset(("user_name", "password", "head_of"))
+# "YYYY-MM-DD" or "YYYY-MM-DD HH:MM:SS"
+_is_date = re.compile(
+    r"\d{4}-(0[1-9]|1[0-2])-(0[1-9]|[12]\d|3[01])"
+    r"( ([01]\d|2[0-3]):[0-5]\d:[0-5]\d)?"
+).fullmatch
+
+
+class RecordError(namedtuple("RecordError", ["index", "field", "message"])):
+    """A problem with one imported record."""
+
+    def __str__(self):
+        """Return the error as `record <index>: <field>: <message>`."""
+        if self.field is None:
+            return f"record {self.index}: {self.message}"
+        return f"record {self.index}: {self.field}: {self.message}"
+
+
+# `valid` holds the compiled records, `total` counts every record read
+ValidationReport = namedtuple("ValidationReport", ["valid", "errors", "total"])
+
+
+def _text_errors(record, field, errors):
+    """Check that a required field holds a non-empty string."""
+    value = record.get(field)
+    if value is None:
+        errors.append((field, "is missing"))
+    elif not isinstance(value, str) or not value.strip():
+        errors.append((field, "must be a non-empty string"))
+
+
+def stock_record_errors(record, warehouse_ids=None):
+    """
+    Check one stock record.
+
+    Args:
+        record: The decoded record.
+        warehouse_ids (set): The allowed warehouse ids, as strings. Any
+            id is allowed when omitted.
+
+    Returns:
+        List[Tuple[str, str]]: The field and message of every problem,
+            empty for a valid record.
+    """
+    if type(record) is not dict:
+        return [(None, "must be an object")]
+    state = record.get("state")
+    category = record.get("category")
+    date_of_stock = record.get("date_of_stock")
+    warehouse = record.get("warehouse")
+    quantity = record.get("quantity", 1)
+    # Fast path for the usual shape
+    if (
+        type(state) is str and state
+        and type(category) is str and category
+        and (date_of_stock is None
+             or (type(date_of_stock) is str and _is_date(date_of_stock)))
+        and type(warehouse) is int and warehouse >= 0
+        and type(quantity) is int and quantity >= 1
+        and record.keys() <= STOCK_FIELDS
+        and (warehouse_ids is None or str(warehouse) in warehouse_ids)
+    ):
+        return []
+
+    errors = [
+        (field, "is not a known field")
+        for field in sorted(record.keys() - STOCK_FIELDS, key=str)
+    ]
+    _text_errors(record, "state", errors)
+    _text_errors(record, "category", errors)
+    if date_of_stock is not None and (
+        not isinstance(date_of_stock, str) or not _is_date(date_of_stock)
+    ):
+        errors.append(("date_of_stock",
+                       "must be a date as YYYY-MM-DD [HH:MM:SS]"))
+    if warehouse is None:
+        errors.append(("warehouse", "is missing"))
+    elif isinstance(warehouse, bool) or not (
+        (isinstance(warehouse, int) and warehouse >= 0)
+        or (isinstance(warehouse, str) and warehouse.strip())
+    ):
+        errors.append(("warehouse", "must be a warehouse number"))
+    elif warehouse_ids is not None and str(warehouse) not in warehouse_ids:
+        errors.append(("warehouse", f"is not a known warehouse: {warehouse}"))
+    if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity < 1:
+        errors.append(("quantity", "must be a positive integer"))
+    return errors
+
+
+def validate_stock(records, warehouse_ids=None):
+    """
+    Check stock records and compile the valid ones into columns.
+
+    Args:
+        records (iterable): The decoded records, e.g. from
+            storage.iter_records.
+        warehouse_ids (set): The allowed warehouse ids, as strings.
+
+    Returns:
+        ValidationReport: `valid` maps every warehouse id to (warehouse
+            value, states, categories, dates, quantities), as
+            shards.parse_shard does.
+    """
+    columns = {}
+    errors = []
+    index = -1
+    for index, record in enumerate(records):
+        problems = stock_record_errors(record, warehouse_ids)
+        if problems:
+            errors.extend(RecordError(index, field, message)
+                          for field, message in problems)
+            continue
+        warehouse = record["warehouse"]
+        warehouse_id = str(warehouse)
+        warehouse_columns = columns.get(warehouse_id)
+        if warehouse_columns is None:
+            warehouse_columns = columns[warehouse_id] = (warehouse, [], [], [], [])
+        _, states, categories, dates, quantities = warehouse_columns
+        states.append(record["state"])
+        categories.append(record["category"])
+        dates.append(record.get("date_of_stock"))
+        quantities.append(record.get("quantity", 1))
+    return ValidationReport(columns, errors, index + 1)
+
+
+def _employee_errors(record, path, errors):
+    """
+    Check one employee and their reports, depth first.
+
+    Returns:
+        dict: The record with its invalid reports left out, or None
+            when the employee itself is invalid.
+    """
+    if type(record) is not dict:
+        errors.append((path.rstrip(".") or None, "must be an object"))
+        return None
+    problems = len(errors)
+    for field in sorted(record.keys() - PERSONNEL_FIELDS, key=str):
+        errors.append((f"{path}{field}", "is not a known field"))
+    for field in ("user_name", "password"):
+        value = record.get(field)
+        if value is None:
+            errors.append((f"{path}{field}", "is missing"))
+        elif not isinstance(value, str) or not value:
+            errors.append((f"{path}{field}", "must be a non-empty string"))
+    reports = record.get("head_of")
+    if reports is not None and not isinstance(reports, list):
+        errors.append((f"{path}head_of", "must be a list"))
+    if len(errors) > problems:
+        return None
+    if not reports:
+        return record
+    valid_reports = []
+    for number, report in enumerate(reports):
+        report = _employee_errors(report, f"{path}head_of.{number}.", errors)
+        if report is not None:
+            valid_reports.append(report)
+    return dict(record, head_of=valid_reports)
+
+
+def validate_personnel(records):
+    """
+    Check personnel records, including the nested `head_of` reports.
+
+    An invalid report is left out of its manager's `head_of`; the error
+    names its path, e.g. `head_of.0.password`.
+
+    Args:
+        records (iterable): The decoded employee records.
+
+    Returns:
+        ValidationReport: `valid` lists the employee records to build.
+    """
+    valid = []
+    errors = []
+    index = -1
+    for index, record in enumerate(records):
+        problems = []
+        employee = _employee_errors(record, "", problems)
+        errors.extend(RecordError(index, field or None, message)
+                      for field, message in problems)
+        if employee is not None:
+            valid.append(employee)
+    return ValidationReport(valid, errors, index + 1)
+
+
+def main(argv=None):
+    """Validate a stock or personnel file from the command line."""
+    parser = argparse.ArgumentParser(description="Validate an import file")
+    parser.add_argument("path", help="stock or personnel JSON file, "
+                                     "optionally compressed")
+    parser.add_argument("--personnel", action="store_true",
+                        help="validate personnel records instead of stock")
+    options = parser.parse_args(argv)
+
+    records = storage.iter_records(options.path)
+    if options.personnel:
+        report = validate_personnel(records)
+    else:
+        report = validate_stock(records)
+    for error in report.errors:
+        print(error)
+    print(f"{report.total} records, {len(report.errors)} errors")
+    return 1 if report.errors else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
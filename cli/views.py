@@ -0,0 +1,151 @@
+"""
+Views module for structures derived from the live stock.
+
+This module defines the StockViews class, which owns the fuzzy name
+index and the category counts of one stock and invalidates the cached
+search and browse results it covers. All of them follow the changes of
+the stock through the event bus: a change updates the index and the
+counts in place and evicts only the cached results that mention the
+changed item, instead of dropping everything on every stock version.
+"""
+import events
+from cache import normalize_query
+from classes import Item, count_by_category
+from fuzzy import TrigramIndex
+
+
+class _Identity:
+    """Hashable reference to an object, equal only to itself."""
+
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        """
+        Initialize an _Identity instance.
+
+        Args:
+            value: The object, e.g. a list of warehouses. It is kept
+                alive, so its id is not reused while the key exists.
+        """
+        self.value = value
+
+    def __hash__(self):
+        """Return the hash of the object's identity."""
+        return id(self.value)
+
+    def __eq__(self, other):
+        """Return True when both refer to the same object."""
+        return isinstance(other, _Identity) and other.value is self.value
+
+
+def search_key(stock, search_item):
+    """
+    Return the cache key of a search of a stock.
+
+    The key refers to the stock itself rather than to its id: the id of
+    a collected stock can be reused by a new one, which would then be
+    served the old results. Lists of warehouses cannot be weakly
+    referenced, so the key keeps the stock alive until the entry leaves
+    the cache.
+    """
+    return ("search", _Identity(stock), search_item)
+
+
+def browse_key(category):
+    """Return the cache key of the items of a category."""
+    return ("browse", normalize_query(category))
+
+
+class StockViews:
+    """Derived views of one stock, kept in sync through the event bus."""
+
+    def __init__(self, loader, cache, bus=None):
+        """
+        Initialize a StockViews instance and subscribe it to the bus.
+
+        Args:
+            loader (Loader): The stock loader, or a list of warehouses.
+            cache (LRUCache): The cache of search and browse results.
+            bus (EventBus): The bus to follow. Defaults to events.bus.
+        """
+        self.loader = loader
+        self.cache = cache
+        self.bus = bus or events.bus
+        self._warehouses = {id(warehouse) for warehouse in loader}
+        self._fuzzy_index = None
+        self._categories = None
+        self.bus.subscribe(self.apply)
+
+    def close(self):
+        """Stop following the stock."""
+        self.bus.unsubscribe(self.apply)
+
+    def covers(self, stock):
+        """Return True when `stock` is the stock these views follow."""
+        return stock is self.loader or stock is getattr(self.loader, "objects", None)
+
+    def fuzzy_index(self):
+        """Return the trigram index of the item names, built on first use."""
+        if self._fuzzy_index is None:
+            self._fuzzy_index = TrigramIndex.from_stock(self.loader)
+        return self._fuzzy_index
+
+    def category_counts(self):
+        """
+        Return the number of items per category.
+
+        Returns:
+            dict: The count of items per category, in order of appearance.
+        """
+        if self._categories is None:
+            self._categories = count_by_category(self.loader)
+        return dict(self._categories)
+
+    def apply(self, event):
+        """
+        Update the views after a change of the stock.
+
+        Args:
+            event (StockEvent): The change, ignored for other stocks.
+        """
+        if id(event.warehouse) not in self._warehouses:
+            return
+        if event.kind == events.ITEMS_RECEIVED:
+            changes = [(item, getattr(item, "quantity", 1)) for item in event.item]
+        elif event.kind == events.ITEM_ADDED:
+            changes = [(event.item, event.quantity)]
+        else:
+            changes = [(event.item, -event.quantity)]
+
+        names = set()
+        categories = set()
+        for item, amount in changes:
+            self._update(item, amount, event.warehouse.warehouse_id)
+            names.add(str(item).lower())
+            category = getattr(item, "category", None)
+            categories.add(normalize_query(category) if category is not None
+                           else None)
+        self.cache.evict(lambda key: (
+            key[0] == "search" and any(key[2] in name for name in names)
+            or key[0] == "browse" and key[1] in categories
+        ))
+
+    def _update(self, item, amount, warehouse_id):
+        """Count `amount` units of an item in the counts and the index."""
+        if not isinstance(item, Item) or item.category is None:
+            return
+        if self._categories is not None:
+            self._count_category(item.category, amount)
+        if self._fuzzy_index is not None and item.state is not None:
+            update = (self._fuzzy_index.add if amount > 0
+                      else self._fuzzy_index.remove)
+            update(str(item), warehouse_id, abs(amount))
+            update(item.category, warehouse_id, abs(amount))
+
+    def _count_category(self, category, amount):
+        """Add `amount` (negative to remove) to the count of a category."""
+        count = self._categories.get(category, 0) + amount
+        if count > 0:
+            self._categories[category] = count
+        else:
+            self._categories.pop(category, None)